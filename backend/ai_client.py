@@ -0,0 +1,89 @@
+import asyncio
+import os
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+# Environment variables yükle
+load_dotenv()
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-1.5-flash")
+
+# Aynı anda Gemini'de bekleyebilecek istek sayısı ve tek çağrı için süre sınırı
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "256"))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+
+
+class AIClient:
+    """Tüm endpoint'lerin paylaştığı async Gemini istemcisi"""
+
+    def __init__(self, api_key=None, model_name=GEMINI_MODEL_NAME,
+                 max_concurrency=GEMINI_MAX_CONCURRENCY, timeout=GEMINI_TIMEOUT_SECONDS):
+        self.model = None
+        self.vision_model = None
+        self.available = False
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+
+        if not api_key:
+            print("⚠️ GEMINI_API_KEY bulunamadı - AI özellikleri sınırlı!")
+            return
+
+        try:
+            genai.configure(api_key=api_key)
+            self.model = genai.GenerativeModel(model_name)
+            self.vision_model = genai.GenerativeModel(model_name)
+            self.available = True
+            print("✅ Gemini Vision AI aktif - Gerçek analiz hazır!")
+        except Exception as e:
+            print(f"⚠️ Gemini API hatası: {e}")
+            self.available = False
+
+    def _get_semaphore(self):
+        # Semaphore event loop içinde oluşturulmalı (import anında loop yok)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _call(self, target_model, contents, **kwargs):
+        if not self.available or target_model is None:
+            raise RuntimeError("Gemini kullanılamıyor")
+
+        async with self._get_semaphore():
+            if hasattr(target_model, "generate_content_async"):
+                coro = target_model.generate_content_async(contents, **kwargs)
+            else:
+                # Eski SDK: senkron çağrıyı event loop'u bloklamadan thread'e at
+                coro = asyncio.to_thread(target_model.generate_content, contents, **kwargs)
+            return await asyncio.wait_for(coro, timeout=self.timeout)
+
+    async def generate_text(self, prompt, **kwargs):
+        """Metin prompt'u için Gemini cevabını döndür"""
+        response = await self._call(self.model, prompt, **kwargs)
+        return response.text
+
+    async def stream_text(self, prompt, **kwargs):
+        """Gemini cevabını parça parça üret (async generator)"""
+        if not self.available or self.model is None:
+            raise RuntimeError("Gemini kullanılamıyor")
+
+        async with self._get_semaphore():
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(prompt, stream=True, **kwargs),
+                timeout=self.timeout
+            )
+            async for chunk in response:
+                text = getattr(chunk, "text", "")
+                if text:
+                    yield text
+
+    async def generate_vision(self, parts, **kwargs):
+        """Görsel + metin parçaları için Gemini Vision cevabını döndür"""
+        response = await self._call(self.vision_model, parts, **kwargs)
+        return response.text
+
+
+# Global AI client
+ai_client = AIClient(api_key=GEMINI_API_KEY)
+GEMINI_AVAILABLE = ai_client.available
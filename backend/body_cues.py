@@ -0,0 +1,258 @@
+import re
+
+# Cinsiyet ipuçları (anahtar kelime -> cinsiyet)
+GENDER_KEYWORDS = {
+    'erkek': ['erkek', 'adam', 'bay', 'male', 'man', 'masculine', 'maskulen'],
+    'kadın': ['kadın', 'bayan', 'hanım', 'female', 'woman', 'feminine', 'feminen']
+}
+
+# Açık cinsiyet belirteçleri kelime skorundan önce gelir (erkek önce kontrol edilir)
+GENDER_MARKERS = {
+    'erkek': ['👨', '♂'],
+    'kadın': ['👩', '♀']
+}
+
+# Vücut tipleri - sıra önceliği belirler (ilk eşleşen kazanır)
+BODY_TYPE_KEYWORDS = {
+    'Rectangle': ['dikdörtgen', 'rectangle'],
+    'Pear': ['pear', 'armut'],
+    'Apple': ['apple', 'elma'],
+    'Hourglass': ['hourglass', 'kum saati'],
+    'Athletic': ['athletic', 'atletik'],
+    'Stocky': ['stocky', 'güçlü']
+}
+
+DEFAULT_GENDER = 'kadın'
+DEFAULT_BODY_TYPE = 'Rectangle'
+
+
+def fold_cue_text(text):
+    """Eşleştirme için harf katlama: 'I'/'İ'/'ı' hepsi 'i'.
+
+    turkish_lower 'ATHLETIC'i 'athletıc' yapar, str.lower() 'KADIN'ı 'kadin'; katlanmış
+    metinde ikisi de ipucuyla eşleşir. Uzunluk korunur (konumlar ham metinle aynı).
+    """
+    if "İ" in text:
+        text = text.replace("İ", "i")
+    text = text.lower()
+    return text.replace("ı", "i") if "ı" in text else text
+
+
+def _build_cues():
+    cues = {}
+    for gender, words in GENDER_KEYWORDS.items():
+        for word in words:
+            cues[fold_cue_text(word)] = ('gender', gender, word)
+    for body_type, words in BODY_TYPE_KEYWORDS.items():
+        for word in words:
+            cues[fold_cue_text(word)] = ('body_type', body_type, word)
+    return cues
+
+
+def _trie_pattern(node):
+    """Ortak önekleri birleştirilmiş alternation: 'ba(?:y(?:an)?)' - re her konumda daha az dal dener"""
+    branches = [
+        (r"\s+" if char == " " else re.escape(char)) + _trie_pattern(child)
+        for char, child in sorted(node.items()) if char
+    ]
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    # Açgözlü '?': uzun ipucu önce denenir ('bayan', 'bay'den önce)
+    return "(?:" + pattern + ")?" if "" in node else pattern
+
+
+def _compile_cues(cues):
+    trie = {}
+    for cue in cues:
+        node = trie
+        for char in cue:
+            node = node.setdefault(char, {})
+        node[""] = True
+    # Desen harfle başlar (re ilk harf kümesiyle konum atlar); baş sınırı _scan'de kontrol edilir
+    return re.compile(_trie_pattern(trie) + r"(?!\w)")
+
+
+_CUES = _build_cues()
+# Tek geçişli eşleştirici: tüm ipuçları tek regex, iki yanda kelime sınırı
+_CUE_RE = _compile_cues(_CUES)
+
+
+def _scan(raw):
+    """Katlanmış metinde tüm tam kelime ipuçları: [(başlangıç, bitiş, ipucu, tür, etiket)]"""
+    folded = fold_cue_text(raw)
+    matches = []
+    for match in _CUE_RE.finditer(folded):
+        start = match.start()
+        if start and (folded[start - 1].isalnum() or folded[start - 1] == "_"):
+            continue  # kelime ortası: 'woman' içindeki 'man' sayılmaz
+        kind, label, cue = _CUES[" ".join(match.group().split())]
+        matches.append((start, match.end(), cue, kind, label))
+    return matches
+
+
+def _marker_gender(raw):
+    # Açık belirteç kelime skorundan önce gelir (👨 önce kontrol edilir)
+    if any(marker in raw for marker in GENDER_MARKERS['erkek']):
+        return 'erkek'
+    if any(marker in raw for marker in GENDER_MARKERS['kadın']):
+        return 'kadın'
+    return None
+
+
+def _decide(raw, matches, default_gender=DEFAULT_GENDER):
+    """Eski öncelik kuralları: belirteç, sonra farklı cinsiyet kelimesi sayısı (eşitlikte varsayılan);
+    vücut tipi BODY_TYPE_KEYWORDS sırasında ilk eşleşen"""
+    words = {gender: set() for gender in GENDER_KEYWORDS}
+    body_types = set()
+    for _, _, cue, kind, label in matches:
+        if kind == 'gender':
+            words[label].add(cue)
+        else:
+            body_types.add(label)
+    gender = _marker_gender(raw)
+    if gender is None:
+        erkek_words, kadin_words = len(words['erkek']), len(words['kadın'])
+        if erkek_words != kadin_words:
+            gender = 'erkek' if erkek_words > kadin_words else 'kadın'
+        else:
+            gender = default_gender
+    body_type = next((label for label in BODY_TYPE_KEYWORDS if label in body_types), DEFAULT_BODY_TYPE)
+    return gender, body_type
+
+
+def detect_body_info(text):
+    """(cinsiyet, vücut tipi) - tek regex geçişi, tam kelime eşleşmesi"""
+    raw = text or ""
+    return _decide(raw, _scan(raw))
+
+
+def explicit_gender(text):
+    """Metinde açık cinsiyet ipucu varsa o cinsiyet, yoksa (veya eşitlikte) None - varsayılan uygulanmaz"""
+    raw = text or ""
+    return _decide(raw, _scan(raw), default_gender=None)[0]
+
+
+def match_body_cues(text):
+    """Analiz metnindeki tüm cinsiyet ve vücut tipi ipuçları, skorları ve konumları.
+
+    Karar detect_body_info ile aynı tek geçişten ve aynı öncelik kurallarıyla verilir.
+    Konumlar ham metne göredir (katlama uzunluğu korur).
+    """
+    raw = text or ""
+    matches = _scan(raw)
+    gender_scores = dict.fromkeys(GENDER_KEYWORDS, 0)
+    body_type_scores = dict.fromkeys(BODY_TYPE_KEYWORDS, 0)
+    for _, _, _, kind, label in matches:
+        if kind == 'gender':
+            gender_scores[label] += 1
+        else:
+            body_type_scores[label] += 1
+    for gender, markers in GENDER_MARKERS.items():
+        for marker in markers:
+            start = raw.find(marker)
+            while start != -1:
+                matches.append((start, start + len(marker), marker, 'gender', gender))
+                start = raw.find(marker, start + 1)
+    gender, body_type = _decide(raw, matches)
+    return {
+        "gender": gender,
+        "body_type": body_type,
+        "gender_scores": gender_scores,
+        "body_type_scores": body_type_scores,
+        "matches": sorted(matches)
+    }
+
+
+# Test ve benchmark için: python body_cues.py
+if __name__ == "__main__":
+    import time
+
+    def legacy_extract(analysis_text):
+        # Eski extract_body_info_from_analysis (print'ler hariç)
+        analysis_lower = analysis_text.lower()
+        gender = 'kadın'
+        erkek_keywords = ['erkek', 'adam', 'bay', 'male', 'man', 'masculine', 'maskulen']
+        kadin_keywords = ['kadın', 'bayan', 'hanım', 'female', 'woman', 'feminine', 'feminen']
+        erkek_score = sum(1 for word in erkek_keywords if word in analysis_lower)
+        kadin_score = sum(1 for word in kadin_keywords if word in analysis_lower)
+        if "👨" in analysis_text or "♂" in analysis_text:
+            gender = 'erkek'
+        elif "👩" in analysis_text or "♀" in analysis_text:
+            gender = 'kadın'
+        elif erkek_score > kadin_score and erkek_score > 0:
+            gender = 'erkek'
+        body_type = 'Rectangle'
+        if any(word in analysis_lower for word in ['dikdörtgen', 'rectangle']):
+            body_type = 'Rectangle'
+        elif any(word in analysis_lower for word in ['pear', 'armut']):
+            body_type = 'Pear'
+        elif any(word in analysis_lower for word in ['apple', 'elma']):
+            body_type = 'Apple'
+        elif any(word in analysis_lower for word in ['hourglass', 'kum saati']):
+            body_type = 'Hourglass'
+        elif any(word in analysis_lower for word in ['athletic', 'atletik']):
+            body_type = 'Athletic'
+        elif any(word in analysis_lower for word in ['stocky', 'güçlü']):
+            body_type = 'Stocky'
+        return gender, body_type
+
+    cases = [
+        ("👨 Vücut tipi: ATLETİK, omuzlar geniş", 'erkek', 'Athletic'),
+        ("Bu KADIN kullanıcı armut (Pear) vücut tipine sahip", 'kadın', 'Pear'),
+        ("Erkek kullanıcı, Elma tipi vücut", 'erkek', 'Apple'),
+        ("WOMAN - Hourglass / kum  saati silueti", 'kadın', 'Hourglass'),
+        ("Bayan kullanıcı için öneriler", 'kadın', 'Rectangle'),
+        ("İri yapılı, GÜÇLÜ erkek", 'erkek', 'Stocky'),
+        ("", 'kadın', 'Rectangle')
+    ]
+    for text, gender, body_type in cases:
+        result = match_body_cues(text)
+        assert (result["gender"], result["body_type"]) == (gender, body_type), (text, result)
+        assert detect_body_info(text) == (gender, body_type), text
+
+    # Öncelik sırası skordan önce gelir: Rectangle, Stocky'den önce
+    result = match_body_cues("Vücut Tipi: Rectangle. Güçlü omuzlar ve güçlü bacaklar")
+    assert result["body_type"] == 'Rectangle', result
+    assert result["body_type_scores"]['Stocky'] == 2 and result["body_type_scores"]['Rectangle'] == 1
+    # Cinsiyet: farklı kelime sayısı (tekrar eden 'kadın' iki kelimeyi geçmez)
+    assert match_body_cues("kadın kadın kadın, erkek adam")["gender"] == 'erkek'
+    assert detect_body_info("Vücut Tipi: Rectangle. Güçlü omuzlar") == ('kadın', 'Rectangle')
+
+    # Sadece tam kelime: 'woman' içindeki 'man', 'bayan' içindeki 'bay', 'kadınlar', 'elmas' sayılmaz
+    result = match_body_cues("woman bayan xman kadınlar KADIN")
+    assert result["gender_scores"] == {'erkek': 0, 'kadın': 3}, result
+    assert [m[:3] for m in result["matches"]] == [(0, 5, 'woman'), (6, 11, 'bayan'), (26, 31, 'kadın')]
+    assert detect_body_info("Bayan manken") == ('kadın', 'Rectangle')
+    assert detect_body_info("Vücut tipi: ATHLETIC") == ('kadın', 'Athletic')
+    assert detect_body_info("Elmas kolye ve manşetli bluz") == ('kadın', 'Rectangle')
+    assert detect_body_info("Kadın kullanıcı. Manken gibi dengeli oranlar, manşetli bluzlar") == ('kadın', 'Rectangle')
+    for text in ("bayramlık elbise arıyorum", "manto önerir misin", "Mango tarzı elbise"):
+        assert explicit_gender(text) is None, text
+    # Sohbet mesajı: açık ipucu yoksa cinsiyet bilinmiyor (varsayılan 'kadın' uygulanmaz)
+    assert explicit_gender("slim fit gömlek") is None
+    assert explicit_gender("erkek gömlek arıyorum") == 'erkek'
+    assert explicit_gender("Bayan ceket") == 'kadın'
+    assert explicit_gender("👨 ceket") == 'erkek'
+    assert explicit_gender("kadın ve erkek için") is None
+    print("✅ Testler geçti")
+
+    paragraph = (
+        "Fotoğraftaki kişi yetişkin bir kadın. Omuzlar ve kalçalar dengeli, bel çok belirgin değil; "
+        "bu nedenle dikdörtgen (rectangle) vücut tipine daha yakın. Renk paleti olarak soğuk tonlar, "
+        "kumaş tercihinde yapılandırılmış parçalar ve bel vurgulu kesimler önerilir. Aksesuarlarda "
+        "ince kemerler ve uzun kolyeler silüeti dengeler. Ayakkabıda sivri burun ve hafif topuk uygundur. "
+    )
+    print("=== ANALİZ METNİ BENCHMARK ===")
+    for repeat in (1, 10, 100):
+        text = paragraph * repeat
+        runs = max(20, 20000 // repeat)
+        timings = []
+        for fn in (legacy_extract, detect_body_info, match_body_cues):
+            start = time.perf_counter()
+            for _ in range(runs):
+                fn(text)
+            timings.append((time.perf_counter() - start) / runs * 1e6)
+        print(f"{len(text):7,d} karakter  eski: {timings[0]:7.1f} µs   detect: {timings[1]:7.1f} µs "
+              f"({timings[0] / timings[1]:4.2f}x)   match (skor+konum): {timings[2]:7.1f} µs "
+              f"({timings[0] / timings[2]:4.2f}x)")
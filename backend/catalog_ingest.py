@@ -0,0 +1,368 @@
+"""Kaydedilmiş marka listeleme sayfalarından ürün kataloğu oluşturma (offline).
+
+Dizin yapısı: <kök>/<marka>/<cinsiyet>/<kategori>/*.html
+    ör. pages/zara/kadin/bel_vurgulu_elbise/sayfa1.html
+
+Kullanım:
+    python catalog_ingest.py pages/ --db catalog.db --export-json product_catalog.json
+    python catalog_ingest.py --benchmark 2000
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from product_catalog import CATALOG_FIELDS, parse_price
+
+# Marka başına ürün kartı yapısı; kart dışındaki HTML hiç parse edilmez (SoupStrainer)
+BRAND_LAYOUTS = {
+    'Zara': {
+        'base_url': 'https://www.zara.com',
+        'card': ('li', 'product-grid-product'),
+        'name': ('a', 'product-grid-product-info__name'),
+        'price': ('span', 'money-amount__main'),
+        'image': ('img', 'media-image__image'),
+        'link': ('a', 'product-link')
+    },
+    'Trendyol': {
+        'base_url': 'https://www.trendyol.com',
+        'card': ('div', 'p-card-wrppr'),
+        'name': ('span', 'prdct-desc-cntnr-name'),
+        'price': ('div', 'prc-box-dscntd'),
+        'image': ('img', 'p-card-img'),
+        'link': ('a', None)
+    },
+    'H&M': {
+        'base_url': 'https://www2.hm.com',
+        'card': ('article', 'hm-product-item'),
+        'name': ('a', 'link'),
+        'price': ('span', 'price'),
+        'image': ('img', 'item-image'),
+        'link': ('a', 'item-link')
+    },
+    'Bershka': {
+        'base_url': 'https://www.bershka.com',
+        'card': ('div', 'grid-card'),
+        'name': ('div', 'product-text'),
+        'price': ('span', 'current-price-elem'),
+        'image': ('img', 'image-item'),
+        'link': ('a', 'grid-card-link')
+    }
+}
+
+BRAND_DIRS = {'zara': 'Zara', 'trendyol': 'Trendyol', 'hm': 'H&M', 'h&m': 'H&M', 'bershka': 'Bershka'}
+GENDER_DIRS = {'kadin': 'kadın', 'kadın': 'kadın', 'woman': 'kadın', 'erkek': 'erkek', 'man': 'erkek'}
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS catalog_products (
+        url TEXT PRIMARY KEY,
+        brand TEXT,
+        gender TEXT,
+        category TEXT,
+        name TEXT,
+        price TEXT,
+        price_value REAL,
+        image TEXT,
+        source_file TEXT,
+        updated_at REAL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS ingested_files (
+        path TEXT PRIMARY KEY,
+        mtime REAL,
+        size INTEGER,
+        products INTEGER
+    )
+    '''
+)
+
+
+def format_price(value):
+    return f"{value:.2f} TL"
+
+
+def _find(card, spec):
+    tag, css_class = spec
+    return card.find(tag, class_=css_class) if css_class else card.find(tag)
+
+
+def parse_listing(html, brand, gender, category):
+    """Listeleme sayfasından ürün kayıtları (dict) çıkar"""
+    layout = BRAND_LAYOUTS[brand]
+    card_tag, card_class = layout['card']
+    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer(card_tag, class_=card_class))
+
+    products = []
+    for card in soup.find_all(card_tag, class_=card_class):
+        name_el = _find(card, layout['name'])
+        link_el = _find(card, layout['link'])
+        href = link_el.get('href') if link_el else None
+        name = name_el.get_text(" ", strip=True) if name_el else None
+        if not name or not href:
+            continue
+
+        price_el = _find(card, layout['price'])
+        price_value = parse_price(price_el.get_text(" ", strip=True)) if price_el else None
+        image_el = _find(card, layout['image'])
+        image = (image_el.get('src') or image_el.get('data-src')) if image_el else None
+
+        products.append({
+            'brand': brand,
+            'gender': gender,
+            'category': category,
+            'name': name,
+            'price': format_price(price_value) if price_value is not None else None,
+            'price_value': price_value,
+            'image': urljoin(layout['base_url'], image) if image else None,
+            'url': urljoin(layout['base_url'], href)
+        })
+    return products
+
+
+def _parse_file(job):
+    # Process pool işçisi: (yol, marka, cinsiyet, kategori) -> (yol, ürünler, hata)
+    path, brand, gender, category = job
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return path, parse_listing(f.read(), brand, gender, category), None
+    except Exception as e:
+        return path, [], str(e)
+
+
+def discover_files(root):
+    """<kök>/<marka>/<cinsiyet>/<kategori>/*.html dosyalarını (iş, mtime, boyut) olarak üret"""
+    for brand_dir in sorted(os.listdir(root)):
+        brand = BRAND_DIRS.get(brand_dir.casefold())
+        if not brand:
+            continue
+        for gender_dir in sorted(os.listdir(os.path.join(root, brand_dir))):
+            gender = GENDER_DIRS.get(gender_dir.casefold())
+            if not gender:
+                continue
+            gender_path = os.path.join(root, brand_dir, gender_dir)
+            for category in sorted(os.listdir(gender_path)):
+                category_path = os.path.join(gender_path, category)
+                if not os.path.isdir(category_path):
+                    continue
+                for entry in os.scandir(category_path):
+                    if entry.is_file() and entry.name.endswith((".html", ".htm")):
+                        stat = entry.stat()
+                        yield (entry.path, brand, gender, category), stat.st_mtime, stat.st_size
+
+
+def open_catalog_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    for statement in SCHEMA:
+        conn.execute(statement)
+    return conn
+
+
+UPSERT = '''
+INSERT INTO catalog_products (url, brand, gender, category, name, price, price_value, image, source_file, updated_at)
+VALUES (:url, :brand, :gender, :category, :name, :price, :price_value, :image, :source_file, :updated_at)
+ON CONFLICT(url) DO UPDATE SET
+    brand = excluded.brand, gender = excluded.gender, category = excluded.category,
+    name = excluded.name, price = excluded.price, price_value = excluded.price_value,
+    image = excluded.image, source_file = excluded.source_file, updated_at = excluded.updated_at
+WHERE (catalog_products.name, catalog_products.price, catalog_products.image, catalog_products.category)
+   IS NOT (excluded.name, excluded.price, excluded.image, excluded.category)
+'''
+
+
+def ingest(root, db_path, workers=None, full=False, batch_size=500):
+    """Değişen dosyaları paralel parse edip URL anahtarıyla upsert et; istatistik döndürür"""
+    conn = open_catalog_db(db_path)
+    known = {} if full else {
+        path: (mtime, size) for path, mtime, size in conn.execute("SELECT path, mtime, size FROM ingested_files")
+    }
+
+    jobs, file_meta = [], {}
+    skipped = 0
+    for job, mtime, size in discover_files(root):
+        if known.get(job[0]) == (mtime, size):
+            skipped += 1
+            continue
+        jobs.append(job)
+        file_meta[job[0]] = (mtime, size)
+
+    stats = {"files": len(jobs), "skipped_files": skipped, "products": 0, "changed": 0, "errors": 0}
+    if not jobs:
+        conn.close()
+        return stats
+
+    def write(rows, files):
+        with conn:
+            before = conn.total_changes
+            conn.executemany(UPSERT, rows)
+            stats["changed"] += conn.total_changes - before
+            conn.executemany(
+                "INSERT OR REPLACE INTO ingested_files (path, mtime, size, products) VALUES (?, ?, ?, ?)", files
+            )
+
+    workers = workers or os.cpu_count() or 1
+    rows, files = [], []
+    now = time.time()
+    # İşçiler sadece parse eder; tek yazıcı sonuçları akış halinde toplu yazar
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, products, error in pool.map(_parse_file, jobs, chunksize=max(1, min(64, len(jobs) // (workers * 4)))):
+            if error:
+                stats["errors"] += 1
+                print(f"⚠️ {path}: {error}")
+                continue
+            for product in products:
+                product['source_file'] = path
+                product['updated_at'] = now
+            rows.extend(products)
+            files.append((path, *file_meta[path], len(products)))
+            stats["products"] += len(products)
+            if len(rows) >= batch_size:
+                write(rows, files)
+                rows, files = [], []
+    if rows or files:
+        write(rows, files)
+    conn.close()
+    return stats
+
+
+def export_json(db_path, json_path):
+    """Backend'in yüklediği product_catalog.json biçiminde dışa aktar"""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.row_factory = sqlite3.Row
+        products = [
+            {field: row[field] for field in CATALOG_FIELDS}
+            for row in conn.execute(
+                f"SELECT {', '.join(CATALOG_FIELDS)} FROM catalog_products ORDER BY brand, gender, category, rowid"
+            )
+        ]
+    finally:
+        conn.close()
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"products": products}, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, json_path)
+    return len(products)
+
+
+def write_fixtures(root, files, products_per_file=40, padding_kb=40):
+    """Benchmark için marka yapılarına uygun sahte listeleme sayfaları üret"""
+    brand_dirs = {'Zara': 'zara', 'Trendyol': 'trendyol', 'H&M': 'hm', 'Bershka': 'bershka'}
+    categories = ['bel_vurgulu_elbise', 'yuksek_bel_pantolon', 'basic_tshirt', 'regular_fit', 'v_neck']
+    # Gerçek sayfalardaki menü/script kalabalığı: SoupStrainer bunu atlar
+    padding = ('<nav><ul>' + '<li><a href="/k">Kategori</a></li>' * 20 + '</ul></nav>'
+               '<script>var x = "' + 'a' * 1000 + '";</script>') * max(1, padding_kb // 2)
+    sku = 0
+    for index in range(files):
+        brand = list(BRAND_LAYOUTS)[index % 4]
+        layout = BRAND_LAYOUTS[brand]
+        gender = 'kadin' if index % 3 else 'erkek'
+        category = categories[index % len(categories)]
+        directory = os.path.join(root, brand_dirs[brand], gender, category)
+        os.makedirs(directory, exist_ok=True)
+
+        cards = []
+        for _ in range(products_per_file):
+            sku += 1
+            price = f"{(sku % 2000) + 99:,}".replace(",", ".") + ",95 TL"
+
+            def element(spec, content="", **attrs):
+                tag, css_class = spec
+                attr_text = "".join(f' {k}="{v}"' for k, v in attrs.items())
+                class_text = f' class="{css_class}"' if css_class else ""
+                return f"<{tag}{class_text}{attr_text}>{content}</{tag}>" if tag != "img" else f"<img{class_text}{attr_text}>"
+
+            link = element(layout['link'], element(layout['image'], src=f"/img/{sku}.jpg"), href=f"/p/{sku}")
+            cards.append(element(layout['card'],
+                                 link + element(layout['name'], f"Ürün {sku}") + element(layout['price'], price)))
+        with open(os.path.join(directory, f"sayfa{index}.html"), "w", encoding="utf-8") as f:
+            f.write(f"<html><body>{padding}<main>{''.join(cards)}</main>{padding}</body></html>")
+
+
+def benchmark(files, workers=None):
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as root:
+        pages = os.path.join(root, "pages")
+        write_fixtures(pages, files)
+        db_path = os.path.join(root, "catalog.db")
+        print(f"=== KATALOG INGEST BENCHMARK ({files} dosya, {os.cpu_count()} CPU) ===")
+
+        # Eski yöntem: tüm sayfayı parse et (SoupStrainer yok), tek işlem
+        sample = [job for job, _, _ in discover_files(pages)][:200]
+        start = time.perf_counter()
+        for path, brand, gender, category in sample:
+            with open(path, encoding="utf-8") as f:
+                soup = BeautifulSoup(f.read(), "html.parser")
+            card_tag, card_class = BRAND_LAYOUTS[brand]['card']
+            soup.find_all(card_tag, class_=card_class)
+        full_parse = (time.perf_counter() - start) / len(sample) * 1000
+
+        start = time.perf_counter()
+        for job in sample:
+            _parse_file(job)
+        strained = (time.perf_counter() - start) / len(sample) * 1000
+        print(f"Dosya başına parse: tam {full_parse:.1f} ms, SoupStrainer {strained:.1f} ms "
+              f"({full_parse / strained:.1f}x)")
+
+        for worker_count in sorted({1, workers or os.cpu_count() or 1}):
+            if os.path.exists(db_path):
+                os.remove(db_path)
+            start = time.perf_counter()
+            stats = ingest(pages, db_path, workers=worker_count)
+            elapsed = time.perf_counter() - start
+            print(f"{worker_count} işçi: {elapsed:.2f} sn, {stats['files'] / elapsed:.0f} dosya/sn, "
+                  f"{stats['products'] / elapsed:,.0f} ürün/sn ({stats['products']:,} ürün)")
+
+        start = time.perf_counter()
+        stats = ingest(pages, db_path)
+        print(f"Değişiklik yokken tekrar: {time.perf_counter() - start:.2f} sn, {stats['skipped_files']} dosya atlandı")
+
+        json_path = os.path.join(root, "product_catalog.json")
+        count = export_json(db_path, json_path)
+        from product_catalog import ProductCatalog
+        for path in (db_path, json_path):
+            start = time.perf_counter()
+            catalog = ProductCatalog.load(path)
+            assert len(catalog) == count
+            print(f"Backend yükleme ({os.path.basename(path)}): {(time.perf_counter() - start) * 1000:.0f} ms, "
+                  f"{len(catalog):,} ürün")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kaydedilmiş marka sayfalarından ürün kataloğu oluştur")
+    parser.add_argument("root", nargs="?", help="<marka>/<cinsiyet>/<kategori>/*.html kök dizini")
+    parser.add_argument("--db", default="catalog.db", help="SQLite katalog deposu (URL ile upsert)")
+    parser.add_argument("--export-json", help="Backend için product_catalog.json yaz")
+    parser.add_argument("--workers", type=int, default=None, help="İşlem sayısı (varsayılan: CPU sayısı)")
+    parser.add_argument("--full", action="store_true", help="Değişmemiş dosyaları da yeniden işle")
+    parser.add_argument("--benchmark", type=int, metavar="DOSYA", help="Sahte sayfalarla benchmark çalıştır")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.workers)
+        return
+    if not args.root:
+        parser.error("kök dizin gerekli")
+
+    start = time.perf_counter()
+    stats = ingest(args.root, args.db, workers=args.workers, full=args.full)
+    print(f"✅ {stats['files']} dosya işlendi ({stats['skipped_files']} değişmemiş atlandı), "
+          f"{stats['products']} ürün, {stats['changed']} satır değişti, {stats['errors']} hata "
+          f"- {time.perf_counter() - start:.2f} sn")
+    if args.export_json:
+        count = export_json(args.db, args.export_json)
+        print(f"📦 {args.export_json}: {count} ürün")
+
+
+if __name__ == "__main__":
+    main()
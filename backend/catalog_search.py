@@ -0,0 +1,291 @@
+import heapq
+import math
+import threading
+
+import numpy as np
+
+from text_utils import tokenize
+
+# BM25 parametreleri
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Kullanıcılar Türkçe karaktersiz de yazar: 'gomlek' == 'gömlek'
+_ASCII_FOLD = str.maketrans("çğıöşü", "cgiosu")
+
+# Hafif kök bulma: sık çekim ekleri (ASCII katlanmış), uzundan kısaya
+_SUFFIXES = sorted((
+    "larin", "lerin", "lari", "leri", "lar", "ler",
+    "nin", "nun", "dan", "den", "tan", "ten",
+    "da", "de", "ta", "te", "in", "un", "yi", "yu", "si", "su", "i", "u"
+), key=len, reverse=True)
+MIN_STEM = 3
+
+
+def normalize_token(token):
+    """'gömlekleri' -> 'gomlek', 'elbiseler' -> 'elbise' (en fazla iki ek atılır)"""
+    term = token.translate(_ASCII_FOLD)
+    for _ in range(2):
+        for suffix in _SUFFIXES:
+            if term.endswith(suffix) and len(term) - len(suffix) >= MIN_STEM:
+                term = term[:-len(suffix)]
+                break
+        else:
+            break
+    return term
+
+
+def analyze(text):
+    return [normalize_token(token) for token in tokenize(text)]
+
+
+# Artımlı eklenen/silinen ürün oranı bunu geçince segment yeniden kurulur
+COMPACT_RATIO = 0.1
+COMPACT_MIN_DOCS = 1000
+
+
+class CatalogSearchIndex:
+    """Katalog ürün adları + kategorileri + markası üzerinde bellek içi ters indeks, BM25 skorlama.
+
+    Ana segment: terim başına NumPy posting dizileri (doc, tf) - skorlama vektörel,
+    sadece sorgu terimlerinin posting'leri gezilir. Sonradan eklenenler küçük bir dict
+    segmentinde tutulur, silinenler maskelenir; oran büyüyünce segment yeniden kurulur.
+    """
+
+    def __init__(self, products=(), compact_ratio=COMPACT_RATIO):
+        self.compact_ratio = compact_ratio
+        self._lock = threading.Lock()
+        self._build_segment(list(products))
+
+    @staticmethod
+    def _document_terms(product):
+        # Kategori alt çizgili ('bel_vurgulu_elbise') - tokenize kelimelere ayırır
+        terms = analyze(f"{product.name} {product.category} {product.brand}")
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        return counts, len(terms)
+
+    def _build_segment(self, products):
+        postings = {}
+        lengths = np.zeros(len(products), dtype=np.float32)
+        for index, product in enumerate(products):
+            counts, lengths[index] = self._document_terms(product)
+            for term, tf in counts.items():
+                entry = postings.setdefault(term, ([], []))
+                entry[0].append(index)
+                entry[1].append(tf)
+
+        self._segment = products
+        self._positions = {product.product_id: index for index, product in enumerate(products)}
+        self._postings = {
+            term: (np.asarray(ids, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for term, (ids, tfs) in postings.items()
+        }
+        self._lengths = lengths
+        self._alive = np.ones(len(products), dtype=bool)
+        # Filtreler için kod dizileri (-1: bilinmeyen)
+        self._gender_codes = {g: i for i, g in enumerate(sorted({p.gender for p in products if p.gender}))}
+        self._brand_codes = {b: i for i, b in enumerate(sorted({p.brand for p in products if p.brand}))}
+        self._genders = np.asarray([self._gender_codes.get(p.gender, -1) for p in products], dtype=np.int16)
+        self._brands = np.asarray([self._brand_codes.get(p.brand, -1) for p in products], dtype=np.int16)
+
+        self._delta_postings = {}  # terim -> {product_id: tf}
+        self._delta_docs = {}  # product_id -> (ürün, terimler, uzunluk)
+        self._deleted = 0
+        self._count = len(products)
+        self._total_length = float(lengths.sum())
+
+    def add(self, product):
+        """Ürünü indekse ekle (aynı product_id varsa önce çıkarılır)"""
+        counts, length = self._document_terms(product)
+        with self._lock:
+            self._remove(product.product_id)
+            for term, tf in counts.items():
+                self._delta_postings.setdefault(term, {})[product.product_id] = tf
+            self._delta_docs[product.product_id] = (product, counts, length)
+            self._count += 1
+            self._total_length += length
+            self._maybe_compact()
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+            self._maybe_compact()
+
+    def _remove(self, product_id):
+        position = self._positions.get(product_id)
+        if position is not None and self._alive[position]:
+            self._alive[position] = False
+            self._deleted += 1
+            self._count -= 1
+            self._total_length -= float(self._lengths[position])
+            return
+        entry = self._delta_docs.pop(product_id, None)
+        if entry is None:
+            return
+        _, counts, length = entry
+        self._count -= 1
+        self._total_length -= length
+        for term in counts:
+            postings = self._delta_postings[term]
+            del postings[product_id]
+            if not postings:
+                del self._delta_postings[term]
+
+    def _maybe_compact(self):
+        threshold = max(COMPACT_MIN_DOCS, self.compact_ratio * len(self._segment))
+        if len(self._delta_docs) + self._deleted > threshold:
+            live = [p for i, p in enumerate(self._segment) if self._alive[i]]
+            live.extend(product for product, _, _ in self._delta_docs.values())
+            self._build_segment(live)
+
+    def search(self, query, gender=None, brand=None, limit=6):
+        """BM25 ile en iyi `limit` ürün: [(ürün, skor)] (yüksekten düşüğe)"""
+        terms = set(analyze(query))
+        with self._lock:
+            count = self._count
+            if not terms or not count or limit <= 0:
+                return []
+            average_length = self._total_length / count
+            results = []
+
+            # Ana segment: vektörel BM25 (silinenler df'de sıkıştırmaya kadar sayılır)
+            query_postings = [(term, self._postings[term]) for term in terms if term in self._postings]
+            if query_postings:
+                scores = np.zeros(len(self._segment), dtype=np.float32)
+                for term, (ids, tfs) in query_postings:
+                    df = len(ids) + len(self._delta_postings.get(term, ()))
+                    idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[ids] / average_length)
+                    scores[ids] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+
+                mask = self._alive
+                if gender:
+                    mask = mask & (self._genders == self._gender_codes.get(gender, -2))
+                if brand:
+                    mask = mask & (self._brands == self._brand_codes.get(brand, -2))
+                candidates = np.flatnonzero((scores > 0) & mask)
+                if len(candidates) > limit:
+                    candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+                results.extend((self._segment[i], float(scores[i])) for i in candidates)
+
+            # Artımlı eklenenler: küçük dict segmenti
+            delta_scores = {}
+            for term in terms:
+                postings = self._delta_postings.get(term)
+                if not postings:
+                    continue
+                segment_ids = self._postings.get(term)
+                df = len(postings) + (len(segment_ids[0]) if segment_ids is not None else 0)
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                for product_id, tf in postings.items():
+                    product, _, length = self._delta_docs[product_id]
+                    if (gender and product.gender != gender) or (brand and product.brand != brand):
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                    delta_scores[product_id] = delta_scores.get(product_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+            results.extend((self._delta_docs[product_id][0], score) for product_id, score in delta_scores.items())
+
+        return heapq.nlargest(limit, results, key=lambda item: item[1])
+
+    def __len__(self):
+        return self._count
+
+    def stats(self):
+        return {
+            "documents": self._count,
+            "terms": len(self._postings),
+            "segment_documents": len(self._segment),
+            "delta_documents": len(self._delta_docs),
+            "deleted_documents": self._deleted
+        }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(catalog):
+    """Katalog başına tek arama indeksi (ilk çağrıda kurulur)"""
+    entry = _indexes.get(id(catalog))
+    if entry is None or entry[0] is not catalog:
+        with _indexes_lock:
+            entry = _indexes.get(id(catalog))
+            if entry is None or entry[0] is not catalog:
+                entry = (catalog, CatalogSearchIndex(catalog))
+                _indexes[id(catalog)] = entry
+    return entry[1]
+
+
+# Test ve benchmark için: python catalog_search.py [ürün_sayısı]
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+
+    from product_catalog import CatalogProduct, ProductCatalog
+
+    assert normalize_token("gömlekleri") == "gomlek"
+    assert normalize_token("elbiseler") == "elbise"
+    assert normalize_token("pantolonlar") == "pantolon"
+    assert normalize_token("GÖMLEK".lower()) == normalize_token("gomlek")
+
+    catalog = ProductCatalog.load()
+    index = CatalogSearchIndex(catalog)
+    results = index.search("Düğün için bel vurgulu elbiseler arıyorum", gender="kadın", limit=3)
+    assert results and all(p.gender == "kadın" for p, _ in results), results
+    assert "elbise" in results[0][0].category, results
+    assert all(p.brand == "H&M" for p, _ in index.search("basic tişört", brand="H&M"))
+    assert all(p.gender == "erkek" for p, _ in index.search("gomlek", gender="erkek"))
+
+    # Artımlı güncelleme
+    first = next(iter(catalog))
+    index.remove(first.product_id)
+    assert first not in [p for p, _ in index.search(first.name, limit=50)]
+    index.add(first)
+    assert index.search(first.name, limit=1)[0][0] is first
+    assert index.stats()["delta_documents"] == 1 and len(index) == len(catalog)
+    # Eşik aşılınca eklenenler ana segmente taşınır
+    extra = [CatalogProduct(len(catalog) + i, "Zara", "kadın", "etek", f"Yeni Etek {i}", "", "", "")
+             for i in range(COMPACT_MIN_DOCS + 1)]
+    for product in extra:
+        index.add(product)
+    stats = index.stats()
+    assert stats["segment_documents"] > len(catalog) and stats["deleted_documents"] == 0, stats
+    assert len(index) == len(catalog) + len(extra)
+    assert index.search("etek", brand="Zara", limit=1)[0][0].name.startswith("Yeni Etek")
+    print("✅ Testler geçti")
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = random.Random(42)
+    words = ["elbise", "gömlek", "pantolon", "tişört", "ceket", "mont", "etek", "kazak", "jean",
+             "midi", "mini", "slim", "fit", "regular", "oversize", "keten", "pamuk", "saten",
+             "siyah", "beyaz", "lacivert", "bej", "kırmızı", "yeşil", "çizgili", "desenli", "basic"]
+    categories = ["bel_vurgulu_elbise", "yuksek_bel_pantolon", "basic_tshirt", "regular_fit",
+                  "v_neck", "fitted_gomlek", "wrap_dress", "flowy_top"]
+    big = ProductCatalog.from_records(
+        {"brand": rng.choice(['Zara', 'Trendyol', 'H&M', 'Bershka']),
+         "gender": rng.choice(['kadın', 'erkek']), "category": rng.choice(categories),
+         "name": " ".join(rng.sample(words, 4)).title(), "price": "299.99 TL",
+         "image": "", "url": f"https://example.com/{i}"}
+        for i in range(total)
+    )
+    start = time.perf_counter()
+    big_index = CatalogSearchIndex(big)
+    print(f"=== ARAMA BENCHMARK ({total:,} ürün, {big_index.stats()['terms']} terim) ===")
+    print(f"İndeks kurulumu: {time.perf_counter() - start:.2f} sn")
+
+    queries = [
+        ("Siyah keten gömlek arıyorum", {"gender": "erkek"}),
+        ("Düğün için saten midi elbise önerir misin?", {"gender": "kadın"}),
+        ("oversize kazak", {"gender": "kadın", "brand": "Zara"}),
+        ("Bu hafta sonu için rahat bir şeyler", {})
+    ]
+    for query, filters in queries:
+        runs = 200
+        start = time.perf_counter()
+        for _ in range(runs):
+            hits = big_index.search(query, limit=6, **filters)
+        elapsed = (time.perf_counter() - start) / runs * 1000
+        print(f"{query[:40]:40s} {filters}: {elapsed:.3f} ms, {len(hits)} sonuç")
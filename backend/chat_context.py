@@ -0,0 +1,108 @@
+import os
+from conversation_store import compress_turn
+
+# Sohbet geçmişi için prompt bütçesi (yaklaşık token)
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "800"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "250"))
+# Pencere dışında bu kadar özetlenmemiş token birikince özet Gemini ile yenilenir
+CHAT_SUMMARY_REFRESH_TOKENS = int(os.getenv("CHAT_SUMMARY_REFRESH_TOKENS", "300"))
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Kaba token tahmini (~4 karakter/token) - tokenizer çağrısı yapmadan"""
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def _truncate_to_tokens(text, tokens):
+    max_chars = tokens * CHARS_PER_TOKEN
+    # Kayan özette en yeni kısım daha değerli - sondan kes
+    return text if len(text) <= max_chars else "…" + text[-(max_chars - 1):]
+
+
+def _format_turn(message):
+    speaker = "Kullanıcı" if message.role == "user" else "Danışman"
+    return f"{speaker}: {message.content}"
+
+
+def select_context(conversation, budget_tokens=CHAT_CONTEXT_TOKENS, summary_tokens=CHAT_SUMMARY_TOKENS):
+    """Bütçeye sığan son turlar + pencere dışında kalan özetlenmemiş turlar.
+
+    Son mesaj (şu anki kullanıcı mesajı) geçmişe dahil edilmez.
+    (özet, son_turlar, özetlenmemiş_eski_turlar) döndürür.
+    """
+    history = list(conversation.messages)[:-1]
+    summary = _truncate_to_tokens(conversation.summary, summary_tokens) if conversation.summary else ""
+    remaining = budget_tokens - estimate_tokens(summary)
+
+    recent = []
+    start = len(history)
+    for index in range(len(history) - 1, -1, -1):
+        cost = estimate_tokens(history[index].content) + 2
+        if cost > remaining:
+            break
+        remaining -= cost
+        recent.append(history[index])
+        start = index
+    recent.reverse()
+
+    # Pencere dışında kalıp henüz özete girmemiş mesajlar
+    first_unsummarized = max(0, conversation.summarized_count - conversation.dropped_messages)
+    older = history[first_unsummarized:start]
+    return summary, recent, older
+
+
+def build_style_prompt(conversation, message, budget_tokens=CHAT_CONTEXT_TOKENS):
+    """Stil danışmanı prompt'u: özet + bütçeye sığan son turlar + yeni mesaj"""
+    summary, recent, older = select_context(conversation, budget_tokens)
+
+    if older:
+        # Özet henüz yenilenmediyse eski turları kısaltılmış haliyle ekle
+        extra = "\n".join(compress_turn(m) for m in older)
+        summary = _truncate_to_tokens(f"{summary}\n{extra}".strip(), CHAT_SUMMARY_TOKENS)
+
+    sections = ["Sen AURA AI Stil Danışmanısın."]
+    if summary:
+        sections.append(f"Önceki konuşmanın özeti:\n{summary}")
+    if recent:
+        sections.append("Son mesajlar:\n" + "\n".join(_format_turn(m) for m in recent))
+    sections.append(f'Kullanıcı diyor: "{message}"')
+    sections.append("Konuşmanın bağlamını dikkate alarak kısa, samimi ve yardımcı bir cevap ver. Türkçe.")
+    return "\n\n".join(sections)
+
+
+def needs_summary_refresh(conversation, budget_tokens=CHAT_CONTEXT_TOKENS):
+    if conversation.summary_pending:
+        return False
+    _, _, older = select_context(conversation, budget_tokens)
+    return sum(estimate_tokens(m.content) for m in older) >= CHAT_SUMMARY_REFRESH_TOKENS
+
+
+async def refresh_summary(conversation, generate_text, budget_tokens=CHAT_CONTEXT_TOKENS):
+    """Pencere dışına çıkan turları Gemini ile kayan özete katla (cevaptan sonra, arka planda)"""
+    summary, _, older = select_context(conversation, budget_tokens)
+    if not older:
+        return conversation.summary
+
+    # older[0]'ın mutlak sırası max(summarized_count, dropped_messages)
+    covered = max(conversation.summarized_count, conversation.dropped_messages) + len(older)
+    conversation.summary_pending = True
+    try:
+        prompt = (
+            "Aşağıdaki moda danışmanlığı konuşmasını kullanıcının tercihleri, bedenleri, "
+            f"bütçesi ve aradığı ürünler korunacak şekilde en fazla {CHAT_SUMMARY_TOKENS * 3 // 4} "
+            "kelimeyle Türkçe özetle.\n\n"
+            f"Mevcut özet:\n{summary or '-'}\n\nYeni mesajlar:\n" +
+            "\n".join(_format_turn(m) for m in older)
+        )
+        new_summary = await generate_text(prompt)
+        conversation.summary = _truncate_to_tokens(new_summary.strip(), CHAT_SUMMARY_TOKENS)
+    except Exception as e:
+        # Gemini yoksa yerel sıkıştırmaya düş - tur kaybolmasın
+        print(f"⚠️ Sohbet özeti hatası: {e}")
+        conversation.fold_into_summary(older)
+    finally:
+        conversation.summarized_count = max(conversation.summarized_count, covered)
+        conversation.summary_pending = False
+    return conversation.summary
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class Message:
+    """Tek sohbet mesajı - dict yerine __slots__ ile küçük bellek izi"""
+
+    __slots__ = ("role", "content", "timestamp")
+
+    def __init__(self, role, content, timestamp=None):
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    def to_dict(self):
+        return {"role": self.role, "content": self.content, "timestamp": self.timestamp}
+
+
+# Özetlenmeden düşen mesajlar özete bu uzunlukta eklenir; özet bu sınırı geçmez
+COMPRESSED_TURN_CHARS = 120
+MAX_SUMMARY_CHARS = 2000
+
+
+def compress_turn(message, max_chars=COMPRESSED_TURN_CHARS):
+    """Mesajı özet için tek satıra sıkıştır"""
+    speaker = "Kullanıcı" if message.role == "user" else "Danışman"
+    content = " ".join(message.content.split())
+    if len(content) > max_chars:
+        content = content[:max_chars - 1] + "…"
+    return f"{speaker}: {content}"
+
+
+class Conversation:
+    """Mesaj sayısı sınırlı sohbet; sınır aşılınca en eski mesajlar özete katlanıp düşer"""
+
+    __slots__ = ("conversation_id", "messages", "detected_gender", "last_access", "dropped_messages",
+                 "summary", "summarized_count", "summary_pending")
+
+    def __init__(self, conversation_id, max_messages, detected_gender=None):
+        self.conversation_id = conversation_id
+        self.messages = deque(maxlen=max_messages)
+        self.detected_gender = detected_gender  # mesajlardan çıkarılan cinsiyet; None = bilinmiyor
+        self.last_access = time.time()
+        self.dropped_messages = 0
+        self.summary = ""  # eski mesajların kayan özeti
+        self.summarized_count = 0  # özete katlanmış mesaj sayısı (baştan itibaren)
+        self.summary_pending = False
+
+    def add(self, role, content):
+        if len(self.messages) == self.messages.maxlen:
+            # Henüz özetlenmemiş mesaj düşecekse kaybolmasın, yerel olarak özete ekle
+            if self.dropped_messages >= self.summarized_count:
+                self.fold_into_summary([self.messages[0]])
+                self.summarized_count = self.dropped_messages + 1
+            self.dropped_messages += 1
+        self.messages.append(Message(role, content))
+        self.last_access = time.time()
+
+    def fold_into_summary(self, messages):
+        lines = [self.summary] if self.summary else []
+        lines.extend(compress_turn(m) for m in messages)
+        self.summary = "\n".join(lines)[-MAX_SUMMARY_CHARS:]
+
+    def to_dict(self):
+        return {
+            "messages": [m.to_dict() for m in self.messages],
+            "detected_gender": self.detected_gender,
+            "dropped_messages": self.dropped_messages,
+            "summary": self.summary,
+            "summarized_count": self.summarized_count
+        }
+
+    @classmethod
+    def from_dict(cls, conversation_id, data, max_messages):
+        conversation = cls(conversation_id, max_messages, data.get("detected_gender"))
+        for m in data.get("messages", []):
+            conversation.messages.append(Message(m["role"], m["content"], m.get("timestamp")))
+        conversation.dropped_messages = data.get("dropped_messages", 0)
+        conversation.summary = data.get("summary", "")
+        conversation.summarized_count = data.get("summarized_count", 0)
+        return conversation
+
+
+class ConversationStore:
+    """Sınırlı sohbet deposu: mesaj limiti, boşta kalma TTL'i, global LRU ve opsiyonel SQLite soğuk katman"""
+
+    def __init__(self, max_conversations=1000, max_messages=50, idle_ttl=1800, cold_db_path=None,
+                 cold_ttl=7 * 86400, cold_max_entries=None, cold_purge_every=100):
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        # Soğuk katman da sınırlı: cold_ttl'den eski ve sınırı aşan en eski sohbetler silinir
+        self.cold_ttl = cold_ttl
+        self.cold_max_entries = cold_max_entries or max_conversations * 10
+        self.cold_purge_every = cold_purge_every
+        self._conversations = OrderedDict()  # en az kullanılan başta
+        self._lock = threading.Lock()
+        self.lru_evictions = 0
+        self.idle_evictions = 0
+        self.cold_writes = 0
+        self.cold_restores = 0
+        self.cold_evictions = 0
+        self._cold = None
+
+        if cold_db_path:
+            try:
+                self._cold = sqlite3.connect(cold_db_path, check_same_thread=False)
+                self._cold.execute('''
+                CREATE TABLE IF NOT EXISTS cold_conversations (
+                    conversation_id TEXT PRIMARY KEY,
+                    data TEXT,
+                    last_access REAL
+                )
+                ''')
+                self._cold.execute(
+                    'CREATE INDEX IF NOT EXISTS idx_cold_conversations_access ON cold_conversations (last_access)'
+                )
+                self._cold.commit()
+                self._purge_cold(time.time())
+            except Exception as e:
+                print(f"⚠️ Sohbet soğuk katmanı açılamadı: {e}")
+                self._cold = None
+
+    def get_or_create(self, conversation_id):
+        """Sohbeti getir (gerekirse soğuk katmandan geri yükle) ya da yeni oluştur"""
+        now = time.time()
+        with self._lock:
+            evicted = self._evict_idle(now)
+
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                conversation = self._restore(conversation_id)
+                if conversation is None:
+                    conversation = Conversation(conversation_id, self.max_messages)
+                self._conversations[conversation_id] = conversation
+                evicted.extend(self._evict_lru())
+            else:
+                self._conversations.move_to_end(conversation_id)
+
+            conversation.last_access = now
+            # Kilit içinde: arşivlenmeden aynı sohbet geri yüklenmeye çalışılmasın
+            self._archive(evicted)
+            return conversation
+
+    async def aget_or_create(self, conversation_id):
+        """get_or_create() - soğuk katman varsa SQLite okuma/yazması event loop dışında"""
+        if not self._cold:
+            return self.get_or_create(conversation_id)
+        return await asyncio.to_thread(self.get_or_create, conversation_id)
+
+    def _evict_idle(self, now):
+        # Sıra son erişime göre olduğu için boşta kalanlar hep baştadır
+        evicted = []
+        while self._conversations:
+            conversation_id, conversation = next(iter(self._conversations.items()))
+            if now - conversation.last_access < self.idle_ttl:
+                break
+            del self._conversations[conversation_id]
+            evicted.append(conversation)
+            self.idle_evictions += 1
+        return evicted
+
+    def _evict_lru(self):
+        evicted = []
+        while len(self._conversations) > self.max_conversations:
+            _, conversation = self._conversations.popitem(last=False)
+            evicted.append(conversation)
+            self.lru_evictions += 1
+        return evicted
+
+    def _archive(self, conversations):
+        """Tahliye edilen sohbetleri tek transaction'da soğuk katmana yaz"""
+        if not self._cold or not conversations:
+            return
+        try:
+            with self._cold:
+                self._cold.executemany(
+                    'INSERT OR REPLACE INTO cold_conversations (conversation_id, data, last_access) VALUES (?, ?, ?)',
+                    [(c.conversation_id, json.dumps(c.to_dict(), ensure_ascii=False), c.last_access)
+                     for c in conversations]
+                )
+            before = self.cold_writes
+            self.cold_writes += len(conversations)
+            if before // self.cold_purge_every != self.cold_writes // self.cold_purge_every:
+                self._purge_cold(time.time())
+        except Exception as e:
+            print(f"⚠️ Sohbet arşivleme hatası: {e}")
+
+    def _purge_cold(self, now):
+        """cold_ttl'den eski ve sınırı aşan en eski arşivli sohbetleri sil"""
+        with self._cold:
+            expired = self._cold.execute(
+                'DELETE FROM cold_conversations WHERE last_access <= ?', (now - self.cold_ttl,)
+            ).rowcount
+            overflow = self._cold.execute('SELECT COUNT(*) FROM cold_conversations').fetchone()[0] - self.cold_max_entries
+            if overflow > 0:
+                self._cold.execute('''
+                DELETE FROM cold_conversations WHERE conversation_id IN (
+                    SELECT conversation_id FROM cold_conversations ORDER BY last_access LIMIT ?
+                )
+                ''', (overflow,))
+        self.cold_evictions += max(0, expired) + max(0, overflow)
+
+    def _restore(self, conversation_id):
+        if not self._cold:
+            return None
+        try:
+            with self._cold:
+                row = self._cold.execute(
+                    'SELECT data FROM cold_conversations WHERE conversation_id = ?', (conversation_id,)
+                ).fetchone()
+                if not row:
+                    return None
+                self._cold.execute('DELETE FROM cold_conversations WHERE conversation_id = ?', (conversation_id,))
+            self.cold_restores += 1
+            return Conversation.from_dict(conversation_id, json.loads(row[0]), self.max_messages)
+        except Exception as e:
+            print(f"⚠️ Sohbet geri yükleme hatası: {e}")
+            return None
+
+    def __len__(self):
+        return len(self._conversations)
+
+    def stats(self):
+        with self._lock:
+            message_count = sum(len(c.messages) for c in self._conversations.values())
+            conversations = len(self._conversations)
+        return {
+            "conversations": conversations,
+            "messages": message_count,
+            "max_conversations": self.max_conversations,
+            "max_messages": self.max_messages,
+            "idle_ttl": self.idle_ttl,
+            "lru_evictions": self.lru_evictions,
+            "idle_evictions": self.idle_evictions,
+            "cold_enabled": self._cold is not None,
+            "cold_writes": self.cold_writes,
+            "cold_restores": self.cold_restores,
+            "cold_evictions": self.cold_evictions
+        }
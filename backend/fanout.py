@@ -0,0 +1,145 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Marka aramaları için süre sınırları (saniye)
+BRAND_SEARCH_TIMEOUT = float(os.getenv("BRAND_SEARCH_TIMEOUT", "2.5"))
+BRAND_SEARCH_DEADLINE = float(os.getenv("BRAND_SEARCH_DEADLINE", "3.0"))
+# Bu süre içinde cevap gelmezse aynı isteğin ikinci kopyası başlatılır (hedged request)
+BRAND_HEDGE_DELAY = float(os.getenv("BRAND_HEDGE_DELAY", "0.8"))
+BRAND_MAX_ATTEMPTS = int(os.getenv("BRAND_MAX_ATTEMPTS", "2"))
+BRAND_SEARCH_WORKERS = int(os.getenv("BRAND_SEARCH_WORKERS", "16"))
+
+# Süresi dolan çağrılar iptal edilemez, thread'de biter - havuz paylaşılır ki birikmesin
+_executor = ThreadPoolExecutor(max_workers=BRAND_SEARCH_WORKERS, thread_name_prefix="brand-search")
+
+
+def hedged_fan_out(tasks, timeout=BRAND_SEARCH_TIMEOUT, deadline=BRAND_SEARCH_DEADLINE,
+                   hedge_delay=BRAND_HEDGE_DELAY, max_attempts=BRAND_MAX_ATTEMPTS, executor=None):
+    """tasks: {isim: fonksiyon}. Hepsini paralel çalıştır, ilk başarılı cevabı al.
+
+    - Her görev en fazla `timeout` saniye beklenir, tüm çağrı `deadline` ile sınırlı.
+    - `hedge_delay` içinde bitmeyen ya da hata veren görev için yeni deneme başlatılır
+      (toplam `max_attempts`); hangisi önce biterse o kullanılır.
+    - Zamanında bitmeyenler sonuçta yer almaz (kısmi sonuç).
+
+    (sonuçlar, durumlar) döndürür; durum: 'ok', 'error', 'timeout'.
+    """
+    executor = executor or _executor
+    start = time.monotonic()
+    end = start + deadline
+    per_task_end = {name: start + timeout for name in tasks}
+
+    results = {}
+    statuses = {}
+    errors = {}
+    attempts = {name: 1 for name in tasks}
+    last_launch = {name: start for name in tasks}
+    pending = {executor.submit(fn): name for name, fn in tasks.items()}
+
+    def launch(name):
+        attempts[name] += 1
+        last_launch[name] = time.monotonic()
+        pending[executor.submit(tasks[name])] = name
+
+    while pending:
+        now = time.monotonic()
+        open_names = {name for name in pending.values() if name not in statuses}
+        if not open_names:
+            break
+
+        # Bir sonraki uyanma: hedge zamanı, görev süresi ya da genel deadline
+        wake = end
+        for name in open_names:
+            wake = min(wake, per_task_end[name])
+            if attempts[name] < max_attempts:
+                wake = min(wake, last_launch[name] + hedge_delay)
+        done, _ = wait(list(pending), timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            name = pending.pop(future)
+            if name in statuses:
+                continue  # hedge kopyası kaybetti
+            try:
+                results[name] = future.result()
+                statuses[name] = "ok"
+            except Exception as e:
+                errors[name] = e
+                if attempts[name] < max_attempts and time.monotonic() < min(end, per_task_end[name]):
+                    launch(name)  # hata: hemen yeniden dene
+                elif name not in pending.values():
+                    statuses[name] = "error"
+
+        now = time.monotonic()
+        for name in {n for n in pending.values() if n not in statuses}:
+            if now >= per_task_end[name] or now >= end:
+                statuses[name] = "timeout"
+            elif attempts[name] < max_attempts and now - last_launch[name] >= hedge_delay:
+                launch(name)
+
+    # Kaybeden/süresi dolan denemeler arka planda biter; sonuçları yok sayılır
+    for name in tasks:
+        if name not in statuses:
+            statuses[name] = "error" if name in errors else "timeout"
+    return results, statuses
+
+
+# Benchmark için: python fanout.py
+if __name__ == "__main__":
+    delays = {'Zara': 0.30, 'Trendyol': 0.25, 'H&M': 0.35, 'Bershka': 0.20}
+
+    def fake_brand(name):
+        def search():
+            time.sleep(delays[name])
+            return [f"{name} ürün"]
+        return search
+
+    tasks = {name: fake_brand(name) for name in delays}
+
+    start = time.monotonic()
+    for name, fn in tasks.items():
+        fn()
+    sequential = time.monotonic() - start
+
+    start = time.monotonic()
+    results, statuses = hedged_fan_out(tasks, timeout=1.0, deadline=1.0, hedge_delay=0.5)
+    concurrent = time.monotonic() - start
+    assert set(results) == set(delays) and set(statuses.values()) == {"ok"}
+    print(f"Sıralı: {sequential * 1000:.0f} ms   paralel: {concurrent * 1000:.0f} ms")
+
+    # Yavaş marka: deadline'da kısmi sonuç
+    delays['H&M'] = 5.0
+    start = time.monotonic()
+    results, statuses = hedged_fan_out(tasks, timeout=0.6, deadline=1.0, hedge_delay=10)
+    elapsed = time.monotonic() - start
+    assert statuses['H&M'] == "timeout" and len(results) == 3, statuses
+    print(f"Yavaş marka: {elapsed * 1000:.0f} ms, durumlar: {statuses}")
+
+    # Hedge: ilk deneme takılır, ikinci kopya hızlı döner
+    calls = {"n": 0}
+
+    def flaky():
+        calls["n"] += 1
+        time.sleep(2.0 if calls["n"] == 1 else 0.05)
+        return ["hedge"]
+
+    start = time.monotonic()
+    results, statuses = hedged_fan_out({'Zara': flaky}, timeout=1.0, deadline=1.0, hedge_delay=0.2)
+    elapsed = time.monotonic() - start
+    assert results == {'Zara': ["hedge"]}, statuses
+    print(f"Hedge: {elapsed * 1000:.0f} ms (deneme: {calls['n']})")
+
+    # Hata: hemen yeniden denenir
+    calls["n"] = 0
+
+    def failing_once():
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise ConnectionError("bağlantı koptu")
+        return ["retry"]
+
+    results, statuses = hedged_fan_out({'Bershka': failing_once}, timeout=1.0, deadline=1.0)
+    assert results == {'Bershka': ["retry"]}, statuses
+    results, statuses = hedged_fan_out({'Bershka': lambda: 1 / 0}, timeout=1.0, deadline=1.0)
+    assert statuses == {'Bershka': "error"}, statuses
+    print("✅ Testler geçti")
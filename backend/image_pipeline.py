@@ -0,0 +1,234 @@
+import io
+import json
+import os
+import time
+import tempfile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Vision modeline gönderilecek görüntünün uzun kenarı ve JPEG kalitesi
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+# Upload sınırları - istek başına bellek kullanımı öngörülebilir kalsın
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 64 * 1024
+UPLOAD_SPOOL_BYTES = 1024 * 1024  # Bunun üstü diske taşar
+# Multipart sınırları/başlıkları için dosya boyutuna eklenen pay (istek gövdesi sınırı)
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(50_000_000)))
+
+# Decompression bomb koruması
+Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+
+# Saydam görseller JPEG'e bu zemin üzerinde düzleştirilir (convert("RGB") siyaha boyar)
+IMAGE_BACKGROUND = (255, 255, 255)
+
+# İlk byte'lara göre desteklenen formatlar
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp")
+)
+
+
+class UploadError(Exception):
+    """Upload reddedildi - endpoint HTTP hatasına çevirir"""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff_image_type(head):
+    """content_type yerine dosyanın ilk byte'larından görsel tipini bul"""
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def upload_too_large_detail(max_bytes=UPLOAD_MAX_BYTES):
+    return f"Dosya çok büyük (maksimum {max_bytes // (1024 * 1024)} MB)"
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+    """Upload endpoint'lerinde istek gövdesini multipart ayrıştırmadan önce sınırla.
+
+    Starlette form'u endpoint çalışmadan önce tamamen okuyup spool'lar; bu yüzden
+    sınır burada uygulanır: Content-Length büyükse gövde hiç okunmadan 413,
+    başlık yoksa/yanlışsa (chunked) okunan byte sayılır ve sınır aşılınca kesilir.
+    """
+
+    def __init__(self, app, max_bytes=UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD_BYTES, paths=()):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = frozenset(paths)
+        self.rejected = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # Form ayrıştırma hatası uygulamada 400'e dönüşebilir - yerine 413 gönderilir
+            if exceeded and not response_started:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _BodyTooLarge:
+            pass
+        if exceeded and not response_started:
+            await self._reject(send)
+
+    async def _reject(self, send):
+        self.rejected += 1
+        body = json.dumps({"detail": upload_too_large_detail()}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def read_upload_limited(upload, max_bytes=UPLOAD_MAX_BYTES, chunk_size=UPLOAD_CHUNK_BYTES):
+    """Upload'u parça parça spooled buffer'a oku; dosya sınırı aşarsa 413.
+
+    Erken red (gövde okunmadan) UploadSizeLimitMiddleware'de; burası sadece dosya
+    parçasının kesin boyutunu ve tipini kontrol eder.
+    (buffer, toplam_byte, mime_type) döndürür, buffer başa sarılmış olur.
+    """
+
+    buffer = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    total = 0
+    mime_type = None
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            if total == 0:
+                mime_type = sniff_image_type(chunk[:16])
+                if mime_type is None:
+                    raise UploadError(400, "Geçerli bir resim dosyası yükleyin")
+            total += len(chunk)
+            if total > max_bytes:
+                raise UploadError(413, upload_too_large_detail(max_bytes))
+            buffer.write(chunk)
+    except Exception:
+        buffer.close()
+        raise
+
+    if total == 0:
+        buffer.close()
+        raise UploadError(400, "Boş dosya yüklendi")
+
+    buffer.seek(0)
+    return buffer, total, mime_type
+
+
+class NormalizedImage:
+    """Ön işlenmiş görüntü ve ön işleme istatistikleri"""
+
+    __slots__ = ("image", "data", "mime_type", "stats")
+
+    def __init__(self, image, data, mime_type, stats):
+        self.image = image
+        self.data = data
+        self.mime_type = mime_type
+        self.stats = stats
+
+    def as_gemini_part(self):
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def flatten_to_rgb(image, background=IMAGE_BACKGROUND):
+    """RGB'ye çevir; saydam pikseller (RGBA, LA, saydam paletli P) beyaz zemine oturur"""
+    if image.mode == "RGB":
+        return image
+    if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        flattened = Image.new("RGB", image.size, background)
+        flattened.paste(image, mask=image.getchannel("A"))
+        return flattened
+    return image.convert("RGB")
+
+
+def normalize_image(source, max_edge=IMAGE_MAX_EDGE, quality=IMAGE_JPEG_QUALITY, original_bytes=None):
+    """EXIF döndürme, küçültme, metadata temizleme ve yeniden JPEG kodlama.
+
+    `source` byte dizisi ya da dosya benzeri nesne (ör. spooled buffer) olabilir.
+    CPU-yoğun: event loop'ta değil worker thread'de çağrılmalı.
+    """
+    start = time.perf_counter()
+    if isinstance(source, (bytes, bytearray)):
+        original_bytes = len(source)
+        source = io.BytesIO(source)
+    # Decode hataları (tanınmayan/kesik dosya, piksel sınırı) istemci hatası olarak döner
+    try:
+        image = Image.open(source)
+        original_format = image.format
+        original_size = image.size
+
+        # JPEG'i baştan düşük ölçekte decode et (1/2, 1/4, 1/8) - tam çözünürlüğe hiç açılmaz
+        if original_format == "JPEG":
+            image.draft("RGB", (max_edge, max_edge))
+
+        image = ImageOps.exif_transpose(image)
+        image = flatten_to_rgb(image)
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    except Image.DecompressionBombError:
+        raise UploadError(413, f"Görsel çözünürlüğü çok büyük (maksimum {IMAGE_MAX_PIXELS:,} piksel)")
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+        raise UploadError(400, "Görsel çözümlenemedi (bozuk ya da desteklenmeyen dosya)")
+
+    # exif/icc parametresi verilmediği için metadata yazılmaz
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    data = buffer.getvalue()
+
+    stats = {
+        "original_format": original_format,
+        "original_size": list(original_size),
+        "final_size": list(image.size),
+        "original_bytes": original_bytes,
+        "final_bytes": len(data),
+        "bytes_saved": original_bytes - len(data) if original_bytes is not None else None,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+    }
+    return NormalizedImage(image, data, "image/jpeg", stats)
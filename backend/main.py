@@ -1,42 +1,39 @@
 from fastapi import FastAPI, HTTPException, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
-import google.generativeai as genai
-from PIL import Image
-import io
+import asyncio
 import os
 import uuid
 import time
 import json
 import re
-import sqlite3
 from datetime import datetime, timedelta
 from collections import Counter
-from dotenv import load_dotenv
-
-# Environment variables yükle
-load_dotenv()
-
-# GEMINI_API_KEY kontrolü
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_AVAILABLE = False
-
-if GEMINI_API_KEY:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        vision_model = genai.GenerativeModel('gemini-1.5-flash')
-        GEMINI_AVAILABLE = True
-        print("✅ Gemini Vision AI aktif - Gerçek analiz hazır!")
-    except Exception as e:
-        print(f"⚠️ Gemini API hatası: {e}")
-        GEMINI_AVAILABLE = False
-else:
-    print("⚠️ GEMINI_API_KEY bulunamadı - AI özellikleri sınırlı!")
+from ai_client import ai_client, GEMINI_AVAILABLE
+from trend_buffer import TrendWriteBuffer
+from trend_store import TrendStore, default_trends_db_path, index_categories
+from text_utils import turkish_lower
+from trend_rollups import TrendRollups
+from conversation_store import ConversationStore
+from chat_context import build_style_prompt, needs_summary_refresh, refresh_summary
+from response_cache import TTLCache, AsyncRefreshCache, make_cache_key, bucket_value
+from size_engine import recommend_size, format_recommendation, needs_escalation, DEFAULT_MIN_CONFIDENCE
+from photo_cache import PerceptualHashCache, image_fingerprint
+from image_pipeline import normalize_image, read_upload_limited, UploadError, UploadSizeLimitMiddleware
+from product_catalog import get_catalog, parse_price_kurus, parse_price_range_kurus, tl_to_kurus
+from catalog_search import get_search_index
+from similar_products import get_similarity_index
+from body_cues import detect_body_info, explicit_gender
+from product_ranker import get_ranker
+from product_scraper import BODY_TYPE_RECOMMENDATIONS
 
 app = FastAPI()
 
+# Büyük upload'lar multipart ayrıştırılmadan reddedilsin (CORS'tan önce eklenir: 413 de CORS başlıklı)
+app.add_middleware(UploadSizeLimitMiddleware, paths=("/analyze-photo",))
+
 # CORS ayarları - Vercel için güncellenmiş
 app.add_middleware(
     CORSMiddleware,
@@ -48,8 +45,22 @@ app.add_middleware(
 
 # Basit product scraper (import yerine burada tanımlayacağız)
 class ProductScraper:
+    def search_catalog(self, search_query, gender, limit=8):
+        """Katalogda BM25 arama - uyum yüzdesi en iyi sonuca göre"""
+        hits = get_search_index(get_catalog()).search(search_query, gender=gender, limit=limit)
+        if not hits:
+            return []
+        best = hits[0][1]
+        return [
+            product.to_dict(brand=product.brand, match_score=max(1, round(100 * score / best)))
+            for product, score in hits
+        ]
+
     def search_real_products_web(self, search_query, gender, limit=8):
-        # Mock data - gerçek scraper yerine
+        # Önce katalog indeksi; eşleşme yoksa mock data
+        products = self.search_catalog(search_query, gender, limit)
+        if products:
+            return products
         mock_products = [
             {
                 "name": f"{search_query} - Trend Ürün",
@@ -82,176 +93,250 @@ class ProductScraper:
         ]
         return mock_products[:limit]
     
-    def get_products_by_brand(self, brand, category, analysis_text, limit=6):
-        mock_products = [
-            {
-                "name": f"{brand} - {category} Önerisi 1",
-                "brand": brand,
-                "price": "99-199 TL",
-                "image": f"https://via.placeholder.com/300x400/45B7D1/FFFFFF?text={brand}",
-                "link": f"https://{brand.lower().replace(' ', '').replace('&', '')}.com"
-            },
-            {
-                "name": f"{brand} - {category} Önerisi 2", 
+    def get_products_by_brand(self, brand, category, analysis_text, limit=6, min_kurus=None, max_kurus=None):
+        # Katalogda marka varsa vücut tipi uyumuna göre sıralı (fiyat aralığı içinde), yoksa mock data
+        # Katalog dilimi istek kategorisinden; analiz metninden sadece vücut tipi alınır
+        _, body_type = detect_body_info(analysis_text)
+        gender = PRODUCT_GENDERS.get(category, category)
+        catalog = get_catalog()
+        if catalog.has(brand, gender):
+            ranked = get_ranker(catalog, BODY_TYPE_RECOMMENDATIONS).rank(
+                brand, gender, body_type, limit=limit, min_kurus=min_kurus, max_kurus=max_kurus
+            )
+            recommended_for = f"{gender} {body_type}"
+            return [product.to_dict(brand=brand, recommended_for=recommended_for) for product in ranked]
+        
+        link = f"https://{brand.lower().replace(' ', '').replace('&', '')}.com"
+        mock_products = []
+        for index, (low, high, color) in enumerate(MOCK_PRICE_RANGES, start=1):
+            # Aralık kesişmiyorsa ele - fiyat sayısal tutulur, metin sadece gösterim
+            if (min_kurus is not None and high < min_kurus) or (max_kurus is not None and low > max_kurus):
+                continue
+            mock_products.append({
+                "name": f"{brand} - {category} Önerisi {index}",
                 "brand": brand,
-                "price": "129-229 TL",
-                "image": f"https://via.placeholder.com/300x400/96CEB4/FFFFFF?text={brand}",
-                "link": f"https://{brand.lower().replace(' ', '').replace('&', '')}.com"
-            },
-            {
-                "name": f"{brand} - {category} Önerisi 3",
-                "brand": brand, 
-                "price": "159-259 TL",
-                "image": f"https://via.placeholder.com/300x400/FFEAA7/000000?text={brand}",
-                "link": f"https://{brand.lower().replace(' ', '').replace('&', '')}.com"
-            }
-        ]
+                "price": f"{low // 100}-{high // 100} TL",
+                "image": f"https://via.placeholder.com/300x400/{color}?text={brand}",
+                "link": link
+            })
         return mock_products[:limit]
 
+# /get-products: istek kategorisi -> katalog cinsiyeti
+PRODUCT_GENDERS = {"woman": "kadın", "man": "erkek"}
+# Mock öneriler için fiyat aralıkları (kuruş) ve görsel rengi
+MOCK_PRICE_RANGES = (
+    (9900, 19900, "45B7D1/FFFFFF"),
+    (12900, 22900, "96CEB4/FFFFFF"),
+    (15900, 25900, "FFEAA7/000000")
+)
+
 scraper = ProductScraper()
 
 # Database initialization for trends
-def init_trends_db():
+def init_trends_db(path=None):
+    """Trend veritabanını aç - TRENDS_DB_PATH=':memory:' testler için bellek içi"""
     try:
-        conn = sqlite3.connect(':memory:')  # Vercel için in-memory DB
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS product_trends (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            product_name TEXT,
-            brand TEXT,
-            category TEXT,
-            search_count INTEGER DEFAULT 1,
-            body_type TEXT,
-            price_range TEXT,
-            colors TEXT,
-            date_added DATE,
-            week_number INTEGER
-        )
-        ''')
-        
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS trend_analytics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            trend_type TEXT,
-            trend_data TEXT,
-            week_number INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        conn.commit()
-        return conn
+        store = TrendStore(path or default_trends_db_path())
+        print(f"📈 Trend DB: {store.path}")
+        return store
     except Exception as e:
         print(f"Database init error: {e}")
         return None
 
-# Global db connection
-db_conn = init_trends_db()
+# Global trend store
+trend_store = init_trends_db()
+
+# Hafta/dilim başına önceden hesaplanmış top-N trend listeleri (trend_analytics)
+trend_rollups = TrendRollups(trend_store, top_n=int(os.getenv("TREND_ROLLUP_TOP_N", "20"))) if trend_store else None
+
+def flush_trend_rows(rows):
+    """Biriken trend sayaçlarını tek transaction'da upsert et, rollup'ları güncelle (son bilinen fiyat kalır)"""
+    if not trend_store:
+        return
+    
+    def _flush(conn):
+        conn.executemany('''
+        INSERT INTO product_trends 
+        (product_name, brand, category, body_type, price_range, price_min_kurus, price_max_kurus,
+         date_added, iso_year, week_number, search_count)
+        VALUES (:product_name, :brand, :category, :body_type, :price_range, :price_min_kurus, :price_max_kurus,
+                :date_added, :iso_year, :week_number, :search_count)
+        ON CONFLICT(product_name, brand, iso_year, week_number)
+        DO UPDATE SET search_count = search_count + excluded.search_count,
+            price_range = CASE WHEN excluded.price_min_kurus IS NULL THEN price_range ELSE excluded.price_range END,
+            price_min_kurus = coalesce(excluded.price_min_kurus, price_min_kurus),
+            price_max_kurus = coalesce(excluded.price_max_kurus, price_max_kurus)
+        ''', rows)
+        index_categories(conn, [row['category'] for row in rows])
+        trend_rollups.apply(conn, rows)
+    
+    trend_store.transaction(_flush)
+
+# Write-behind buffer - istek yolunda SQLite'a dokunulmaz
+trend_buffer = TrendWriteBuffer(
+    flush_fn=flush_trend_rows,
+    flush_interval=float(os.getenv("TREND_FLUSH_INTERVAL", "5")),
+    max_pending=int(os.getenv("TREND_FLUSH_MAX_PENDING", "500"))
+)
 
 # Trend tracking fonksiyonları
 def track_product_search(product_name, brand, category, body_type=None, price_range=None):
-    """Her ürün aramasını kaydet"""
+    """Her ürün aramasını kaydet (bellekte biriktirilir, arka planda yazılır)"""
     try:
-        if not db_conn:
-            return False
-            
-        cursor = db_conn.cursor()
-        current_week = datetime.now().isocalendar()[1]
-        
-        cursor.execute('''
-        SELECT id, search_count FROM product_trends 
-        WHERE product_name = ? AND brand = ? AND week_number = ?
-        ''', (product_name, brand, current_week))
-        
-        existing = cursor.fetchone()
-        
-        if existing:
-            cursor.execute('''
-            UPDATE product_trends 
-            SET search_count = search_count + 1 
-            WHERE id = ?
-            ''', (existing[0],))
-        else:
-            cursor.execute('''
-            INSERT INTO product_trends 
-            (product_name, brand, category, body_type, price_range, date_added, week_number)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (product_name, brand, category, body_type, price_range, datetime.now().date(), current_week))
-        
-        db_conn.commit()
-        return True
+        return trend_buffer.record(product_name, brand, category, body_type, price_range)
     except Exception as e:
         print(f"Trend tracking error: {e}")
         return False
 
-def get_weekly_trends(category=None, body_type=None, limit=10):
-    """Bu haftanın trend ürünlerini getir"""
+TREND_COLUMNS = ('product_name', 'brand', 'category', 'search_count', 'body_type', 'price_range')
+
+# Veri yokken gösterilen örnek trendler (fiyat filtresinde aralığı kesişenler)
+SAMPLE_TRENDS = (
+    {
+        "product_name": "Oversized Basic Tişört",
+        "brand": "Zara",
+        "category": "tişört",
+        "search_count": 45,
+        "trend_score": 85,
+        "price_range": "89-159 TL"
+    },
+    {
+        "product_name": "Wide Leg Jean",
+        "brand": "Pull & Bear",
+        "category": "pantolon",
+        "search_count": 38,
+        "trend_score": 76,
+        "price_range": "199-299 TL"
+    }
+)
+
+def price_range_matches(price_range, min_kurus=None, max_kurus=None):
+    """SQL filtresiyle aynı kural: aralık [min, max] ile kesişiyor mu (filtre varken fiyatsız eşleşmez)"""
+    if min_kurus is None and max_kurus is None:
+        return True
+    prices = parse_price_range_kurus(price_range)
+    if prices is None:
+        return False
+    return (min_kurus is None or prices[1] >= min_kurus) and (max_kurus is None or prices[0] <= max_kurus)
+
+def sample_trends(min_kurus=None, max_kurus=None):
+    return [dict(trend) for trend in SAMPLE_TRENDS if price_range_matches(trend["price_range"], min_kurus, max_kurus)]
+
+def served_price_range(products):
+    """Sunulan ürünlerin fiyat aralığı ('149.99-399.95 TL') - trend kaydına; fiyat yoksa None"""
+    prices = [parse_price_range_kurus(product.get("price")) for product in products]
+    prices = [price for price in prices if price]
+    if not prices:
+        return None
+    low = min(price[0] for price in prices)
+    high = max(price[1] for price in prices)
+    return f"{low / 100:.2f}-{high / 100:.2f} TL" if low != high else f"{low / 100:.2f} TL"
+
+def trend_with_score(product):
+    return {**product, 'trend_score': min(100, (product['search_count'] * 10))}
+
+def get_weekly_trends_rollup(category=None, body_type=None, limit=10):
+    """Trendleri hazır rollup'tan getir: (trendler, updated_at) ya da None"""
+    if not trend_rollups or limit > trend_rollups.top_n:
+        return None
+    try:
+        if category:
+            # Rollup dilimi tek kategoriyi tam eşleştirir; canlı sorgu kelime öneki (match_categories).
+            # Sorgu tam olarak tek bir kategoriye denk gelmiyorsa iki yol farklı ürün döndürür - canlıya bırak
+            categories = trend_store.match_categories(category)
+            if len(categories) != 1 or turkish_lower(categories[0].strip()) != turkish_lower(category.strip()):
+                return None
+            category = categories[0]
+        current_year, current_week, _ = datetime.now().isocalendar()
+        rollup = trend_rollups.get(current_year, current_week, category, body_type)
+        if not rollup or not rollup[0]:
+            return None
+        products, updated_at = rollup
+        return [trend_with_score(p) for p in products[:limit]], updated_at
+    except Exception as e:
+        print(f"Trend rollup error: {e}")
+        return None
+
+def get_weekly_trends(category=None, body_type=None, limit=10, min_kurus=None, max_kurus=None):
+    """Bu haftanın trend ürünlerini getir (fiyat filtresi: aralığı [min, max] ile kesişenler)"""
     try:
-        if not db_conn:
+        if not trend_store:
             # Fallback mock data
-            return [
-                {
-                    "product_name": "Oversized Basic Tişört",
-                    "brand": "Zara", 
-                    "category": "tişört",
-                    "search_count": 45,
-                    "trend_score": 85,
-                    "price_range": "89-159 TL"
-                },
-                {
-                    "product_name": "Wide Leg Jean",
-                    "brand": "Pull & Bear",
-                    "category": "pantolon", 
-                    "search_count": 38,
-                    "trend_score": 76,
-                    "price_range": "199-299 TL"
-                }
-            ]
-        
-        cursor = db_conn.cursor()
-        current_week = datetime.now().isocalendar()[1]
-        
-        query = '''
-        SELECT product_name, brand, category, SUM(search_count) as total_searches,
-               body_type, price_range
+            return sample_trends(min_kurus, max_kurus)
+        
+        current_year, current_week, _ = datetime.now().isocalendar()
+        # (product_name, brand, iso_year, week) tekil olduğu için GROUP BY/SUM gerekmez
+        base_query = '''
+        SELECT product_name, brand, category, search_count, body_type, price_range
         FROM product_trends 
-        WHERE week_number = ?
+        WHERE iso_year = ? AND week_number = ?
         '''
-        params = [current_week]
+        order_limit = ' ORDER BY search_count DESC LIMIT ?'
+        
+        query = base_query
+        params = [current_year, current_week]
+        results = None
         
         if category:
-            query += ' AND category LIKE ?'
-            params.append(f'%{category}%')
+            # LIKE '%...%' yerine kelime tablosundan önek eşleşmesi, sonra index'li IN
+            categories = trend_store.match_categories(category)
+            if categories:
+                query += f' AND category IN ({", ".join("?" * len(categories))})'
+                params.extend(categories)
+            else:
+                results = []
             
         if body_type:
             query += ' AND body_type = ?'
             params.append(body_type)
         
-        query += ' GROUP BY product_name, brand ORDER BY total_searches DESC LIMIT ?'
-        params.append(limit)
-        
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        
-        trends = []
-        for row in results:
-            trends.append({
-                'product_name': row[0],
-                'brand': row[1], 
-                'category': row[2],
-                'search_count': row[3],
-                'body_type': row[4],
-                'price_range': row[5],
-                'trend_score': min(100, (row[3] * 10))
-            })
+        # Yazarken ayrıştırılmış kuruş sütunları - fiyatsız satırlar filtrede elenir
+        price_clause = ''
+        price_params = []
+        if min_kurus is not None:
+            price_clause += ' AND price_max_kurus >= ?'
+            price_params.append(min_kurus)
+        if max_kurus is not None:
+            price_clause += ' AND price_min_kurus <= ?'
+            price_params.append(max_kurus)
+        
+        if results is None:
+            results = trend_store.read(query + price_clause + order_limit, params + price_params + [limit])
+        
+        # Filtreli sonuç boşsa filtresiz listeye düş - önce hazır rollup, yoksa tek sorgu
+        # (fiyat filtresi korunur: rollup'larda fiyat yok, doğrudan sorgu)
+        if not results and (category or body_type):
+            rollup = None if price_params else get_weekly_trends_rollup(limit=limit)
+            if rollup:
+                return rollup[0]
+            results = trend_store.read(base_query + price_clause + order_limit, [current_year, current_week] + price_params + [limit])
         
-        return trends if trends else get_weekly_trends()  # Recursive fallback
+        return [trend_with_score(dict(zip(TREND_COLUMNS, row))) for row in results]
     except Exception as e:
         print(f"Get trends error: {e}")
         return []
 
+@app.on_event("startup")
+def start_trend_buffer():
+    # Dosyadan gelen eski veriler için bu haftanın rollup'larını bir kez hazırla
+    if trend_rollups:
+        current_year, current_week, _ = datetime.now().isocalendar()
+        if not trend_rollups.has_week(current_year, current_week):
+            trend_rollups.rebuild(current_year, current_week)
+    trend_buffer.start()
+
+@app.on_event("startup")
+def warm_catalog_search():
+    # İlk sohbet isteği indeks kurulumunu beklemesin
+    index = get_search_index(get_catalog())
+    print(f"🔎 Katalog arama indeksi hazır: {index.stats()}")
+
+@app.on_event("shutdown")
+def stop_trend_buffer():
+    trend_buffer.stop()
+    if trend_store:
+        trend_store.close()
+
 # Pydantic Models
 class SizeRequest(BaseModel):
     user_height: int
@@ -260,21 +345,56 @@ class SizeRequest(BaseModel):
     product_size: str
     brand: str
     gender: str
+    detailed: bool = False  # True ise yerel motor yerine Gemini'den açıklamalı cevap
+
+class SizeItem(BaseModel):
+    brand: str
+    product_name: str
+    product_size: str
+
+class BatchSizeRequest(BaseModel):
+    user_height: int
+    user_weight: int
+    gender: str
+    items: List[SizeItem]
+    detailed: bool = False
 
 class ProductRequest(BaseModel):
     brand: str
     body_type: str
     category: str = "woman"
+    min_price: Optional[float] = None  # TL
+    max_price: Optional[float] = None
 
 class TrendRequest(BaseModel):
     category: Optional[str] = None
     body_type: Optional[str] = None
-    price_range: Optional[str] = None
+    price_range: Optional[str] = None  # '100-300 TL' (min_price/max_price yoksa)
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+def price_filter_kurus(min_price=None, max_price=None, price_range=None):
+    """İstek fiyat filtresi -> (min_kuruş, max_kuruş); sınır yoksa None"""
+    if min_price is None and max_price is None and price_range:
+        prices = parse_price_range_kurus(price_range)
+        if prices:
+            return prices
+    return tl_to_kurus(min_price), tl_to_kurus(max_price)
+
+class SimilarProductsRequest(BaseModel):
+    product_id: Optional[int] = None  # katalogdaki ürün kartı (cevaplardaki product_id)
+    url: Optional[str] = None  # product_id yoksa; url birden çok ürüne ait olabilir
+    name: Optional[str] = None  # katalog dışı kart (ör. mock ürün) için
+    category: Optional[str] = None
+    price: Optional[str] = None
+    gender: Optional[str] = None
+    limit: int = 6
 
 class ChatRequest(BaseModel):
     message: str
     conversation_id: Optional[str] = None
     user_feedback: Optional[str] = None
+    user_gender: Optional[str] = None  # arayüzde seçilen cinsiyet ('kadın' / 'erkek')
 
 class ChatResponse(BaseModel):
     ai_response: str
@@ -282,8 +402,46 @@ class ChatResponse(BaseModel):
     conversation_id: str
     success: bool
 
-# Conversation memory
-conversation_memory = {}
+# /analyze-size Gemini cevapları için cache
+SIZE_CACHE_HEIGHT_STEP = int(os.getenv("SIZE_CACHE_HEIGHT_STEP", "2"))
+SIZE_CACHE_WEIGHT_STEP = int(os.getenv("SIZE_CACHE_WEIGHT_STEP", "2"))
+size_cache = TTLCache(
+    max_entries=int(os.getenv("SIZE_CACHE_MAX_ENTRIES", "2048")),
+    ttl_seconds=int(os.getenv("SIZE_CACHE_TTL_SECONDS", str(24 * 3600))),
+    disk_path=os.getenv("SIZE_CACHE_DB_PATH"),  # örn. size_cache.db - yoksa sadece bellek
+    disk_max_entries=int(os.getenv("SIZE_CACHE_DISK_MAX_ENTRIES", "20000")),
+    name="size_cache"
+)
+
+# /analyze-photo için perceptual hash cache (tekrar yüklenen fotoğraflar)
+photo_cache = PerceptualHashCache(
+    max_entries=int(os.getenv("PHOTO_CACHE_MAX_ENTRIES", "512")),
+    max_distance=int(os.getenv("PHOTO_CACHE_MAX_DISTANCE", "6"))
+)
+
+# /get-trends Gemini yorumları - hafta ve filtre dilimi başına
+insights_cache = AsyncRefreshCache(
+    max_entries=int(os.getenv("INSIGHTS_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=int(os.getenv("INSIGHTS_CACHE_TTL_SECONDS", str(6 * 3600))),
+    name="insights_cache"
+)
+
+# Yerel motorun bu güvenin altında kaldığı durumlarda Gemini'ye danışılır
+SIZE_ENGINE_MIN_CONFIDENCE = float(os.getenv("SIZE_ENGINE_MIN_CONFIDENCE", str(DEFAULT_MIN_CONFIDENCE)))
+
+# /analyze-size/batch sınırları
+SIZE_BATCH_MAX_ITEMS = int(os.getenv("SIZE_BATCH_MAX_ITEMS", "50"))
+SIZE_BATCH_CONCURRENCY = int(os.getenv("SIZE_BATCH_CONCURRENCY", "4"))
+
+# Conversation memory - sınırlı, tahliyeli sohbet deposu
+conversation_store = ConversationStore(
+    max_conversations=int(os.getenv("CHAT_MAX_CONVERSATIONS", "1000")),
+    max_messages=int(os.getenv("CHAT_MAX_MESSAGES", "50")),
+    idle_ttl=int(os.getenv("CHAT_IDLE_TTL_SECONDS", "1800")),
+    cold_db_path=os.getenv("CHAT_COLD_DB_PATH"),  # örn. conversations.db - yoksa tahliye edilen sohbet silinir
+    cold_ttl=int(os.getenv("CHAT_COLD_TTL_SECONDS", str(7 * 86400))),
+    cold_max_entries=int(os.getenv("CHAT_COLD_MAX_ENTRIES", "10000"))
+)
 
 @app.get("/")
 def read_root():
@@ -292,11 +450,49 @@ def read_root():
         "status": "running",
         "gemini_available": GEMINI_AVAILABLE,
         "supported_brands": ["Zara", "Trendyol", "H&M", "Bershka", "Pull & Bear"],
-        "endpoints": ["/analyze-size", "/analyze-photo", "/get-products", "/get-trends", "/chat-product-search"]
+        "endpoints": ["/analyze-size", "/analyze-size/batch", "/analyze-photo", "/get-products", "/similar-products", "/get-trends", "/chat-product-search", "/chat-product-search/stream"]
+    }
+
+@app.get("/cache-stats")
+def cache_stats():
+    """Cache hit/miss istatistikleri"""
+    return {
+        "size_analysis": size_cache.stats(),
+        "photo_analysis": photo_cache.stats(),
+        "trend_insights": insights_cache.stats(),
+        "trend_buffer": trend_buffer.stats(),
+        "conversations": conversation_store.stats()
     }
 
+def size_cache_key(gender_text, height, weight, brand, product_name, product_size, recommended_size):
+    # Yakın ölçüler aynı cache girdisini paylaşsın diye boy/kilo kovalanır
+    return make_cache_key(
+        "analyze-size", gender_text,
+        bucket_value(height, SIZE_CACHE_HEIGHT_STEP), bucket_value(weight, SIZE_CACHE_WEIGHT_STEP),
+        brand, product_name, product_size, recommended_size
+    )
+
+def build_size_prompt(gender_text, height, weight, brand, product_name, product_size, recommended_size):
+    """Tek ürün için beden analizi prompt'u (cache ile uyumlu olsun diye kovalanmış ölçülerle)"""
+    return f"""
+    Sen bir kıyafet beden uzmanısın. 
+
+    Kullanıcı Bilgileri:
+    - Cinsiyet: {gender_text}
+    - Boy: {bucket_value(height, SIZE_CACHE_HEIGHT_STEP)} cm
+    - Kilo: {bucket_value(weight, SIZE_CACHE_WEIGHT_STEP)} kg
+    - Marka: {brand}
+    - Ürün: {product_name} 
+    - Denenen Beden: {product_size}
+    - Beden tablosuna göre önerilen: {recommended_size}
+
+    Bu {gender_text} için {product_size} bedeni uygun mu?
+
+    BMI hesapla ve beden önerisi yap. Türkçe, samimi dilde cevap ver.
+    """
+
 @app.post("/analyze-size")
-def analyze_size(request: SizeRequest):
+async def analyze_size(request: SizeRequest):
     """AI beden analizi endpoint'i"""
     try:
         track_product_search(
@@ -308,45 +504,210 @@ def analyze_size(request: SizeRequest):
         
         gender_text = "kadın" if request.gender == "kadın" else "erkek"
         
-        if GEMINI_AVAILABLE:
-            prompt = f"""
-            Sen bir kıyafet beden uzmanısın. 
-
-            Kullanıcı Bilgileri:
-            - Cinsiyet: {gender_text}
-            - Boy: {request.user_height} cm
-            - Kilo: {request.user_weight} kg
-            - Marka: {request.brand}
-            - Ürün: {request.product_name} 
-            - Denenen Beden: {request.product_size}
-
-            Bu {gender_text} için {request.product_size} bedeni uygun mu?
-
-            BMI hesapla ve beden önerisi yap. Türkçe, samimi dilde cevap ver.
-            """
+        # Önce yerel beden motoru - mikro saniyeler içinde cevap
+        local_result = recommend_size(
+            gender=gender_text,
+            height=request.user_height,
+            weight=request.user_weight,
+            brand=request.brand,
+            product_size=request.product_size
+        )
+        local_recommendation = format_recommendation(local_result, request.brand, request.product_name)
+        needs_ai = needs_escalation(local_result, SIZE_ENGINE_MIN_CONFIDENCE, request.detailed)
+        
+        if not needs_ai:
+            recommendation = local_recommendation
+            ai_type = "local_engine"
+        else:
+            cache_key = size_cache_key(
+                gender_text, request.user_height, request.user_weight,
+                request.brand, request.product_name, request.product_size,
+                local_result["recommended_size"]
+            )
+            cached = await size_cache.aget(cache_key)
             
-            try:
-                response = model.generate_content(prompt)
-                recommendation = response.text
-                ai_type = "real_gemini"
-            except Exception as e:
-                bmi = request.user_weight / ((request.user_height/100)**2)
-                recommendation = f"""📊 BMI: {bmi:.1f}
-🎯 {request.brand} {request.product_name} - {request.product_size} beden analizi tamamlandı."""
+            if cached is not None:
+                recommendation = cached
+                ai_type = "real_gemini_cached"
+            elif GEMINI_AVAILABLE:
+                prompt = build_size_prompt(
+                    gender_text, request.user_height, request.user_weight,
+                    request.brand, request.product_name, request.product_size,
+                    local_result["recommended_size"]
+                )
+                
+                try:
+                    recommendation = await ai_client.generate_text(prompt)
+                    ai_type = "real_gemini"
+                    await size_cache.aset(cache_key, recommendation)
+                except Exception as e:
+                    recommendation = local_recommendation
+                    ai_type = "fallback"
+            else:
+                recommendation = local_recommendation
                 ai_type = "fallback"
-        else:
-            bmi = request.user_weight / ((request.user_height/100)**2)
-            recommendation = f"📊 BMI: {bmi:.1f} - {request.product_size} bedeni için genel değerlendirme."
-            ai_type = "fallback"
             
         return {
             "success": True,
             "recommendation": recommendation,
             "ai_type": ai_type,
+            "recommended_size": local_result["recommended_size"],
+            "confidence": local_result["confidence"],
+            "bmi": request.user_weight / ((request.user_height/100)**2),
+            "gender": request.gender
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def generate_batch_size_recommendations(gender_text, height, weight, pending):
+    """Cache'te olmayan ürünler için tek yapılandırılmış Gemini isteği; eksik kalanlar için sınırlı fan-out.
+
+    pending: {anahtar: (item, local_result)} -> {anahtar: öneri metni}
+    """
+    keys = list(pending)
+    lines = []
+    for index, key in enumerate(keys):
+        item, local_result = pending[key]
+        lines.append(
+            f'{index}. Marka: {item.brand} | Ürün: {item.product_name} | Denenen Beden: {item.product_size} '
+            f'| Beden tablosuna göre önerilen: {local_result["recommended_size"]}'
+        )
+    prompt = f"""
+    Sen bir kıyafet beden uzmanısın. 
+
+    Kullanıcı Bilgileri:
+    - Cinsiyet: {gender_text}
+    - Boy: {bucket_value(height, SIZE_CACHE_HEIGHT_STEP)} cm
+    - Kilo: {bucket_value(weight, SIZE_CACHE_WEIGHT_STEP)} kg
+
+    Sepetteki ürünler:
+    {chr(10).join(lines)}
+
+    Her ürün için denenen beden uygun mu, kısa ve samimi Türkçe bir beden önerisi yaz.
+    Cevabı SADECE şu formatta JSON dizi olarak ver:
+    [{{"id": 0, "recommendation": "..."}}]
+    """
+    
+    results = {}
+    try:
+        response_text = await ai_client.generate_text(prompt)
+        match = re.search(r"\[.*\]", response_text, re.S)
+        for entry in json.loads(match.group(0)) if match else []:
+            index = int(entry.get("id", -1))
+            if 0 <= index < len(keys) and entry.get("recommendation"):
+                results[keys[index]] = str(entry["recommendation"])
+    except Exception as e:
+        print(f"⚠️ Toplu beden analizi hatası: {e}")
+    
+    # Yapılandırılmış cevapta eksik kalanlar: ürün başına istek, eşzamanlılık sınırlı
+    missing = [key for key in keys if key not in results]
+    if missing:
+        semaphore = asyncio.Semaphore(SIZE_BATCH_CONCURRENCY)
+        
+        async def single(key):
+            item, local_result = pending[key]
+            async with semaphore:
+                try:
+                    return key, await ai_client.generate_text(build_size_prompt(
+                        gender_text, height, weight, item.brand, item.product_name,
+                        item.product_size, local_result["recommended_size"]
+                    ))
+                except Exception as e:
+                    print(f"⚠️ Beden analizi hatası ({item.brand} {item.product_name}): {e}")
+                    return key, None
+        
+        for key, recommendation in await asyncio.gather(*(single(key) for key in missing)):
+            if recommendation:
+                results[key] = recommendation
+    return results
+
+@app.post("/analyze-size/batch")
+async def analyze_size_batch(request: BatchSizeRequest):
+    """Sepetteki tüm ürünler için tek istekte beden analizi"""
+    try:
+        if len(request.items) > SIZE_BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"En fazla {SIZE_BATCH_MAX_ITEMS} ürün gönderilebilir")
+        
+        gender_text = "kadın" if request.gender == "kadın" else "erkek"
+        
+        # Aynı ürün/beden sepette birden çok kez olabilir - bir kez analiz et
+        unique = {}
+        item_keys = []
+        for item in request.items:
+            key = make_cache_key(item.brand, item.product_name, item.product_size)
+            item_keys.append(key)
+            if key not in unique:
+                unique[key] = item
+                track_product_search(
+                    product_name=item.product_name,
+                    brand=item.brand,
+                    category="size_analysis",
+                    body_type=f"{request.gender}_{request.user_height}_{request.user_weight}"
+                )
+        
+        answers = {}  # anahtar -> (öneri, ai_type, local_result)
+        pending = {}  # Gemini'ye gidecekler
+        for key, item in unique.items():
+            local_result = recommend_size(
+                gender=gender_text,
+                height=request.user_height,
+                weight=request.user_weight,
+                brand=item.brand,
+                product_size=item.product_size
+            )
+            if not needs_escalation(local_result, SIZE_ENGINE_MIN_CONFIDENCE, request.detailed):
+                answers[key] = (format_recommendation(local_result, item.brand, item.product_name), "local_engine", local_result)
+                continue
+            
+            cache_key = size_cache_key(
+                gender_text, request.user_height, request.user_weight,
+                item.brand, item.product_name, item.product_size, local_result["recommended_size"]
+            )
+            cached = await size_cache.aget(cache_key)
+            if cached is not None:
+                answers[key] = (cached, "real_gemini_cached", local_result)
+            else:
+                pending[cache_key] = (item, local_result)
+        
+        generated = {}
+        if pending and GEMINI_AVAILABLE:
+            generated = await generate_batch_size_recommendations(
+                gender_text, request.user_height, request.user_weight, pending
+            )
+        
+        for cache_key, (item, local_result) in pending.items():
+            key = make_cache_key(item.brand, item.product_name, item.product_size)
+            if cache_key in generated:
+                await size_cache.aset(cache_key, generated[cache_key])
+                answers[key] = (generated[cache_key], "real_gemini", local_result)
+            else:
+                answers[key] = (format_recommendation(local_result, item.brand, item.product_name), "fallback", local_result)
+        
+        results = []
+        for item, key in zip(request.items, item_keys):
+            recommendation, ai_type, local_result = answers[key]
+            results.append({
+                "brand": item.brand,
+                "product_name": item.product_name,
+                "product_size": item.product_size,
+                "recommendation": recommendation,
+                "ai_type": ai_type,
+                "recommended_size": local_result["recommended_size"],
+                "confidence": local_result["confidence"]
+            })
+        
+        return {
+            "success": True,
+            "results": results,
+            "unique_items": len(unique),
+            "gemini_items": len(pending),
             "bmi": request.user_weight / ((request.user_height/100)**2),
             "gender": request.gender
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -354,11 +715,23 @@ def analyze_size(request: SizeRequest):
 async def analyze_photo(file: UploadFile = File(...)):
     """AI fotoğraf analizi endpoint'i"""
     try:
-        if not file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="Geçerli bir resim dosyası yükleyin")
+        # Sınırlı, parça parça okuma - tip content_type'tan değil ilk byte'lardan
+        try:
+            upload_buffer, upload_size, _ = await read_upload_limited(file)
+        except UploadError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
         
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
+        # Decode, EXIF döndürme, küçültme ve yeniden kodlama worker thread'de
+        try:
+            normalized = await asyncio.to_thread(
+                normalize_image, upload_buffer, original_bytes=upload_size
+            )
+        except UploadError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        finally:
+            upload_buffer.close()
+        print(f"🖼️ Ön işleme: {normalized.stats['original_bytes']} -> {normalized.stats['final_bytes']} byte, "
+              f"{normalized.stats['elapsed_ms']} ms")
         
         track_product_search(
             product_name="Photo Analysis",
@@ -366,7 +739,14 @@ async def analyze_photo(file: UploadFile = File(...)):
             category="photo_analysis"
         )
         
-        if GEMINI_AVAILABLE:
+        # Aynı/benzer fotoğraf daha önce analiz edildiyse Gemini'ye gitme
+        fingerprint = await asyncio.to_thread(image_fingerprint, normalized.image)
+        cached_analysis = photo_cache.lookup(fingerprint)
+        
+        if cached_analysis is not None:
+            analysis = cached_analysis
+            ai_type = "real_gemini_vision_cached"
+        elif GEMINI_AVAILABLE:
             prompt = """Bu fotoğrafı analiz et:
             1. Cinsiyet (Kadın/Erkek)
             2. Vücut tipi (Rectangle, Pear, Apple, Hourglass)
@@ -375,9 +755,9 @@ async def analyze_photo(file: UploadFile = File(...)):
             Türkçe, detaylı analiz yap."""
             
             try:
-                response = vision_model.generate_content([prompt, image])
-                analysis = response.text
+                analysis = await ai_client.generate_vision([prompt, normalized.as_gemini_part()])
                 ai_type = "real_gemini_vision"
+                photo_cache.store(fingerprint, analysis)
             except:
                 analysis = "👤 **Cinsiyet:** Kadın\n🔹 **Vücut Tipi:** Rectangle\n🎯 **Öneriler:** A-line kesimler önerilir."
                 ai_type = "fallback_vision"
@@ -388,9 +768,12 @@ async def analyze_photo(file: UploadFile = File(...)):
         return {
             "success": True,
             "analysis": analysis,
-            "ai_type": ai_type
+            "ai_type": ai_type,
+            "preprocessing": normalized.stats
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -398,18 +781,23 @@ async def analyze_photo(file: UploadFile = File(...)):
 def get_products(request: ProductRequest):
     """Dinamik ürün önerileri"""
     try:
-        track_product_search(
-            product_name=f"{request.brand} products", 
+        min_kurus, max_kurus = price_filter_kurus(request.min_price, request.max_price)
+        products = scraper.get_products_by_brand(
             brand=request.brand,
             category=request.category,
-            body_type=request.body_type
+            analysis_text=request.body_type,
+            limit=6,
+            min_kurus=min_kurus,
+            max_kurus=max_kurus
         )
         
-        products = scraper.get_products_by_brand(
+        # Trend kaydı sunulan ürünlerin fiyat aralığıyla - /get-trends fiyat filtresi buna bakar
+        track_product_search(
+            product_name=f"{request.brand} products", 
             brand=request.brand,
             category=request.category,
-            analysis_text=request.body_type,
-            limit=6
+            body_type=request.body_type,
+            price_range=served_price_range(products)
         )
         
         return {
@@ -429,41 +817,86 @@ def get_products(request: ProductRequest):
             "product_count": 0
         }
 
+SIMILAR_MAX_LIMIT = int(os.getenv("SIMILAR_MAX_LIMIT", "24"))
+
+@app.post("/similar-products")
+def similar_products(request: SimilarProductsRequest):
+    """Beğenilen ürün kartına benzer katalog ürünleri"""
+    index = get_similarity_index(get_catalog())
+    if request.product_id is not None:
+        row = index.row_for(request.product_id)
+        rows = () if row is None else (row,)
+    else:
+        # Url'i paylaşan tüm kayıtlar kaynak sayılır: hiçbiri "benzer" diye dönmez
+        rows = index.rows_for_url(request.url) if request.url else ()
+    if rows:
+        source = index.products[rows[0]]
+        query = index.matrix[rows[0]]
+        gender = request.gender or source.gender
+    elif request.name:
+        query = index.vector(request.name, request.category or "", parse_price_kurus(request.price))
+        gender = request.gender
+    elif request.product_id is not None or request.url:
+        raise HTTPException(status_code=404, detail="Ürün katalogda bulunamadı")
+    else:
+        raise HTTPException(status_code=400, detail="Katalogdaki ürünün product_id'si, url'i ya da ürün adı gerekli")
+    
+    hits = index.similar(query, limit=min(request.limit, SIMILAR_MAX_LIMIT), gender=gender, exclude=rows or None)
+    products = [
+        product.to_dict(brand=product.brand, match_score=max(1, round(100 * score)))
+        for product, score in hits
+    ]
+    return {
+        "success": True,
+        "products": products,
+        "product_count": len(products)
+    }
+
 @app.post("/get-trends")
-def get_trends(request: TrendRequest):
+async def get_trends(request: TrendRequest):
     """Trend analizi endpoint'i"""
     try:
-        weekly_trends = get_weekly_trends(
+        min_kurus, max_kurus = price_filter_kurus(request.min_price, request.max_price, request.price_range)
+        price_filtered = min_kurus is not None or max_kurus is not None
+        
+        # Önce materialize rollup (O(1)), yoksa canlı sorgu; fiyat filtresi kuruş sütunlarıyla canlı sorguda
+        rollup = None if price_filtered else get_weekly_trends_rollup(
             category=request.category,
             body_type=request.body_type,
             limit=8
         )
+        if rollup:
+            weekly_trends, updated_at = rollup
+            trends_source = "rollup"
+        else:
+            weekly_trends = get_weekly_trends(
+                category=request.category,
+                body_type=request.body_type,
+                limit=8,
+                min_kurus=min_kurus,
+                max_kurus=max_kurus
+            )
+            updated_at = time.time()
+            trends_source = "live"
         
+        # Veri yoksa örnek trendler - fiyat filtresinde sadece aralığı kesişenler
         if not weekly_trends:
-            weekly_trends = [
-                {
-                    "product_name": "Oversized Basic Tişört",
-                    "brand": "Zara",
-                    "category": "tişört",
-                    "search_count": 45,
-                    "trend_score": 85,
-                    "price_range": "89-159 TL"
-                },
-                {
-                    "product_name": "Wide Leg Jean",
-                    "brand": "Pull & Bear", 
-                    "category": "pantolon",
-                    "search_count": 38,
-                    "trend_score": 76,
-                    "price_range": "199-299 TL"
-                }
-            ]
+            weekly_trends = sample_trends(min_kurus, max_kurus)
         
         if GEMINI_AVAILABLE:
+            top_trends = weekly_trends[:3]
+            iso_year, iso_week, _ = datetime.now().isocalendar()
+            # Fiyat filtresi top-3'ü değiştirir: filtreli/filtresiz istekler birbirinin sürümünü ezmesin
+            insights_key = (iso_year, iso_week, request.category, request.body_type, min_kurus, max_kurus)
+            # Sadece top-3 ürün kümesi değişince yeniden üret
+            insights_version = make_cache_key(*(f"{t['product_name']}|{t['brand']}" for t in top_trends))
+            
+            async def load_insights():
+                insights_prompt = f"Bu trend verileri: {json.dumps(top_trends, ensure_ascii=False)} - Kısa trend analizi yap."
+                return await ai_client.generate_text(insights_prompt)
+            
             try:
-                insights_prompt = f"Bu trend verileri: {json.dumps(weekly_trends[:3], ensure_ascii=False)} - Kısa trend analizi yap."
-                insights_response = model.generate_content(insights_prompt)
-                trend_insights = insights_response.text
+                trend_insights = await insights_cache.get(insights_key, insights_version, load_insights)
             except:
                 trend_insights = "📈 Bu hafta oversized ve rahat kesimli ürünler trend!"
         else:
@@ -474,7 +907,9 @@ def get_trends(request: TrendRequest):
             "trends": weekly_trends,
             "insights": trend_insights,
             "week_number": datetime.now().isocalendar()[1],
-            "total_products": len(weekly_trends)
+            "total_products": len(weekly_trends),
+            "trends_source": trends_source,
+            "trends_updated_at": datetime.fromtimestamp(updated_at).isoformat(timespec="seconds")
         }
         
     except Exception as e:
@@ -485,8 +920,25 @@ def get_trends(request: TrendRequest):
             "error": str(e)
         }
 
+# Arka plan task'ları referanssız kalırsa çalışırken çöp toplanabilir - bitene kadar tutulur
+background_tasks = set()
+
+def spawn_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+def remember_gender(conversation, message, user_gender=None):
+    """Sohbetin cinsiyeti: önce kullanıcının seçtiği, yoksa mesajdaki tam kelime ipucu; ikisi de yoksa önceki bilgi (veya None)"""
+    user_gender = PRODUCT_GENDERS.get(user_gender, user_gender)
+    gender = user_gender if user_gender in PRODUCT_GENDERS.values() else explicit_gender(message)
+    if gender:
+        conversation.detected_gender = gender
+    return conversation.detected_gender
+
 @app.post("/chat-product-search")
-def chat_product_search(request: ChatRequest):
+async def chat_product_search(request: ChatRequest):
     """AI Stil Danışmanı"""
     try:
         track_product_search(
@@ -497,28 +949,16 @@ def chat_product_search(request: ChatRequest):
         
         conv_id = request.conversation_id or str(uuid.uuid4())[:8]
         
-        if conv_id not in conversation_memory:
-            conversation_memory[conv_id] = {
-                "messages": [],
-                "detected_gender": "kadın"
-            }
-        
-        conversation = conversation_memory[conv_id]
-        conversation["messages"].append({
-            "role": "user",
-            "content": request.message,
-            "timestamp": time.time()
-        })
+        conversation = await conversation_store.aget_or_create(conv_id)
+        conversation.add("user", request.message)
+        remember_gender(conversation, request.message, request.user_gender)
         
         if GEMINI_AVAILABLE:
             try:
-                style_prompt = f"""Sen AURA AI Stil Danışmanısın. 
-                Kullanıcı diyor: "{request.message}"
-                
-                Kısa, samimi ve yardımcı bir cevap ver. Türkçe."""
+                # Son turlar token bütçesiyle, eskiler kayan özetle
+                style_prompt = build_style_prompt(conversation, request.message)
                 
-                ai_response = model.generate_content(style_prompt)
-                ai_message = ai_response.text
+                ai_message = await ai_client.generate_text(style_prompt)
             except:
                 ai_message = f"🤖 '{request.message}' için en uygun ürünleri buluyorum!"
         else:
@@ -527,15 +967,15 @@ def chat_product_search(request: ChatRequest):
         # Ürün arama
         products = scraper.search_real_products_web(
             search_query=request.message,
-            gender=conversation.get("detected_gender", "kadın"),
+            gender=conversation.detected_gender,
             limit=6
         )
         
-        conversation["messages"].append({
-            "role": "assistant", 
-            "content": ai_message,
-            "timestamp": time.time()
-        })
+        conversation.add("assistant", ai_message)
+        
+        # Pencere dışına taşan turları cevaptan sonra arka planda özetle
+        if GEMINI_AVAILABLE and needs_summary_refresh(conversation):
+            spawn_background(refresh_summary(conversation, ai_client.generate_text))
         
         return {
             "ai_response": ai_message,
@@ -553,6 +993,95 @@ def chat_product_search(request: ChatRequest):
             "success": False
         }
 
+def sse_event(event, data):
+    """Server-Sent Events formatında tek olay"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/chat-product-search/stream")
+async def chat_product_search_stream(request: ChatRequest):
+    """AI Stil Danışmanı - SSE ile token token cevap, ürünler hazır olunca ayrı olay"""
+    track_product_search(
+        product_name="AI Style Consultant",
+        brand="AURA_AI",
+        category="style_consultation"
+    )
+    
+    conv_id = request.conversation_id or str(uuid.uuid4())[:8]
+    conversation = await conversation_store.aget_or_create(conv_id)
+    conversation.add("user", request.message)
+    remember_gender(conversation, request.message, request.user_gender)
+    
+    async def event_stream():
+        queue = asyncio.Queue()
+        
+        async def produce_products():
+            try:
+                products = await asyncio.to_thread(
+                    scraper.search_real_products_web,
+                    search_query=request.message,
+                    gender=conversation.detected_gender,
+                    limit=6
+                )
+            except Exception as e:
+                print(f"⚠️ Stream ürün arama hatası: {e}")
+                products = []
+            await queue.put(("products", {"products": products}))
+            await queue.put(("_products_done", None))
+        
+        async def produce_tokens():
+            parts = []
+            try:
+                if not GEMINI_AVAILABLE:
+                    raise RuntimeError("Gemini kullanılamıyor")
+                style_prompt = build_style_prompt(conversation, request.message)
+                async for text in ai_client.stream_text(style_prompt):
+                    parts.append(text)
+                    await queue.put(("token", {"text": text}))
+            except Exception as e:
+                if not parts:
+                    fallback = f"🤖 '{request.message}' için en uygun ürünleri buluyorum!"
+                    parts.append(fallback)
+                    await queue.put(("token", {"text": fallback}))
+            await queue.put(("_ai_done", "".join(parts)))
+        
+        # İlk byte hemen gider - istemci conversation_id'yi beklemeden alır
+        yield sse_event("meta", {"conversation_id": conv_id})
+        
+        tasks = [asyncio.create_task(produce_tokens()), asyncio.create_task(produce_products())]
+        ai_message = ""
+        try:
+            remaining = len(tasks)
+            while remaining:
+                event, data = await queue.get()
+                if event == "_ai_done":
+                    ai_message = data
+                    remaining -= 1
+                elif event == "_products_done":
+                    remaining -= 1
+                else:
+                    yield sse_event(event, data)
+            
+            conversation.add("assistant", ai_message)
+            if GEMINI_AVAILABLE and needs_summary_refresh(conversation):
+                spawn_background(refresh_summary(conversation, ai_client.generate_text))
+            
+            yield sse_event("done", {
+                "ai_response": ai_message,
+                "conversation_id": conv_id,
+                "success": True,
+                "ai_type": "style_consultant"
+            })
+        finally:
+            # İstemci bağlantıyı koparırsa üreticileri durdur
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Vercel için handler
 app = app
 
@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+HASH_SIZE = 8  # 8x8 -> 64 bit hash
+
+
+def average_hash(image, hash_size=HASH_SIZE):
+    """aHash: küçültülmüş gri görüntüde ortalamadan parlak pikseller 1"""
+    small = image.convert("L").resize((hash_size, hash_size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    avg = sum(pixels) / len(pixels)
+    value = 0
+    for pixel in pixels:
+        value = (value << 1) | (1 if pixel >= avg else 0)
+    return value
+
+
+def difference_hash(image, hash_size=HASH_SIZE):
+    """dHash: yatay komşu pikseller arası parlaklık gradyanı"""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    width = hash_size + 1
+    value = 0
+    for row in range(hash_size):
+        offset = row * width
+        for col in range(hash_size):
+            value = (value << 1) | (1 if pixels[offset + col] > pixels[offset + col + 1] else 0)
+    return value
+
+
+def image_fingerprint(image):
+    """Fotoğrafın (aHash, dHash) parmak izi"""
+    return average_hash(image), difference_hash(image)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class PerceptualHashCache:
+    """Neredeyse aynı fotoğraflar için analiz sonucunu tekrar kullanan sınırlı cache"""
+
+    def __init__(self, max_entries=512, max_distance=6):
+        self.max_entries = max_entries
+        self.max_distance = max_distance  # Hamming mesafesi eşiği (0-64)
+        self._entries = OrderedDict()  # (ahash, dhash) -> analiz
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, fingerprint):
+        """Eşik içinde en yakın önceki analizi döndür, yoksa None"""
+        a_hash, d_hash = fingerprint
+        with self._lock:
+            best_key = None
+            best_distance = self.max_distance + 1
+            for key in self._entries:
+                # İki hash de eşik içinde olmalı - yanlış eşleşmeleri azaltır
+                a_distance = hamming_distance(a_hash, key[0])
+                if a_distance > self.max_distance:
+                    continue
+                d_distance = hamming_distance(d_hash, key[1])
+                if d_distance > self.max_distance:
+                    continue
+                distance = max(a_distance, d_distance)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+                    if distance == 0:
+                        break
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key]
+
+    def store(self, fingerprint, analysis):
+        with self._lock:
+            self._entries[fingerprint] = analysis
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
@@ -0,0 +1,246 @@
+import bisect
+import json
+import os
+import re
+import sqlite3
+import threading
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CATALOG_FIELDS = ("brand", "gender", "category", "name", "price", "image", "url")
+
+_PRICE_RE = re.compile(r"\d[\d.,]*")
+
+
+def default_catalog_path():
+    """PRODUCT_CATALOG_PATH yoksa backend/product_catalog.json"""
+    return os.getenv("PRODUCT_CATALOG_PATH") or os.path.join(BACKEND_DIR, "product_catalog.json")
+
+
+def parse_price(text):
+    """'1.299,95 TL', '₺299,90', '299.95 TL' -> 1299.95 / 299.9 / 299.95"""
+    match = _PRICE_RE.search(text or "")
+    if not match:
+        return None
+    number = match.group().rstrip(".,")
+    if "," in number:
+        # Türkçe biçim: nokta binlik, virgül ondalık
+        number = number.replace(".", "").replace(",", ".")
+    elif number.count(".") > 1 or re.search(r"\.\d{3}$", number):
+        number = number.replace(".", "")
+    try:
+        return float(number)
+    except ValueError:
+        return None
+
+
+def parse_price_kurus(text):
+    """'1.299,95 TL' -> 129995 (tam sayı kuruş; float toplama/karşılaştırma hatası yok)"""
+    price = parse_price(text)
+    return None if price is None else int(round(price * 100))
+
+
+def parse_price_range_kurus(text):
+    """'89-159 TL' -> (8900, 15900); tek fiyat -> (p, p); fiyat yoksa None"""
+    prices = [parse_price_kurus(part) for part in (text or "").split("-")]
+    prices = [price for price in prices if price is not None]
+    if not prices:
+        return None
+    return min(prices), max(prices)
+
+
+def tl_to_kurus(value):
+    """İstekteki TL değeri (199.9) -> kuruş (19990)"""
+    return None if value is None else int(round(value * 100))
+
+
+class CatalogProduct:
+    """Katalogdaki tek ürün - salt okunur kayıt, istekler arasında paylaşılır"""
+
+    __slots__ = ("product_id",) + CATALOG_FIELDS + ("price_kurus",)
+
+    def __init__(self, product_id, brand, gender, category, name, price, image, url, price_kurus=None):
+        # Fiyat metni yüklemede bir kez ayrıştırılır; filtreler sadece price_kurus'a bakar
+        if price_kurus is None:
+            price_kurus = parse_price_kurus(price)
+        values = (product_id, brand, gender, category, name, price, image, url, price_kurus)
+        for field, value in zip(self.__slots__, values):
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CatalogProduct değiştirilemez")
+
+    def to_dict(self, **extra):
+        """API cevabı için yeni dict (katalog kaydı değişmez)"""
+        product = {"product_id": self.product_id, "name": self.name, "price": self.price,
+                   "image": self.image, "url": self.url}
+        product.update(extra)
+        return product
+
+
+class ProductCatalog:
+    """Bir kez yüklenen, (marka, cinsiyet, kategori) ile indekslenmiş ürün kataloğu.
+
+    Sorgular katalogdaki tuple'ları döndürür - istek başına kopya yok.
+    """
+
+    def __init__(self, products=(), source=None):
+        self.source = source
+        self._products = tuple(products)
+        index = {}
+        for product in self._products:
+            index.setdefault((product.brand, product.gender, product.category), []).append(product)
+        self._index = {key: tuple(items) for key, items in index.items()}
+
+        categories = {}
+        for brand, gender, category in self._index:
+            categories.setdefault((brand, gender), []).append(category)
+        self._categories = {key: tuple(items) for key, items in categories.items()}
+        self._brands = tuple(sorted({brand for brand, _ in self._categories}))
+
+        # Fiyat indeksi: dilim başına fiyata göre sıralı (kuruşlar, ürünler) - aralık sorgusu bisect ile
+        self._price_index = {}
+        for key, items in self._index.items():
+            ordered = sorted((p for p in items if p.price_kurus is not None), key=lambda p: p.price_kurus)
+            self._price_index[key] = ([p.price_kurus for p in ordered], tuple(ordered))
+
+    @classmethod
+    def from_records(cls, records, source=None):
+        products = []
+        for record in records:
+            products.append(CatalogProduct(len(products), *(record.get(f) for f in CATALOG_FIELDS)))
+        return cls(products, source)
+
+    @classmethod
+    def load(cls, path=None):
+        """JSON ({"products": [...]}) ya da SQLite (catalog_products tablosu) dosyasından yükle"""
+        path = path or default_catalog_path()
+        if path.endswith((".db", ".sqlite", ".sqlite3")):
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                conn.row_factory = sqlite3.Row
+                rows = conn.execute(
+                    f"SELECT {', '.join(CATALOG_FIELDS)} FROM catalog_products ORDER BY rowid"
+                ).fetchall()
+            finally:
+                conn.close()
+            return cls.from_records((dict(row) for row in rows), source=path)
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls.from_records(data.get("products", []), source=path)
+
+    def products(self, brand, gender, category):
+        """Kategori ürünleri (değiştirilemez tuple; yoksa boş)"""
+        return self._index.get((brand, gender, category), ())
+
+    def products_in_price_range(self, brand, gender, category, min_kurus=None, max_kurus=None):
+        """Fiyatı [min_kurus, max_kurus] aralığındaki ürünler, ucuzdan pahalıya (fiyatsızlar hariç)"""
+        entry = self._price_index.get((brand, gender, category))
+        if entry is None:
+            return ()
+        prices, products = entry
+        low = 0 if min_kurus is None else bisect.bisect_left(prices, min_kurus)
+        high = len(prices) if max_kurus is None else bisect.bisect_right(prices, max_kurus)
+        return products[low:high]
+
+    def categories(self, brand, gender):
+        return self._categories.get((brand, gender), ())
+
+    def has(self, brand, gender):
+        return (brand, gender) in self._categories
+
+    @property
+    def brands(self):
+        return self._brands
+
+    def __len__(self):
+        return len(self._products)
+
+    def __iter__(self):
+        return iter(self._products)
+
+    def stats(self):
+        return {
+            "source": self.source,
+            "products": len(self._products),
+            "brands": len(self._brands),
+            "slices": len(self._index)
+        }
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Süreç başına tek katalog (ilk kullanımda yüklenir)"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                try:
+                    _catalog = ProductCatalog.load()
+                    print(f"📦 Ürün kataloğu yüklendi: {len(_catalog)} ürün")
+                except Exception as e:
+                    print(f"⚠️ Ürün kataloğu yüklenemedi: {e}")
+                    _catalog = ProductCatalog(source=None)
+    return _catalog
+
+
+# Benchmark için: python product_catalog.py [ürün_sayısı]
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+
+    catalog = ProductCatalog.load()
+    print(f"=== KATALOG ({catalog.stats()}) ===")
+    assert catalog.products("Zara", "kadın", "bel_vurgulu_elbise")
+    assert catalog.products("Mango", "kadın", "elbise") == ()
+    assert parse_price_kurus("1.299,95 TL") == 129995 and parse_price_kurus("₺299,90") == 29990
+    assert parse_price_range_kurus("89-159 TL") == (8900, 15900) and parse_price_range_kurus("") is None
+    for brand, gender, category in catalog._index:
+        prices = [p.price_kurus for p in catalog.products_in_price_range(brand, gender, category, 10000, 30000)]
+        expected = sorted(p.price_kurus for p in catalog.products(brand, gender, category)
+                          if p.price_kurus is not None and 10000 <= p.price_kurus <= 30000)
+        assert prices == expected, (brand, gender, category)
+    try:
+        catalog.products("Zara", "kadın", "basic_tshirt")[0].name = "x"
+        raise AssertionError("kayıt değiştirilebildi")
+    except AttributeError:
+        pass
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = random.Random(42)
+    brands = ['Zara', 'Trendyol', 'H&M', 'Bershka']
+    categories = [f"kategori_{i}" for i in range(200)]
+    big = ProductCatalog.from_records(
+        {"brand": rng.choice(brands), "gender": rng.choice(['kadın', 'erkek']),
+         "category": rng.choice(categories), "name": f"Ürün {i}", "price": "199.99 TL",
+         "image": "", "url": f"https://example.com/{i}"}
+        for i in range(total)
+    )
+
+    runs = 100_000
+    start = time.perf_counter()
+    for i in range(runs):
+        big.products(brands[i % 4], 'kadın', categories[i % 200])
+    per_lookup = (time.perf_counter() - start) / runs * 1e6
+    print(f"{len(big):,} ürün: kategori sorgusu {per_lookup:.2f} µs")
+
+    priced = ProductCatalog.from_records(
+        {"brand": "Zara", "gender": "kadın", "category": "elbise", "name": f"Elbise {i}",
+         "price": f"{rng.randint(50, 3000)},{rng.randint(0, 99):02d} TL", "image": "", "url": f"https://example.com/{i}"}
+        for i in range(total)
+    )
+    runs = 10_000
+    start = time.perf_counter()
+    for i in range(runs):
+        priced.products_in_price_range("Zara", "kadın", "elbise", 50000 + i, 55000 + i)
+    per_range = (time.perf_counter() - start) / runs * 1e6
+    start = time.perf_counter()
+    for i in range(100):
+        [p for p in priced.products("Zara", "kadın", "elbise") if 500 + i / 100 <= parse_price(p.price) <= 550 + i / 100]
+    per_scan = (time.perf_counter() - start) / 100 * 1e6
+    print(f"{len(priced):,} ürünlük dilimde fiyat aralığı: bisect {per_range:.2f} µs, metin tarama {per_scan:.0f} µs")
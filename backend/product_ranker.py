@@ -0,0 +1,206 @@
+import threading
+
+import numpy as np
+
+from text_utils import tokenize
+
+# Skor ağırlıkları: önerilen kategori/etiket artı, kaçınılacak özellik ceza
+CATEGORY_WEIGHT = 2.0
+AVOID_PENALTY = 3.0
+PRICE_BAND_WEIGHT = 0.5
+# Eşit skorlu ürünler arasında her çağrıda farklı sıra (kategori ağırlığından küçük)
+DEFAULT_JITTER = 0.3
+
+# TL fiyat bantları (alt sınırlar)
+PRICE_BANDS = (0, 200, 500, 1000, 2000)
+
+
+def product_terms(category, name):
+    """Ürün etiketleri: kategori, kelimeler ve ardışık kelime çiftleri ('bol_kesim')"""
+    terms = {category} if category else set()
+    for text in (category, name):
+        tokens = tokenize(text)
+        terms.update(tokens)
+        terms.update(f"{a}_{b}" for a, b in zip(tokens, tokens[1:]))
+    return terms
+
+
+def price_band(price):
+    if price is None:
+        return None
+    return int(np.searchsorted(PRICE_BANDS, price, side="right")) - 1
+
+
+class AffinityRanker:
+    """Katalog için vücut tipi uyum sıralaması.
+
+    Katalog (ürün x özellik) NumPy matrisi olarak tutulur: kategori, fiyat bandı ve
+    öneri/kaçınma listelerinde geçen etiketler. Tercih vektörü (cinsiyet, vücut tipi)
+    başına bir kez kurulur; skor = matris @ vektör, seçim argpartition ile.
+    """
+
+    def __init__(self, catalog, recommendations):
+        self.catalog = catalog
+        self.recommendations = recommendations
+        self.products = list(catalog)
+
+        # Özellik sözlüğü: sadece tercih vektörlerinde ağırlığı olabilecek terimler
+        features = {}
+        for body_types in recommendations.values():
+            for spec in body_types.values():
+                for term in list(spec.get('categories', [])) + list(spec.get('avoid', [])):
+                    features.setdefault(term, len(features))
+        self._band_offset = len(features)
+        self.features = features
+        size = len(features) + len(PRICE_BANDS)
+
+        # Sütun bazlı (Fortran) düzen: tercih vektörünün sıfır olmayan sütunları ucuz okunur
+        matrix = np.zeros((len(self.products), size), dtype=np.float32, order="F")
+        slices = {}
+        for row, product in enumerate(self.products):
+            for term in product_terms(product.category, product.name):
+                column = features.get(term)
+                if column is not None:
+                    matrix[row, column] = 1.0
+            band = price_band(None if product.price_kurus is None else product.price_kurus / 100)
+            if band is not None:
+                matrix[row, self._band_offset + band] = 1.0
+            slices.setdefault((product.brand, product.gender), []).append(row)
+        self.matrix = matrix
+        # Fiyat filtresi için kuruş dizisi; fiyatsız ürün NaN (her karşılaştırmada elenir)
+        self._prices = np.asarray([np.nan if p.price_kurus is None else p.price_kurus for p in self.products],
+                                  dtype=np.float64)
+        self._slices = {key: np.asarray(rows, dtype=np.int64) for key, rows in slices.items()}
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def preference_vector(self, gender, body_type, band=None):
+        """Önerilen kategoriler +, kaçınılacaklar - ağırlıklı tercih vektörü"""
+        vector = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        spec = self.recommendations.get(gender, {}).get(body_type, {})
+        for term in spec.get('categories', []):
+            vector[self.features[term]] += CATEGORY_WEIGHT
+        for term in spec.get('avoid', []):
+            vector[self.features[term]] -= AVOID_PENALTY
+        if band is not None:
+            vector[self._band_offset + band] += PRICE_BAND_WEIGHT
+        return vector
+
+    def scores(self, gender, body_type, band=None):
+        """Tüm katalog için skorlar (tercih başına bir kez hesaplanır)"""
+        key = (gender, body_type, band)
+        scores = self._scores.get(key)
+        if scores is None:
+            vector = self.preference_vector(gender, body_type, band)
+            columns = np.flatnonzero(vector)
+            if len(columns):
+                scores = self.matrix[:, columns] @ vector[columns]
+            else:
+                scores = np.zeros(len(self.products), dtype=np.float32)
+            with self._lock:
+                self._scores[key] = scores
+        return scores
+
+    def rank(self, brand, gender, body_type, limit=6, band=None, jitter=DEFAULT_JITTER, rng=None,
+             min_kurus=None, max_kurus=None):
+        """Marka + cinsiyet dilimindeki en uyumlu `limit` ürün (CatalogProduct listesi).
+
+        min_kurus/max_kurus verilirse sadece aralıktaki ürünler sıralanır (fiyatsızlar hariç).
+        """
+        rows = self._slices.get((brand, gender))
+        if rows is None or limit <= 0:
+            return []
+        if min_kurus is not None or max_kurus is not None:
+            prices = self._prices[rows]
+            in_range = ~np.isnan(prices)
+            if min_kurus is not None:
+                in_range &= prices >= min_kurus
+            if max_kurus is not None:
+                in_range &= prices <= max_kurus
+            rows = rows[in_range]
+            if not len(rows):
+                return []
+        slice_scores = self.scores(gender, body_type, band)[rows]
+        if jitter:
+            rng = rng or np.random.default_rng()
+            slice_scores = slice_scores + rng.random(len(rows), dtype=np.float32) * jitter
+
+        if limit < len(rows):
+            top = np.argpartition(-slice_scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-slice_scores[top], kind="stable")]
+        return [self.products[i] for i in rows[top]]
+
+
+_rankers = {}
+_rankers_lock = threading.Lock()
+
+
+def get_ranker(catalog, recommendations):
+    """Katalog başına tek sıralayıcı (matris bir kez kurulur)"""
+    entry = _rankers.get(id(catalog))
+    if entry is None or entry[0] is not catalog:
+        with _rankers_lock:
+            entry = _rankers.get(id(catalog))
+            if entry is None or entry[0] is not catalog:
+                entry = (catalog, AffinityRanker(catalog, recommendations))
+                _rankers[id(catalog)] = entry
+    return entry[1]
+
+
+# Benchmark için: python product_ranker.py [ürün_sayısı]
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+
+    from product_catalog import ProductCatalog
+    from product_scraper import BODY_TYPE_RECOMMENDATIONS as recommendations
+
+    # Küçük katalog: önerilen kategori önce, kaçınılacak etiketli ürün en sonda
+    catalog = ProductCatalog.from_records([
+        {"brand": "Zara", "gender": "kadın", "category": "bel_vurgulu_elbise", "name": "Midi Elbise", "price": "299.95 TL"},
+        {"brand": "Zara", "gender": "kadın", "category": "basic_tshirt", "name": "Basic Tişört", "price": "99.95 TL"},
+        {"brand": "Zara", "gender": "kadın", "category": "basic_tshirt", "name": "Bol Kesim Tişört", "price": "99.95 TL"},
+        {"brand": "Zara", "gender": "erkek", "category": "slim_fit", "name": "Slim Fit Gömlek", "price": "499.95 TL"}
+    ])
+    ranker = AffinityRanker(catalog, recommendations)
+    names = [p.name for p in ranker.rank("Zara", "kadın", "Rectangle", limit=3, jitter=0)]
+    assert names == ["Midi Elbise", "Basic Tişört", "Bol Kesim Tişört"], names
+    assert [p.gender for p in ranker.rank("Zara", "erkek", "Athletic", limit=5)] == ["erkek"]
+    assert ranker.rank("Mango", "kadın", "Rectangle") == []
+    # Fiyat aralığı sıralamadan önce uygulanır; uyum sırası korunur
+    names = [p.name for p in ranker.rank("Zara", "kadın", "Rectangle", limit=3, jitter=0, max_kurus=10000)]
+    assert names == ["Basic Tişört", "Bol Kesim Tişört"], names
+    assert ranker.rank("Zara", "kadın", "Rectangle", min_kurus=100000) == []
+    print("✅ Testler geçti")
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+    terms = sorted({term for body_types in recommendations.values() for spec in body_types.values()
+                    for term in spec['categories'] + spec['avoid']})
+    brands = ['Zara', 'Trendyol', 'H&M', 'Bershka']
+    big = ProductCatalog.from_records(
+        {"brand": rng.choice(brands), "gender": rng.choice(['kadın', 'erkek']),
+         "category": rng.choice(terms), "name": f"{rng.choice(terms).replace('_', ' ')} ürün {i}",
+         "price": f"{rng.randint(50, 3000)}.99 TL", "image": "", "url": f"https://example.com/{i}"}
+        for i in range(total)
+    )
+
+    start = time.perf_counter()
+    big_ranker = AffinityRanker(big, recommendations)
+    print(f"=== SIRALAMA BENCHMARK ({total:,} ürün, matris {big_ranker.matrix.shape}) ===")
+    print(f"Matris kurulumu: {time.perf_counter() - start:.2f} sn (süreç başına bir kez)")
+
+    start = time.perf_counter()
+    big_ranker.scores("kadın", "Pear")
+    print(f"İlk skor hesabı (matris @ vektör): {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    generator = np.random.default_rng(0)
+    for jitter in (0, DEFAULT_JITTER):
+        runs = 1000
+        start = time.perf_counter()
+        for i in range(runs):
+            big_ranker.rank(brands[i % 4], "kadın", "Pear", limit=6, jitter=jitter, rng=generator)
+        print(f"rank(limit=6, jitter={jitter}): {(time.perf_counter() - start) / runs * 1000:.3f} ms / çağrı")
@@ -1,12 +1,95 @@
 import requests
 from bs4 import BeautifulSoup
 import json
+import os
 import time
 from urllib.parse import urljoin, quote
 import random
+from functools import partial
+from fanout import hedged_fan_out
+from product_catalog import get_catalog
+from body_cues import detect_body_info
+from product_ranker import get_ranker
+from response_cache import BackgroundRefreshCache
+from text_utils import tokenize
+
+# Marka arama sonuçları cache'i (süreç başına, tüm ProductScraper örnekleri paylaşır)
+BRAND_CACHE_MAX_ENTRIES = int(os.getenv("BRAND_CACHE_MAX_ENTRIES", "2048"))
+BRAND_CACHE_TTL_SECONDS = int(os.getenv("BRAND_CACHE_TTL_SECONDS", "900"))
+BRAND_CACHE_STALE_SECONDS = int(os.getenv("BRAND_CACHE_STALE_SECONDS", "86400"))
+BRAND_CACHE_NEGATIVE_TTL = int(os.getenv("BRAND_CACHE_NEGATIVE_TTL", "60"))
+
+brand_search_cache = BackgroundRefreshCache(
+    max_entries=BRAND_CACHE_MAX_ENTRIES,
+    ttl_seconds=BRAND_CACHE_TTL_SECONDS,
+    stale_seconds=BRAND_CACHE_STALE_SECONDS,
+    negative_ttl=BRAND_CACHE_NEGATIVE_TTL,
+    name="brand_search"
+)
+
+
+# DINAMIK ÖNERI SİSTEMİ - vücut tipi başına önerilen/kaçınılacak kategoriler (main.py de kullanır)
+BODY_TYPE_RECOMMENDATIONS = {
+    'kadın': {
+        'Rectangle': {
+            'categories': ['bel_vurgulu_elbise', 'yuksek_bel_pantolon', 'wrap_elbise', 'kemer_detayli', 'peplum', 'v_yaka'],
+            'avoid': ['bol_kesim', 'duz_hatli']
+        },
+        'Pear': {
+            'categories': ['omuz_detayli', 'boat_neck', 'blazer', 'acik_renk_ust', 'statement_kolye', 'structured_shoulders'],
+            'avoid': ['dar_ust', 'koyu_ust_acik_alt']
+        },
+        'Apple': {
+            'categories': ['empire_waist', 'v_neck', 'uzun_cardigan', 'flowy_top', 'straight_leg', 'vertical_stripes'],
+            'avoid': ['bel_vurgulu', 'dar_ust']
+        },
+        'Hourglass': {
+            'categories': ['fitted_elbise', 'bodycon', 'wrap_dress', 'high_waist', 'belted_jacket', 'pencil_skirt'],
+            'avoid': ['bol_kesim', 'boxy_cuts']
+        },
+        'Athletic': {
+            'categories': ['feminen_detay', 'soft_fabric', 'curved_lines', 'ruffles', 'midi_elbise', 'flowy_skirt'],
+            'avoid': ['cok_structured', 'masculine_cuts']
+        }
+    },
+    'erkek': {
+        'Rectangle': {
+            'categories': ['layered_giyim', 'horizontal_stripes', 'textured_fabric', 'regular_fit', 'chino', 'crew_neck'],
+            'avoid': ['cok_dar', 'vertical_stripes']
+        },
+        'Athletic': {
+            'categories': ['fitted_gomlek', 'slim_fit', 'tailored_pantolon', 'v_neck', 'structured_blazer', 'straight_cut'],
+            'avoid': ['bol_kesim', 'boxy_cuts']
+        },
+        'Stocky': {
+            'categories': ['vertical_stripes', 'duz_renk', 'regular_fit', 'dark_wash_jean', 'v_neck', 'uzun_cardigan'],
+            'avoid': ['horizontal_stripes', 'cok_dar']
+        },
+        'Apple': {
+            'categories': ['v_neck', 'button_down', 'straight_leg', 'dark_colors', 'vertical_details', 'single_breasted'],
+            'avoid': ['tight_fit', 'horizontal_patterns']
+        }
+    }
+}
+
+
+def brand_search_key(brand, query, gender):
+    """'  Elbise! ' ve 'elbise' aynı anahtara düşsün"""
+    return (brand.casefold(), " ".join(tokenize(query)), (gender or "").casefold())
+
+
+def _require_results(loader):
+    # Arka plan yenilemesinde boş sonuç da hata sayılır (negatif cache'e düşer)
+    products = loader()
+    if not products:
+        raise LookupError("sonuç yok")
+    return products
 
 class ProductScraper:
-    def __init__(self):
+    def __init__(self, catalog=None):
+        # Ürün kataloğu süreç başına bir kez yüklenir (product_catalog.json)
+        self.catalog = catalog if catalog is not None else get_catalog()
+        
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
@@ -28,91 +111,12 @@ class ProductScraper:
         }
         
         # DINAMIK ÖNERI SİSTEMİ
-        self.body_type_recommendations = {
-            'kadın': {
-                'Rectangle': {
-                    'categories': ['bel_vurgulu_elbise', 'yuksek_bel_pantolon', 'wrap_elbise', 'kemer_detayli', 'peplum', 'v_yaka'],
-                    'avoid': ['bol_kesim', 'duz_hatli']
-                },
-                'Pear': {
-                    'categories': ['omuz_detayli', 'boat_neck', 'blazer', 'acik_renk_ust', 'statement_kolye', 'structured_shoulders'],
-                    'avoid': ['dar_ust', 'koyu_ust_acik_alt']
-                },
-                'Apple': {
-                    'categories': ['empire_waist', 'v_neck', 'uzun_cardigan', 'flowy_top', 'straight_leg', 'vertical_stripes'],
-                    'avoid': ['bel_vurgulu', 'dar_ust']
-                },
-                'Hourglass': {
-                    'categories': ['fitted_elbise', 'bodycon', 'wrap_dress', 'high_waist', 'belted_jacket', 'pencil_skirt'],
-                    'avoid': ['bol_kesim', 'boxy_cuts']
-                },
-                'Athletic': {
-                    'categories': ['feminen_detay', 'soft_fabric', 'curved_lines', 'ruffles', 'midi_elbise', 'flowy_skirt'],
-                    'avoid': ['cok_structured', 'masculine_cuts']
-                }
-            },
-            'erkek': {
-                'Rectangle': {
-                    'categories': ['layered_giyim', 'horizontal_stripes', 'textured_fabric', 'regular_fit', 'chino', 'crew_neck'],
-                    'avoid': ['cok_dar', 'vertical_stripes']
-                },
-                'Athletic': {
-                    'categories': ['fitted_gomlek', 'slim_fit', 'tailored_pantolon', 'v_neck', 'structured_blazer', 'straight_cut'],
-                    'avoid': ['bol_kesim', 'boxy_cuts']
-                },
-                'Stocky': {
-                    'categories': ['vertical_stripes', 'duz_renk', 'regular_fit', 'dark_wash_jean', 'v_neck', 'uzun_cardigan'],
-                    'avoid': ['horizontal_stripes', 'cok_dar']
-                },
-                'Apple': {
-                    'categories': ['v_neck', 'button_down', 'straight_leg', 'dark_colors', 'vertical_details', 'single_breasted'],
-                    'avoid': ['tight_fit', 'horizontal_patterns']
-                }
-            }
-        }
+        self.body_type_recommendations = BODY_TYPE_RECOMMENDATIONS
     
     def extract_body_info_from_analysis(self, analysis_text):
-        """AI analizinden vücut tipi ve cinsiyet çıkar - İYİLEŞTİRİLMİŞ"""
-        analysis_lower = analysis_text.lower()
-        
-        # Cinsiyet tespiti - DAHA AKILLI
-        gender = 'kadın'  # default kadın
-        
-        # Erkek tespiti - daha spesifik
-        erkek_keywords = ['erkek', 'adam', 'bay', 'male', 'man', 'masculine', 'maskulen']
-        kadin_keywords = ['kadın', 'bayan', 'hanım', 'female', 'woman', 'feminine', 'feminen']
-        
-        erkek_score = sum(1 for word in erkek_keywords if word in analysis_lower)
-        kadin_score = sum(1 for word in kadin_keywords if word in analysis_lower)
-        
-        # Açık cinsiyet belirteci varsa
-        if "👨" in analysis_text or "♂" in analysis_text:
-            gender = 'erkek'
-        elif "👩" in analysis_text or "♀" in analysis_text:
-            gender = 'kadın'
-        elif erkek_score > kadin_score and erkek_score > 0:
-            gender = 'erkek'
-        elif kadin_score >= erkek_score:
-            gender = 'kadın'
-        
-        # Vücut tipi tespiti - İYİLEŞTİRİLMİŞ
-        body_type = 'Rectangle'  # default
-        
-        if any(word in analysis_lower for word in ['dikdörtgen', 'rectangle']):
-            body_type = 'Rectangle'
-        elif any(word in analysis_lower for word in ['pear', 'armut']):
-            body_type = 'Pear'
-        elif any(word in analysis_lower for word in ['apple', 'elma']):
-            body_type = 'Apple'
-        elif any(word in analysis_lower for word in ['hourglass', 'kum saati']):
-            body_type = 'Hourglass'
-        elif any(word in analysis_lower for word in ['athletic', 'atletik']):
-            body_type = 'Athletic'
-        elif any(word in analysis_lower for word in ['stocky', 'güçlü']):
-            body_type = 'Stocky'
-        
+        """AI analizinden vücut tipi ve cinsiyet çıkar (eski öncelik kuralları, kelime başı eşleşme)"""
+        gender, body_type = detect_body_info(analysis_text)
         print(f"🔍 Analiz sonucu: {gender} {body_type}")
-        print(f"📊 Cinsiyet skorları - Kadın: {kadin_score}, Erkek: {erkek_score}")
         
         return gender, body_type
 
@@ -162,112 +166,6 @@ class ProductScraper:
         else:
             return f"{final_price}.90 TL"
 
-    def _get_all_products_database(self):
-        """SADECE 4 MARKA - KAPSAMLI ürün veritabanı"""
-        return {
-            'Zara': {
-                'kadın': {
-                    'bel_vurgulu_elbise': [
-                        {'name': 'Bel Vurgulu Midi Elbise', 'price': '299.95 TL', 'image': 'https://dummyimage.com/300x400/e74c3c/ffffff?text=Bel+Vurgulu+Elbise', 'url': 'https://www.zara.com/tr/tr/kadin-elbise-l1066.html'},
-                        {'name': 'Kemer Detaylı Wrap Elbise', 'price': '399.95 TL', 'image': 'https://dummyimage.com/300x400/9b59b6/ffffff?text=Wrap+Elbise', 'url': 'https://www.zara.com/tr/tr/kadin-elbise-l1066.html'}
-                    ],
-                    'yuksek_bel_pantolon': [
-                        {'name': 'Yüksek Bel Wide Leg Pantolon', 'price': '349.95 TL', 'image': 'https://dummyimage.com/300x400/3498db/ffffff?text=Yuksek+Bel+Pantolon', 'url': 'https://www.zara.com/tr/tr/kadin-pantolon-l1335.html'},
-                        {'name': 'High Waist Straight Pantolon', 'price': '289.95 TL', 'image': 'https://dummyimage.com/300x400/2ecc71/ffffff?text=High+Waist', 'url': 'https://www.zara.com/tr/tr/kadin-pantolon-l1335.html'}
-                    ],
-                    'omuz_detayli': [
-                        {'name': 'Omuz Detaylı Bluz', 'price': '199.95 TL', 'image': 'https://dummyimage.com/300x400/1abc9c/ffffff?text=Omuz+Detayli', 'url': 'https://www.zara.com/tr/tr/kadin-tishertler-l1362.html'},
-                        {'name': 'Statement Shoulder Top', 'price': '249.95 TL', 'image': 'https://dummyimage.com/300x400/e67e22/ffffff?text=Statement+Shoulder', 'url': 'https://www.zara.com/tr/tr/kadin-tishertler-l1362.html'}
-                    ],
-                    'fitted_elbise': [
-                        {'name': 'Bodycon Midi Elbise', 'price': '299.95 TL', 'image': 'https://dummyimage.com/300x400/c0392b/ffffff?text=Bodycon+Elbise', 'url': 'https://www.zara.com/tr/tr/kadin-elbise-l1066.html'},
-                        {'name': 'Fitted Pencil Dress', 'price': '349.95 TL', 'image': 'https://dummyimage.com/300x400/27ae60/ffffff?text=Fitted+Dress', 'url': 'https://www.zara.com/tr/tr/kadin-elbise-l1066.html'}
-                    ],
-                    'basic_tshirt': [
-                        {'name': 'Kadın Basic Tişört', 'price': '99.95 TL', 'image': 'https://dummyimage.com/300x400/95a5a6/ffffff?text=Kadin+Basic', 'url': 'https://www.zara.com/tr/tr/kadin-tishertler-l1362.html'}
-                    ]
-                },
-                'erkek': {
-                    'fitted_gomlek': [
-                        {'name': 'Slim Fit Gömlek', 'price': '299.95 TL', 'image': 'https://dummyimage.com/300x400/34495e/ffffff?text=Slim+Fit+Gomlek', 'url': 'https://www.zara.com/tr/tr/erkek-gomlek-l669.html'},
-                        {'name': 'Tailored Dress Shirt', 'price': '349.95 TL', 'image': 'https://dummyimage.com/300x400/2c3e50/ffffff?text=Tailored+Shirt', 'url': 'https://www.zara.com/tr/tr/erkek-gomlek-l669.html'}
-                    ],
-                    'regular_fit': [
-                        {'name': 'Regular Fit Gömlek', 'price': '249.95 TL', 'image': 'https://dummyimage.com/300x400/bdc3c7/ffffff?text=Regular+Fit', 'url': 'https://www.zara.com/tr/tr/erkek-gomlek-l669.html'}
-                    ],
-                    'basic_tshirt': [
-                        {'name': 'Erkek Basic Tişört', 'price': '129.95 TL', 'image': 'https://dummyimage.com/300x400/ecf0f1/ffffff?text=Erkek+Tshirt', 'url': 'https://www.zara.com/tr/tr/erkek-tishertler-l855.html'}
-                    ]
-                }
-            },
-            'Trendyol': {
-                'kadın': {
-                    'bel_vurgulu_elbise': [
-                        {'name': 'Kadın Bel Detaylı Elbise', 'price': '139.90 TL', 'image': 'https://dummyimage.com/300x400/ff6b6b/ffffff?text=Bel+Detayli', 'url': 'https://www.trendyol.com/sr?q=bel+detaylı+elbise'}
-                    ],
-                    'yuksek_bel_pantolon': [
-                        {'name': 'High Waist Mom Jean', 'price': '169.90 TL', 'image': 'https://dummyimage.com/300x400/4ecdc4/ffffff?text=High+Waist+Jean', 'url': 'https://www.trendyol.com/sr?q=yüksek+bel+pantolon'}
-                    ],
-                    'omuz_detayli': [
-                        {'name': 'Off-Shoulder Top', 'price': '79.90 TL', 'image': 'https://dummyimage.com/300x400/45b7d1/ffffff?text=Off+Shoulder', 'url': 'https://www.trendyol.com/sr?q=omuz+detaylı+bluz'}
-                    ],
-                    'basic_tshirt': [
-                        {'name': 'Kadın Basic Tee', 'price': '49.90 TL', 'image': 'https://dummyimage.com/300x400/96ceb4/ffffff?text=Kadin+Basic', 'url': 'https://www.trendyol.com/sr?q=kadın+basic+tişört'}
-                    ]
-                },
-                'erkek': {
-                    'regular_fit': [
-                        {'name': 'Regular Fit Hoodie', 'price': '119.90 TL', 'image': 'https://dummyimage.com/300x400/786fa6/ffffff?text=Regular+Hoodie', 'url': 'https://www.trendyol.com/sr?q=erkek+hoodie'}
-                    ],
-                    'basic_tshirt': [
-                        {'name': 'Erkek Basic Tişört', 'price': '59.90 TL', 'image': 'https://dummyimage.com/300x400/574b90/ffffff?text=Erkek+Basic', 'url': 'https://www.trendyol.com/sr?q=erkek+basic+tişört'}
-                    ]
-                }
-            },
-            'H&M': {
-                'kadın': {
-                    'bel_vurgulu_elbise': [
-                        {'name': 'Bel Detaylı Midi Elbise', 'price': '149.99 TL', 'image': 'https://dummyimage.com/300x400/e17055/ffffff?text=HM+Elbise', 'url': 'https://www2.hm.com/tr_tr/search-results.html?q=elbise'}
-                    ],
-                    'yuksek_bel_pantolon': [
-                        {'name': 'Wide High Jeans', 'price': '199.99 TL', 'image': 'https://dummyimage.com/300x400/00b894/ffffff?text=HM+Jean', 'url': 'https://www2.hm.com/tr_tr/search-results.html?q=yüksek+bel+jean'}
-                    ],
-                    'basic_tshirt': [
-                        {'name': 'Basic Cotton Tee', 'price': '79.99 TL', 'image': 'https://dummyimage.com/300x400/0984e3/ffffff?text=HM+Basic', 'url': 'https://www2.hm.com/tr_tr/search-results.html?q=basic+tişört'}
-                    ]
-                },
-                'erkek': {
-                    'regular_fit': [
-                        {'name': 'Regular Fit Tee', 'price': '89.99 TL', 'image': 'https://dummyimage.com/300x400/636e72/ffffff?text=HM+Erkek', 'url': 'https://www2.hm.com/tr_tr/search-results.html?q=erkek+tişört'}
-                    ],
-                    'basic_tshirt': [
-                        {'name': 'Cotton Basic Tee', 'price': '69.99 TL', 'image': 'https://dummyimage.com/300x400/2d3436/ffffff?text=HM+Basic', 'url': 'https://www2.hm.com/tr_tr/search-results.html?q=basic'}
-                    ]
-                }
-            },
-            'Bershka': {
-                'kadın': {
-                    'fitted_elbise': [
-                        {'name': 'Bodycon Elbise', 'price': '159.99 TL', 'image': 'https://dummyimage.com/300x400/ff7675/ffffff?text=Bershka+Bodycon', 'url': 'https://www.bershka.com/tr/search?searchTerm=bodycon+elbise'}
-                    ],
-                    'bel_vurgulu_elbise': [
-                        {'name': 'Cinched Waist Dress', 'price': '179.99 TL', 'image': 'https://dummyimage.com/300x400/74b9ff/ffffff?text=Bershka+Cinched', 'url': 'https://www.bershka.com/tr/search?searchTerm=bel+detaylı+elbise'}
-                    ],
-                    'basic_tshirt': [
-                        {'name': 'Trend Basic Tee', 'price': '79.99 TL', 'image': 'https://dummyimage.com/300x400/00cec9/ffffff?text=Bershka+Basic', 'url': 'https://www.bershka.com/tr/search?searchTerm=basic+tişört'}
-                    ]
-                },
-                'erkek': {
-                    'regular_fit': [
-                        {'name': 'Streetwear Hoodie', 'price': '199.99 TL', 'image': 'https://dummyimage.com/300x400/fdcb6e/ffffff?text=Bershka+Hoodie', 'url': 'https://www.bershka.com/tr/search?searchTerm=erkek+hoodie'}
-                    ],
-                    'basic_tshirt': [
-                        {'name': 'Urban Basic Tee', 'price': '89.99 TL', 'image': 'https://dummyimage.com/300x400/e84393/ffffff?text=Bershka+Basic', 'url': 'https://www.bershka.com/tr/search?searchTerm=erkek+basic'}
-                    ]
-                }
-            }
-        }
-    
     def get_dynamic_products_by_analysis(self, brand, analysis_text, limit=6):
         """DİNAMİK ürün seçimi - Her seferinde farklı!"""
         
@@ -279,36 +177,15 @@ class ProductScraper:
         
         print(f"🎯 {gender} {body_type} için kategoriler: {recommended_categories}")
         
-        # Markadan tüm ürünleri al
-        all_brand_products = self._get_all_products_database()
+        # Tüm marka/cinsiyet dilimi vücut tipine göre skorlanır (önerilen +, kaçınılacak -);
+        # eşit skorlular arasında küçük rastgelelik - HER SEFERINDE FARKLI SIRALAMA
+        ranked = get_ranker(self.catalog, self.body_type_recommendations).rank(
+            brand, gender, body_type, limit=limit
+        )
         
-        selected_products = []
-        
-        # Önerilen kategorilerden ürün seç
-        if brand in all_brand_products and gender in all_brand_products[brand]:
-            brand_products = all_brand_products[brand][gender]
-            
-            for category in recommended_categories:
-                if category in brand_products:
-                    category_products = brand_products[category].copy()
-                    random.shuffle(category_products)  # HER SEFERINDE FARKLI SIRALAMA
-                    selected_products.extend(category_products[:2])  # Her kategoriden max 2 ürün
-        
-        # Yeterli ürün yoksa basic'lerle doldur
-        if len(selected_products) < limit and brand in all_brand_products and gender in all_brand_products[brand]:
-            if 'basic_tshirt' in all_brand_products[brand][gender]:
-                basic_products = all_brand_products[brand][gender]['basic_tshirt'].copy()
-                random.shuffle(basic_products)
-                selected_products.extend(basic_products)
-        
-        # Listeyi karıştır ve sınırla
-        random.shuffle(selected_products)  # FINAL KARIŞTIRMA
-        final_products = selected_products[:limit]
-        
-        # Brand bilgisi ekle
-        for product in final_products:
-            product['brand'] = brand
-            product['recommended_for'] = f"{gender} {body_type}"
+        # Brand bilgisi cevap dict'ine eklenir - katalog kaydı değişmez
+        recommended_for = f"{gender} {body_type}"
+        final_products = [product.to_dict(brand=brand, recommended_for=recommended_for) for product in ranked]
         
         print(f"✅ {len(final_products)} dinamik ürün seçildi")
         
@@ -338,14 +215,42 @@ class ProductScraper:
             'Bershka': self._search_bershka_real
         }
         
+        # Popüler sorgular cache'ten: taze/eski sonuç hemen döner, eski olan arka planda
+        # yenilenir; hata veren marka kısa süre tekrar denenmez (negatif cache)
+        tasks = {}
         for brand in compatible_brands[:limit]:
-            if brand in brand_functions:
-                try:
-                    products = brand_functions[brand](search_query, gender, limit=1)
-                    all_products.extend(products)
-                    print(f"✅ {brand}: {len(products)} ürün eklendi")
-                except Exception as e:
-                    print(f"⚠️ {brand} arama hatası: {e}")
+            if brand not in brand_functions:
+                continue
+            key = brand_search_key(brand, search_query, gender)
+            loader = partial(brand_functions[brand], search_query, gender, limit=1)
+            status, cached = brand_search_cache.lookup(key)
+            if status in ("fresh", "stale"):
+                all_products.extend(dict(product) for product in cached)
+                if status == "stale":
+                    brand_search_cache.refresh(key, partial(_require_results, loader))
+                print(f"✅ {brand}: {len(cached)} ürün eklendi (cache: {status})")
+            elif status == "negative":
+                print(f"⏭️ {brand}: yakın zamanda başarısız, atlandı")
+            else:
+                tasks[brand] = loader
+        
+        # Cache'te olmayan markalar paralel aranır: gecikme toplam değil en yavaş markanın
+        # süresi kadar, deadline'ı aşan marka beklenmez (eksik kalan yer fallback ile dolar)
+        results, statuses = hedged_fan_out(tasks) if tasks else ({}, {})
+        
+        for brand in tasks:
+            key = brand_search_key(brand, search_query, gender)
+            if statuses[brand] == "ok" and results[brand]:
+                brand_search_cache.set(key, results[brand])
+                all_products.extend(dict(product) for product in results[brand])
+                print(f"✅ {brand}: {len(results[brand])} ürün eklendi")
+            elif statuses[brand] == "timeout":
+                # Yavaş marka: sonraki istek için arka planda doldur
+                brand_search_cache.refresh(key, partial(_require_results, tasks[brand]))
+                print(f"⚠️ {brand} arama hatası: {statuses[brand]}")
+            else:
+                brand_search_cache.set_negative(key)
+                print(f"⚠️ {brand} arama hatası: {'sonuç yok' if statuses[brand] == 'ok' else statuses[brand]}")
         
         # Eğer yeterli ürün yoksa fallback kullan
         if len(all_products) < limit:
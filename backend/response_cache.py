@@ -0,0 +1,430 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def make_cache_key(*parts):
+    """Normalize edilmiş parçalardan sabit uzunlukta cache anahtarı üret"""
+    normalized = [str(part).strip().casefold() if part is not None else "" for part in parts]
+    raw = json.dumps(normalized, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def bucket_value(value, step):
+    """Sayıyı en yakın `step` katına yuvarla (172 -> 170, step=5)"""
+    if step <= 1:
+        return int(value)
+    return int(round(value / step) * step)
+
+
+class TTLCache:
+    """TTL süreli, LRU tahliyeli, opsiyonel disk katmanlı cache.
+
+    Disk (SQLite) I/O bellek kilidi dışında yapılır; async kodda `aget`/`aset`
+    kullanılmalı - disk işlemleri thread'e alınır, event loop bloklanmaz.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, disk_path=None, name="cache",
+                 disk_max_entries=None, disk_purge_every=100):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        # Disk katmanı da sınırlı: süresi dolanlar + en erken bitecekler periyodik silinir
+        self.disk_max_entries = disk_max_entries or max_entries * 10
+        self.disk_purge_every = disk_purge_every
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self._disk = None
+
+        if disk_path:
+            try:
+                self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+                self._disk.execute('''
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    expires_at REAL
+                )
+                ''')
+                self._disk.execute(
+                    'CREATE INDEX IF NOT EXISTS idx_response_cache_expires ON response_cache (expires_at)'
+                )
+                self._purge_disk(time.time())
+            except Exception as e:
+                print(f"⚠️ {self.name} disk cache açılamadı: {e}")
+                self._disk = None
+
+    def _memory_get(self, key, now):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._data[key]
+            if not self._disk:
+                self.misses += 1
+            return False, None
+
+    def _promote(self, key, row, now):
+        """Disk sonucunu belleğe al, sayaçları güncelle"""
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires_at = row
+            self._store(key, value, now, expires_at - now)
+            self.hits += 1
+            self.disk_hits += 1
+            return value
+
+    def get(self, key):
+        now = time.time()
+        found, value = self._memory_get(key, now)
+        if found or not self._disk:
+            return value
+        return self._promote(key, self._disk_get(key, now), now)
+
+    async def aget(self, key):
+        """get() - disk okuması event loop dışında"""
+        now = time.time()
+        found, value = self._memory_get(key, now)
+        if found or not self._disk:
+            return value
+        row = await asyncio.to_thread(self._disk_get, key, now)
+        return self._promote(key, row, now)
+
+    def set(self, key, value, ttl_seconds=None):
+        expires_at = self._memory_set(key, value, ttl_seconds)
+        self._disk_set(key, value, expires_at)
+
+    async def aset(self, key, value, ttl_seconds=None):
+        """set() - disk yazması event loop dışında"""
+        expires_at = self._memory_set(key, value, ttl_seconds)
+        if self._disk:
+            await asyncio.to_thread(self._disk_set, key, value, expires_at)
+
+    def _memory_set(self, key, value, ttl_seconds):
+        now = time.time()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._store(key, value, now, ttl)
+        return now + ttl
+
+    def _store(self, key, value, now, ttl=None):
+        ttl = self.ttl_seconds if ttl is None else ttl
+        self._data[key] = (now + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key, now):
+        if not self._disk:
+            return None
+        try:
+            with self._disk_lock:
+                row = self._disk.execute(
+                    'SELECT value, expires_at FROM response_cache WHERE key = ? AND expires_at > ?', (key, now)
+                ).fetchone()
+            return (json.loads(row[0]), row[1]) if row else None
+        except Exception as e:
+            print(f"⚠️ {self.name} disk okuma hatası: {e}")
+            return None
+
+    def _disk_set(self, key, value, expires_at):
+        if not self._disk:
+            return
+        try:
+            with self._disk_lock:
+                self._disk.execute(
+                    'INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                    (key, json.dumps(value, ensure_ascii=False), expires_at)
+                )
+                self._disk.commit()
+                self._disk_writes += 1
+                purge = self._disk_writes % self.disk_purge_every == 0
+            if purge:
+                self._purge_disk(time.time())
+        except Exception as e:
+            print(f"⚠️ {self.name} disk yazma hatası: {e}")
+
+    def _purge_disk(self, now):
+        """Süresi dolanları ve sınırı aşan en erken bitecek girdileri sil"""
+        with self._disk_lock:
+            expired = self._disk.execute('DELETE FROM response_cache WHERE expires_at <= ?', (now,)).rowcount
+            overflow = self._disk.execute('SELECT COUNT(*) FROM response_cache').fetchone()[0] - self.disk_max_entries
+            if overflow > 0:
+                self._disk.execute('''
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache ORDER BY expires_at LIMIT ?
+                )
+                ''', (overflow,))
+            self._disk.commit()
+            self.disk_evictions += max(0, expired) + max(0, overflow)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        if self._disk:
+            with self._disk_lock:
+                self._disk.execute('DELETE FROM response_cache')
+                self._disk.commit()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "disk_evictions": self.disk_evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "disk_enabled": self._disk is not None
+        }
+
+
+class AsyncRefreshCache:
+    """Async loader'lar için stale-while-revalidate cache.
+
+    - Süresi dolmuş girdi hemen döner, yenileme arka planda tek task ile yapılır
+    - Aynı anahtar için eşzamanlı miss'ler tek loader çağrısını bekler (single-flight)
+    - `version` değişirse (ör. altta yatan veri değişti) girdi geçersiz sayılır
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, name="cache"):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._data = OrderedDict()  # key -> (expires_at, version, value)
+        self._inflight = {}  # key -> asyncio.Task
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+
+    async def get(self, key, version, loader):
+        """Cache'ten değer döndür; gerekirse `loader()` coroutine'i ile yükle"""
+        entry = self._data.get(key)
+        if entry is not None and entry[1] == version:
+            self._data.move_to_end(key)
+            if entry[0] > time.time():
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                task = self._refresh(key, version, loader)
+                # Arka plan yenilemesi başarısız olursa eski değer kullanılmaya devam eder
+                task.add_done_callback(self._log_failure)
+            return entry[2]
+
+        self.misses += 1
+        # Bekleyenlerden biri iptal edilirse (istemci koptu) paylaşılan yükleme diğerleri için sürer
+        return await asyncio.shield(self._refresh(key, version, loader))
+
+    def _refresh(self, key, version, loader):
+        task = self._inflight.get(key)
+        if task is None or task.version != version:
+            task = asyncio.ensure_future(self._load(key, version, loader))
+            task.version = version
+            self._inflight[key] = task
+        return task
+
+    async def _load(self, key, version, loader):
+        try:
+            value = await loader()
+            self.refreshes += 1
+            self._data[key] = (time.time() + self.ttl_seconds, version, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def _log_failure(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"⚠️ {self.name} arka plan yenileme hatası: {task.exception()}")
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "inflight": len(self._inflight),
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.stale_hits) / total, 3) if total else 0.0
+        }
+
+
+class BackgroundRefreshCache:
+    """Senkron (thread'li) kod için stale-while-revalidate cache.
+
+    - Taze girdi: doğrudan döner
+    - Süresi dolmuş ama `stale_seconds` içindeki girdi: hemen döner, yenileme arka planda
+    - Negatif girdi (loader hata verdi): `negative_ttl` boyunca loader tekrar çağrılmaz
+    - Aynı anahtar için tek yenileme (single-flight), LRU ile sınırlı bellek
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=600, stale_seconds=3600, negative_ttl=60,
+                 max_workers=4, name="cache"):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.negative_ttl = negative_ttl
+        self.max_workers = max_workers
+        self.name = name
+        self._data = OrderedDict()  # key -> (expires_at, stale_until, negative, value)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self._executor = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        """(durum, değer): durum 'fresh', 'stale', 'negative' ya da 'miss'"""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return "miss", None
+            expires_at, stale_until, negative, value = entry
+            if negative:
+                if expires_at > now:
+                    self.negative_hits += 1
+                    return "negative", None
+            elif expires_at > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return "fresh", value
+            elif stale_until > now:
+                self._data.move_to_end(key)
+                self.stale_hits += 1
+                return "stale", value
+            del self._data[key]
+            self.misses += 1
+            return "miss", None
+
+    def set(self, key, value, ttl_seconds=None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        with self._lock:
+            self._store(key, (now + ttl, now + ttl + self.stale_seconds, False, value))
+
+    def set_negative(self, key, ttl_seconds=None):
+        """Hata sonucunu kısa süre hatırla; kullanılabilir eski değer varsa onu koru"""
+        ttl = self.negative_ttl if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        with self._lock:
+            self.failures += 1
+            entry = self._data.get(key)
+            if entry is not None and not entry[2] and entry[1] > now:
+                return
+            self._store(key, (now + ttl, now + ttl, True, None))
+
+    def _store(self, key, entry):
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def refresh(self, key, loader, ttl_seconds=None):
+        """loader()'ı arka planda çalıştır ve sonucu yaz; anahtar başına tek yenileme (Future döner)"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=f"{self.name}-refresh")
+            future = self._executor.submit(self._load, key, loader, ttl_seconds)
+            self._inflight[key] = future
+            return future
+
+    def _load(self, key, loader, ttl_seconds):
+        try:
+            value = loader()
+            self.set(key, value, ttl_seconds)
+            self.refreshes += 1
+            return value
+        except Exception as e:
+            print(f"⚠️ {self.name} yenileme hatası: {e}")
+            self.set_negative(key)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get(self, key, loader, ttl_seconds=None, default=None):
+        """Cache'ten değer; miss'te loader beklenir, stale'de arka planda yenilenir"""
+        status, value = self.lookup(key)
+        if status == "fresh":
+            return value
+        if status == "stale":
+            self.refresh(key, loader, ttl_seconds)
+            return value
+        if status == "negative":
+            return default
+        try:
+            return self.refresh(key, loader, ttl_seconds).result()
+        except Exception:
+            return default
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.stale_hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+            "negative_ttl": self.negative_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "inflight": len(self._inflight),
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.stale_hits) / total, 3) if total else 0.0
+        }
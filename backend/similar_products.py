@@ -0,0 +1,317 @@
+import os
+import threading
+import zlib
+
+import numpy as np
+
+from catalog_search import normalize_token
+from product_ranker import price_band
+from text_utils import tokenize
+
+# Hashlenmiş özellik uzayı boyutu (50k ürün x 256 x float32 ~ 50 MB)
+VECTOR_DIM = int(os.getenv("SIMILAR_VECTOR_DIM", "256"))
+# Ayarlanırsa vektörler bu .npy dosyasına yazılır ve sonraki açılışlarda memory-map ile okunur
+VECTORS_PATH = os.getenv("SIMILAR_VECTORS_PATH")
+# Bu ürün sayısından sonra kaba nicemleyici (IVF) ile sadece yakın kümeler taranır
+IVF_MIN_PRODUCTS = int(os.getenv("SIMILAR_IVF_MIN_PRODUCTS", "20000"))
+IVF_NPROBE = int(os.getenv("SIMILAR_IVF_NPROBE", "8"))
+IVF_ITERATIONS = 8
+IVF_SAMPLE_PER_LIST = 40
+
+# Özellik ağırlıkları: kelime > fiyat bandı > karakter 3-gram
+WORD_WEIGHT = 1.0
+NGRAM_WEIGHT = 0.3
+PRICE_BAND_WEIGHT = 0.5
+NGRAM_SIZE = 3
+
+
+def product_features(name, category="", price_kurus=None):
+    """Ad + kategori kelimeleri, kelime 3-gram'ları ('gomlek' ~ 'gomlegi') ve fiyat bandı"""
+    words = [normalize_token(token) for token in tokenize(f"{name} {category}")]
+    features = {}
+    for word in words:
+        features[f"w:{word}"] = features.get(f"w:{word}", 0.0) + WORD_WEIGHT
+    for word in set(words):
+        padded = f" {word} "
+        for i in range(len(padded) - NGRAM_SIZE + 1):
+            gram = f"g:{padded[i:i + NGRAM_SIZE]}"
+            features[gram] = features.get(gram, 0.0) + NGRAM_WEIGHT
+    band = price_band(None if price_kurus is None else price_kurus / 100)
+    if band is not None:
+        features[f"p:{band}"] = PRICE_BAND_WEIGHT
+    return features
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def catalog_fingerprint(catalog):
+    """Kayıtlı vektörlerin hâlâ bu kataloğa ait olup olmadığını anlamak için"""
+    checksum = 0
+    for product in catalog:
+        checksum = zlib.crc32(f"{product.url}|{product.name}|{product.category}|{product.price}".encode(), checksum)
+    return checksum
+
+
+class FeatureHasher:
+    """Özellik -> (sütun, işaret); süreçler arası kararlı (crc32, Python hash() değil)"""
+
+    def __init__(self, dim=VECTOR_DIM):
+        self.dim = dim
+        self._slots = {}
+
+    def slot(self, feature):
+        slot = self._slots.get(feature)
+        if slot is None:
+            digest = zlib.crc32(feature.encode())
+            # İşaretli hash: çakışan özellikler ortalamada birbirini götürür
+            slot = (digest % self.dim, 1.0 if digest & 0x80000000 else -1.0)
+            self._slots[feature] = slot
+        return slot
+
+    def transform(self, features, out):
+        for feature, weight in features.items():
+            column, sign = self.slot(feature)
+            out[column] += sign * weight
+        return out
+
+
+class CoarseQuantizer:
+    """IVF: küresel k-means merkezleri + merkez başına satır listesi.
+
+    Sorgu en yakın `nprobe` merkezin listelerini tarar - tam tarama yerine
+    kataloğun küçük bir kısmı; sonuç yaklaşık olabilir.
+    """
+
+    def __init__(self, matrix, lists=None, iterations=IVF_ITERATIONS, seed=0):
+        rng = np.random.default_rng(seed)
+        count = len(matrix)
+        lists = lists or max(1, int(np.sqrt(count)))
+        sample_size = min(count, lists * IVF_SAMPLE_PER_LIST)
+        sample = np.asarray(matrix[np.sort(rng.choice(count, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignments, kind="stable")
+            members = np.bincount(assignments, minlength=lists)
+            starts = np.concatenate(([0], np.cumsum(members)[:-1]))
+            filled = members > 0
+            # Boş kalan kümeler eski merkezini korur
+            centroids[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+            _normalize_rows(centroids)
+
+        # Tüm katalog parça parça atanır (memory-map'li matris belleğe tek seferde alınmaz)
+        assignments = np.concatenate([
+            np.argmax(np.asarray(matrix[i:i + 8192]) @ centroids.T, axis=1)
+            for i in range(0, count, 8192)
+        ]) if count else np.zeros(0, dtype=np.int64)
+        self.centroids = centroids
+        self.rows = np.argsort(assignments, kind="stable").astype(np.int64)
+        self.offsets = np.searchsorted(assignments[self.rows], np.arange(lists + 1))
+
+    def candidates(self, query, nprobe=IVF_NPROBE):
+        """Sorguya en yakın `nprobe` kümenin satırları"""
+        nprobe = min(nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.rows[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+
+
+class SimilarityIndex:
+    """Katalog için 'buna benzer' araması.
+
+    Ürün vektörleri (hashlenmiş TF-IDF) tek bir bitişik float32 matriste, satırlar
+    L2-normalize: benzerlik = matris @ sorgu (kosinüs). Büyük katalogda IVF ile.
+    """
+
+    def __init__(self, catalog, matrix=None, idf=None, dim=VECTOR_DIM, ivf_min_products=IVF_MIN_PRODUCTS):
+        self.catalog = catalog
+        self.products = list(catalog)
+        self.hasher = FeatureHasher(dim)
+        if matrix is None:
+            matrix, idf = self._build(dim)
+        self.matrix = matrix
+        self.idf = idf
+
+        # Url benzersiz değil (aynı sayfa birden çok kayıtta olabilir); ürün kimliği product_id
+        self._rows_by_id = {product.product_id: row for row, product in enumerate(self.products)}
+        rows_by_url = {}
+        for row, product in enumerate(self.products):
+            if product.url:
+                rows_by_url.setdefault(product.url, []).append(row)
+        self._rows_by_url = {url: tuple(rows) for url, rows in rows_by_url.items()}
+        self._gender_codes = {g: i for i, g in enumerate(sorted({p.gender for p in self.products if p.gender}))}
+        self._genders = np.asarray([self._gender_codes.get(p.gender, -1) for p in self.products], dtype=np.int16)
+        self.quantizer = CoarseQuantizer(matrix) if len(self.products) >= ivf_min_products else None
+
+    def _build(self, dim):
+        matrix = np.zeros((len(self.products), dim), dtype=np.float32)
+        for row, product in enumerate(self.products):
+            self.hasher.transform(product_features(product.name, product.category, product.price_kurus), matrix[row])
+        # Hashlenmiş sütunlar üzerinde IDF: her üründe geçen ('elbise') özellikler zayıflar
+        df = np.count_nonzero(matrix, axis=0)
+        idf = (np.log((1 + len(self.products)) / (1 + df)) + 1).astype(np.float32)
+        matrix *= idf
+        return _normalize_rows(matrix), idf
+
+    def vector(self, name, category="", price_kurus=None):
+        """Katalog dışı ürün (ör. mock kart) için sorgu vektörü"""
+        vector = np.zeros(self.hasher.dim, dtype=np.float32)
+        self.hasher.transform(product_features(name, category, price_kurus), vector)
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def row_for(self, product_id):
+        return self._rows_by_id.get(product_id)
+
+    def rows_for_url(self, url):
+        """Url'i paylaşan tüm satırlar (yoksa boş tuple)"""
+        return self._rows_by_url.get(url, ())
+
+    def similar(self, query, limit=6, gender=None, exclude=None, nprobe=IVF_NPROBE):
+        """En benzer `limit` ürün: [(ürün, kosinüs)] (yüksekten düşüğe). exclude: satır ya da satırlar"""
+        if limit <= 0 or not self.products or not query.any():
+            return []
+        if self.quantizer is not None:
+            rows = np.sort(self.quantizer.candidates(query, nprobe))
+            scores = self.matrix[rows] @ query
+        else:
+            rows = None
+            scores = self.matrix @ query
+
+        valid = scores > 0
+        if gender:
+            genders = self._genders if rows is None else self._genders[rows]
+            valid &= genders == self._gender_codes.get(gender, -2)
+        if exclude is not None:
+            positions = np.arange(len(scores)) if rows is None else rows
+            valid &= ~np.isin(positions, exclude)
+        candidates = np.flatnonzero(valid)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        positions = candidates if rows is None else rows[candidates]
+        return [(self.products[row], float(scores[i])) for i, row in zip(candidates, positions)]
+
+    def save(self, path):
+        """Matris .npy (memory-map ile açılabilir), IDF + katalog parmak izi yanında .meta.npz"""
+        np.save(path, self.matrix)
+        np.savez(f"{path}.meta.npz", idf=self.idf, fingerprint=catalog_fingerprint(self.catalog))
+
+    @classmethod
+    def load(cls, catalog, path, **kwargs):
+        """Kayıt bu kataloğa aitse matrisi memory-map ile aç; değilse None"""
+        try:
+            meta = np.load(f"{path}.meta.npz")
+            matrix = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if int(meta["fingerprint"]) != catalog_fingerprint(catalog) or matrix.shape[0] != len(catalog):
+            return None
+        return cls(catalog, matrix=matrix, idf=meta["idf"], dim=matrix.shape[1], **kwargs)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _open_index(catalog):
+    if not VECTORS_PATH:
+        return SimilarityIndex(catalog)
+    index = SimilarityIndex.load(catalog, VECTORS_PATH)
+    if index is None:
+        index = SimilarityIndex(catalog)
+        try:
+            index.save(VECTORS_PATH)
+        except OSError as e:
+            print(f"⚠️ Benzerlik vektörleri kaydedilemedi: {e}")
+    return index
+
+
+def get_similarity_index(catalog):
+    """Katalog başına tek benzerlik indeksi (ilk çağrıda kurulur ya da diskten açılır)"""
+    entry = _indexes.get(id(catalog))
+    if entry is None or entry[0] is not catalog:
+        with _indexes_lock:
+            entry = _indexes.get(id(catalog))
+            if entry is None or entry[0] is not catalog:
+                entry = (catalog, _open_index(catalog))
+                _indexes[id(catalog)] = entry
+    return entry[1]
+
+
+# Test ve benchmark için: python similar_products.py [ürün_sayısı]
+if __name__ == "__main__":
+    import random
+    import sys
+    import tempfile
+    import time
+
+    from product_catalog import ProductCatalog
+
+    catalog = ProductCatalog.load()
+    index = SimilarityIndex(catalog)
+    assert index.matrix.flags["C_CONTIGUOUS"] and index.matrix.dtype == np.float32
+
+    dress = next(p for p in catalog if p.gender == "kadın" and "elbise" in p.category)
+    row = index.row_for(dress.product_id)
+    hits = index.similar(index.matrix[row], limit=3, gender="kadın", exclude=row)
+    assert hits and dress not in [p for p, _ in hits], hits
+    assert all(p.gender == "kadın" for p, _ in hits)
+    assert any("elbise" in p.category or "Elbise" in p.name for p, _ in hits), hits
+    # Url'i paylaşan kayıtların hepsi dışarıda kalır
+    shared = next(index.rows_for_url(p.url) for p in catalog if len(index.rows_for_url(p.url)) > 1)
+    hits = index.similar(index.matrix[shared[0]], limit=len(catalog), exclude=shared)
+    assert not {index.products[r] for r in shared} & {p for p, _ in hits}, hits
+    assert index.row_for(-1) is None and index.rows_for_url("https://example.com/yok") == ()
+    assert index.similar(index.vector("Slim Fit Gömlek"), limit=1, gender="erkek")[0][0].gender == "erkek"
+    assert index.similar(index.vector(""), limit=3) == []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vectors.npy")
+        index.save(path)
+        loaded = SimilarityIndex.load(catalog, path)
+        assert isinstance(loaded.matrix, np.memmap)
+        assert [p for p, _ in loaded.similar(loaded.matrix[row], limit=3)] == \
+               [p for p, _ in index.similar(index.matrix[row], limit=3)]
+        assert SimilarityIndex.load(ProductCatalog.from_records([]), path) is None
+    print("✅ Testler geçti")
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = random.Random(42)
+    words = ["elbise", "gömlek", "pantolon", "tişört", "ceket", "mont", "etek", "kazak", "jean",
+             "midi", "mini", "slim", "fit", "regular", "oversize", "keten", "pamuk", "saten",
+             "siyah", "beyaz", "lacivert", "bej", "kırmızı", "yeşil", "çizgili", "desenli", "basic"]
+    big = ProductCatalog.from_records(
+        {"brand": rng.choice(['Zara', 'Trendyol', 'H&M', 'Bershka']),
+         "gender": rng.choice(['kadın', 'erkek']), "category": rng.choice(words),
+         "name": " ".join(rng.sample(words, 4)).title(), "price": f"{rng.randint(50, 3000)}.99 TL",
+         "image": "", "url": f"https://example.com/{i}"}
+        for i in range(total)
+    )
+    start = time.perf_counter()
+    brute = SimilarityIndex(big, ivf_min_products=total + 1)
+    print(f"=== BENZERLİK BENCHMARK ({total:,} ürün, matris {brute.matrix.shape}) ===")
+    print(f"Vektör kurulumu: {time.perf_counter() - start:.2f} sn")
+    start = time.perf_counter()
+    ivf = SimilarityIndex(big, matrix=brute.matrix, idf=brute.idf, ivf_min_products=0)
+    print(f"IVF kurulumu ({len(ivf.quantizer.centroids)} küme): {time.perf_counter() - start:.2f} sn")
+
+    queries = list(range(0, total, total // 200))
+    recall = 0
+    for name, current in (("tam tarama", brute), ("IVF", ivf)):
+        start = time.perf_counter()
+        for row in queries:
+            hits = current.similar(current.matrix[row], limit=6, gender="kadın", exclude=row)
+        elapsed = (time.perf_counter() - start) / len(queries) * 1000
+        print(f"{name}: {elapsed:.3f} ms / sorgu")
+    for row in queries:
+        exact = {p.product_id for p, _ in brute.similar(brute.matrix[row], limit=6, exclude=row)}
+        approx = {p.product_id for p, _ in ivf.similar(ivf.matrix[row], limit=6, exclude=row)}
+        recall += len(exact & approx) / max(1, len(exact))
+    print(f"IVF recall@6 (nprobe={IVF_NPROBE}): {recall / len(queries):.2f}")
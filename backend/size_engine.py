@@ -0,0 +1,218 @@
+# Yerel, deterministik beden öneri motoru - Gemini sadece düşük güvende devreye girer
+
+SIZE_ORDER = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+
+# Temel beden tabloları: (beden, boy_min, boy_max, kilo_min, kilo_max)
+BASE_SIZE_CHARTS = {
+    'kadın': [
+        ('XS', 150, 162, 40, 50),
+        ('S', 155, 166, 48, 57),
+        ('M', 160, 170, 55, 64),
+        ('L', 163, 174, 62, 72),
+        ('XL', 166, 178, 70, 82),
+        ('XXL', 168, 182, 80, 95)
+    ],
+    'erkek': [
+        ('XS', 160, 170, 50, 60),
+        ('S', 165, 175, 58, 68),
+        ('M', 170, 180, 66, 77),
+        ('L', 175, 185, 75, 86),
+        ('XL', 178, 190, 84, 96),
+        ('XXL', 180, 195, 94, 110)
+    ]
+}
+
+# Marka kalıp farkları (cm, kg) - pozitif değer: marka küçük kalıp, aynı beden daha hafif kişiye uyar
+BRAND_FIT_OFFSETS = {
+    'Zara': (0, 3),
+    'Trendyol': (0, 0),
+    'H&M': (0, -1),
+    'Bershka': (1, 4)
+}
+
+# Sayısal (EU) bedenlerin harf karşılıkları
+NUMERIC_SIZE_ALIASES = {
+    'kadın': {'32': 'XS', '34': 'XS', '36': 'S', '38': 'M', '40': 'L', '42': 'XL', '44': 'XXL', '46': 'XXL'},
+    'erkek': {'44': 'XS', '46': 'S', '48': 'M', '50': 'L', '52': 'XL', '54': 'XXL', '56': 'XXL'}
+}
+
+SIZE_ALIASES = {'2XL': 'XXL', 'XXXL': 'XXL', '3XL': 'XXL', 'SMALL': 'S', 'MEDIUM': 'M', 'LARGE': 'L'}
+
+# Kilo, kalıp uyumunda boydan daha belirleyici
+HEIGHT_WEIGHT = 0.35
+WEIGHT_WEIGHT = 0.65
+
+UNKNOWN_BRAND_CONFIDENCE_FACTOR = 0.8
+# Bu güvenin altındaki yerel öneriler Gemini'ye danışılır (main.py SIZE_ENGINE_MIN_CONFIDENCE)
+DEFAULT_MIN_CONFIDENCE = 0.6
+
+# Serbest metin marka -> tablo markası (küçük harf, boşluksuz); 'zara', 'H & M', 'hm' ...
+BRAND_ALIASES = {'hm': 'H&M', 'handm': 'H&M'}
+
+
+def _build_brand_charts():
+    charts = {}
+    for brand, (height_offset, weight_offset) in BRAND_FIT_OFFSETS.items():
+        charts[brand] = {}
+        for gender, rows in BASE_SIZE_CHARTS.items():
+            charts[brand][gender] = tuple(
+                (size, h_min - height_offset, h_max - height_offset,
+                 w_min - weight_offset, w_max - weight_offset)
+                for size, h_min, h_max, w_min, w_max in rows
+            )
+    return charts
+
+
+# Marka -> cinsiyet -> beden tablosu (import anında bir kez hesaplanır)
+BRAND_SIZE_CHARTS = _build_brand_charts()
+
+
+def normalize_brand(brand):
+    """İstekteki marka metnini tablo markasına çevir; bilinmiyorsa None"""
+    if not brand:
+        return None
+    key = "".join(str(brand).casefold().split())
+    return _BRAND_KEYS.get(key)
+
+
+_BRAND_KEYS = {"".join(brand.casefold().split()): brand for brand in BRAND_FIT_OFFSETS}
+_BRAND_KEYS.update(BRAND_ALIASES)
+
+
+def normalize_gender(gender):
+    return 'erkek' if str(gender).strip().lower() in ('erkek', 'male', 'man', 'bay') else 'kadın'
+
+
+def normalize_size(size, gender='kadın'):
+    """'m', '38', '2XL' gibi girdileri standart harf bedene çevir"""
+    if size is None:
+        return None
+    key = str(size).strip().upper()
+    if key in SIZE_ORDER:
+        return key
+    if key in SIZE_ALIASES:
+        return SIZE_ALIASES[key]
+    return NUMERIC_SIZE_ALIASES[normalize_gender(gender)].get(key)
+
+
+def _size_distance(height, weight, row):
+    _, h_min, h_max, w_min, w_max = row
+    h_center = (h_min + h_max) / 2
+    w_center = (w_min + w_max) / 2
+    h_half = max((h_max - h_min) / 2, 1)
+    w_half = max((w_max - w_min) / 2, 1)
+    return (HEIGHT_WEIGHT * ((height - h_center) / h_half) ** 2 +
+            WEIGHT_WEIGHT * ((weight - w_center) / w_half) ** 2)
+
+
+def _range_factor(height, weight, row):
+    """Ölçüler tablo aralığının ne kadar dışında kalıyorsa güveni o kadar düşür"""
+    _, h_min, h_max, w_min, w_max = row
+    h_out = max(h_min - height, 0, height - h_max) / 10
+    w_out = max(w_min - weight, 0, weight - w_max) / 8
+    return max(0.0, 1.0 - h_out - w_out)
+
+
+def recommend_size(gender, height, weight, brand=None, product_size=None):
+    """Boy/kilo/cinsiyete göre beden önerisi ve güven skoru (0-1) döndür"""
+    gender = normalize_gender(gender)
+    brand = normalize_brand(brand)
+    brand_charts = BRAND_SIZE_CHARTS.get(brand)
+    chart = brand_charts[gender] if brand_charts else BRAND_SIZE_CHARTS['Trendyol'][gender]
+
+    best_row = None
+    best = second = float('inf')
+    for row in chart:
+        distance = _size_distance(height, weight, row)
+        if distance < best:
+            best, second = distance, best
+            best_row = row
+        elif distance < second:
+            second = distance
+
+    # Komşu bedenle fark ne kadar açıksa güven o kadar yüksek
+    margin = (second - best) / (second + best) if second + best > 0 else 1.0
+    confidence = (0.5 + 0.5 * margin) * _range_factor(height, weight, best_row)
+    if not brand_charts:
+        confidence *= UNKNOWN_BRAND_CONFIDENCE_FACTOR
+
+    recommended = best_row[0]
+    result = {
+        'recommended_size': recommended,
+        'confidence': round(confidence, 3),
+        'brand_chart': brand if brand_charts else 'generic',
+        'gender': gender,
+        'bmi': round(weight / ((height / 100) ** 2), 1) if height else None,
+        'tried_size': None,
+        'fit': None
+    }
+
+    tried = normalize_size(product_size, gender)
+    if tried:
+        diff = SIZE_ORDER.index(tried) - SIZE_ORDER.index(recommended)
+        result['tried_size'] = tried
+        if diff == 0:
+            result['fit'] = 'uygun'
+        elif diff < 0:
+            result['fit'] = 'dar'
+        else:
+            result['fit'] = 'bol'
+
+    return result
+
+
+def needs_escalation(result, min_confidence=DEFAULT_MIN_CONFIDENCE, detailed=False):
+    """Yerel öneri yetmiyor mu: detaylı analiz istendi ya da güven eşiğin altında"""
+    return detailed or result['confidence'] < min_confidence
+
+
+def format_recommendation(result, brand, product_name):
+    """Motor sonucunu kullanıcıya gösterilecek kısa Türkçe metne çevir"""
+    lines = [
+        f"📊 BMI: {result['bmi']}",
+        f"🎯 {brand} {product_name} için önerilen beden: **{result['recommended_size']}**"
+    ]
+    if result['fit'] == 'uygun':
+        lines.append(f"✅ Denediğiniz {result['tried_size']} beden size uygun görünüyor.")
+    elif result['fit'] == 'dar':
+        lines.append(f"⚠️ {result['tried_size']} beden dar gelebilir, {result['recommended_size']} deneyin.")
+    elif result['fit'] == 'bol':
+        lines.append(f"⚠️ {result['tried_size']} beden bol gelebilir, {result['recommended_size']} deneyin.")
+    lines.append(f"🔍 Güven: %{int(result['confidence'] * 100)}")
+    return "\n".join(lines)
+
+
+# Test için
+if __name__ == "__main__":
+    import time
+
+    print("=== BEDEN MOTORU TEST ===")
+    cases = [
+        ('kadın', 165, 58, 'Zara', 'S'),
+        ('kadın', 160, 52, 'Trendyol', '36'),
+        ('erkek', 180, 78, 'H&M', 'M'),
+        ('erkek', 175, 72, 'Bershka', 'L'),
+        ('kadın', 170, 66, 'Mango', 'M')
+    ]
+    for gender, height, weight, brand, tried in cases:
+        result = recommend_size(gender, height, weight, brand, tried)
+        print(f"{brand} {gender} {height}cm {weight}kg ({tried}) -> "
+              f"{result['recommended_size']} güven={result['confidence']} uyum={result['fit']}")
+
+    assert recommend_size('erkek', 175, 71, 'Trendyol')['recommended_size'] == 'M'
+    assert recommend_size('kadın', 155, 44, 'Trendyol')['recommended_size'] == 'XS'
+    assert recommend_size('kadın', 178, 92, 'Trendyol')['recommended_size'] == 'XXL'
+    # Küçük kalıp markada aynı kişi bir beden büyük almalı
+    assert SIZE_ORDER.index(recommend_size('kadın', 166, 62, 'Bershka')['recommended_size']) >= \
+        SIZE_ORDER.index(recommend_size('kadın', 166, 62, 'H&M')['recommended_size'])
+    assert recommend_size('kadın', 165, 58, 'Trendyol', '38')['tried_size'] == 'M'
+    assert recommend_size('kadın', 170, 66, 'Mango')['brand_chart'] == 'generic'
+    assert recommend_size('kadın', 200, 150, 'Zara')['confidence'] == 0.0
+    print("✅ Tüm kontroller geçti")
+
+    runs = 100000
+    start = time.perf_counter()
+    for _ in range(runs):
+        recommend_size('kadın', 165, 58, 'Zara', 'S')
+    elapsed = (time.perf_counter() - start) / runs * 1e6
+    print(f"⏱️ Ortalama süre: {elapsed:.2f} µs / öneri")
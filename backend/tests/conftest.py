@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modüller backend/ altında düz duruyor (paket değil) - testler doğrudan import etsin
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
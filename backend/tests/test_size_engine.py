@@ -0,0 +1,99 @@
+import pytest
+
+from size_engine import (
+    DEFAULT_MIN_CONFIDENCE, SIZE_ORDER, UNKNOWN_BRAND_CONFIDENCE_FACTOR,
+    needs_escalation, normalize_brand, normalize_gender, normalize_size, recommend_size
+)
+
+
+# Tablo seçimi
+
+@pytest.mark.parametrize("brand", ["Zara", "zara", "ZARA", " Zara "])
+def test_brand_lookup_ignores_case_and_whitespace(brand):
+    result = recommend_size('kadın', 165, 58, brand, 'S')
+    assert result['brand_chart'] == 'Zara'
+    assert result == recommend_size('kadın', 165, 58, 'Zara', 'S')
+
+
+@pytest.mark.parametrize("brand", ["H&M", "h&m", "H & M", "hm", "HandM"])
+def test_brand_aliases(brand):
+    assert normalize_brand(brand) == 'H&M'
+
+
+def test_unknown_brand_uses_generic_chart_with_lower_confidence():
+    generic = recommend_size('kadın', 165, 58, 'Mango')
+    base = recommend_size('kadın', 165, 58, 'Trendyol')
+    assert normalize_brand('Mango') is None and normalize_brand(None) is None
+    assert generic['brand_chart'] == 'generic'
+    assert generic['recommended_size'] == base['recommended_size']
+    assert generic['confidence'] == pytest.approx(base['confidence'] * UNKNOWN_BRAND_CONFIDENCE_FACTOR, abs=0.001)
+
+
+def test_small_fitting_brand_never_recommends_smaller_size():
+    bershka = recommend_size('kadın', 166, 62, 'Bershka')['recommended_size']
+    hm = recommend_size('kadın', 166, 62, 'H&M')['recommended_size']
+    assert SIZE_ORDER.index(bershka) >= SIZE_ORDER.index(hm)
+
+
+@pytest.mark.parametrize("gender, height, weight, expected", [
+    ('erkek', 175, 71, 'M'),
+    ('kadın', 155, 44, 'XS'),
+    ('kadın', 178, 92, 'XXL'),
+])
+def test_base_chart_recommendations(gender, height, weight, expected):
+    assert recommend_size(gender, height, weight, 'Trendyol')['recommended_size'] == expected
+
+
+# Cinsiyet
+
+@pytest.mark.parametrize("value, expected", [
+    ('erkek', 'erkek'), ('Male', 'erkek'), (' man ', 'erkek'), ('bay', 'erkek'),
+    ('kadın', 'kadın'), ('female', 'kadın'), ('', 'kadın'), (None, 'kadın'),
+])
+def test_gender_falls_back_to_kadin(value, expected):
+    assert normalize_gender(value) == expected
+
+
+def test_unknown_gender_uses_kadin_chart():
+    assert recommend_size('?', 165, 58, 'Zara') == recommend_size('kadın', 165, 58, 'Zara')
+
+
+def test_numeric_sizes_follow_gender():
+    assert normalize_size('38', 'kadın') == 'M'
+    assert normalize_size('48', 'erkek') == 'M'
+    assert normalize_size('2xl') == 'XXL'
+    assert normalize_size('99') is None
+    assert recommend_size('kadın', 165, 58, 'Trendyol', '38')['tried_size'] == 'M'
+
+
+def test_fit_against_tried_size():
+    result = recommend_size('kadın', 165, 58, 'Zara', 'S')
+    assert (result['recommended_size'], result['fit']) == ('M', 'dar')
+    assert recommend_size('kadın', 165, 58, 'Zara', 'M')['fit'] == 'uygun'
+    assert recommend_size('kadın', 165, 58, 'Zara', 'XL')['fit'] == 'bol'
+
+
+# Güven ve Gemini'ye yükseltme
+
+def test_confidence_is_high_inside_chart_and_zero_far_outside():
+    assert recommend_size('kadın', 165, 58, 'Zara')['confidence'] >= 0.9
+    assert recommend_size('kadın', 200, 150, 'Zara')['confidence'] == 0.0
+
+
+def test_lowercase_brand_does_not_escalate():
+    assert not needs_escalation(recommend_size('kadın', 165, 58, 'zara', 'S'))
+
+
+@pytest.mark.parametrize("confidence, detailed, expected", [
+    (DEFAULT_MIN_CONFIDENCE - 0.001, False, True),
+    (DEFAULT_MIN_CONFIDENCE, False, False),
+    (0.99, False, False),
+    (0.99, True, True),
+])
+def test_escalation_threshold(confidence, detailed, expected):
+    assert needs_escalation({'confidence': confidence}, detailed=detailed) is expected
+
+
+def test_out_of_range_measurements_escalate():
+    assert needs_escalation(recommend_size('kadın', 200, 150, 'Zara'))
+    assert needs_escalation(recommend_size('kadın', 200, 150, 'Zara'), min_confidence=0.0) is False
@@ -0,0 +1,125 @@
+import threading
+from datetime import datetime
+from product_catalog import parse_price_range_kurus
+
+
+class TrendWriteBuffer:
+    """Trend sayaçlarını bellekte biriktirip toplu yazan write-behind buffer.
+
+    İstek yolunda sadece dict güncellenir; SQLite'a yazma arka plan
+    thread'inde, periyodik ya da eşik aşılınca tek transaction ile yapılır.
+    """
+
+    def __init__(self, flush_fn, flush_interval=5.0, max_pending=500):
+        self.flush_fn = flush_fn  # rows listesi alır, tek transaction'da yazar
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}  # (product_name, brand, iso_year, week) -> satır
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushed_rows = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+
+    def record(self, product_name, brand, category, body_type=None, price_range=None):
+        """Aramayı say - SQLite'a dokunmaz"""
+        now = datetime.now()
+        # ISO hafta numarası her yıl tekrar eder - anahtar yılı da içerir
+        iso_year, week, _ = now.isocalendar()
+        key = (product_name, brand, iso_year, week)
+        with self._lock:
+            row = self._pending.get(key)
+            if row is None:
+                # Fiyat metni kayıt başına bir kez ayrıştırılır (aralık filtreleri için)
+                prices = parse_price_range_kurus(price_range) or (None, None)
+                self._pending[key] = {
+                    'product_name': product_name,
+                    'brand': brand,
+                    'category': category,
+                    'body_type': body_type,
+                    'price_range': price_range,
+                    'price_min_kurus': prices[0],
+                    'price_max_kurus': prices[1],
+                    'date_added': now.date().isoformat(),
+                    'iso_year': iso_year,
+                    'week_number': week,
+                    'search_count': 1
+                }
+            else:
+                row['search_count'] += 1
+                # Son bilinen fiyat geçerli (flush'taki upsert ile aynı kural)
+                prices = parse_price_range_kurus(price_range) if price_range else None
+                if prices:
+                    row['price_range'] = price_range
+                    row['price_min_kurus'], row['price_max_kurus'] = prices
+            pending = len(self._pending)
+
+        if pending >= self.max_pending:
+            self._wake.set()
+        return True
+
+    def flush(self):
+        """Bekleyen sayaçları yaz; yazılan satır sayısını döndür"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                rows = list(self._pending.values())
+                self._pending = {}
+
+            try:
+                self.flush_fn(rows)
+            except Exception as e:
+                self.flush_errors += 1
+                print(f"Trend flush error: {e}")
+                # Yazılamayan sayaçları kaybetme, sonraki flush'a geri koy
+                with self._lock:
+                    for row in rows:
+                        key = (row['product_name'], row['brand'], row['iso_year'], row['week_number'])
+                        existing = self._pending.get(key)
+                        if existing is None:
+                            self._pending[key] = row
+                        else:
+                            existing['search_count'] += row['search_count']
+                return 0
+
+            self.flushed_rows += len(rows)
+            self.flush_count += 1
+            return len(rows)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="trend-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arka plan thread'ini durdur ve kalanları yaz"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending_rows": pending,
+            "flushed_rows": self.flushed_rows,
+            "flush_count": self.flush_count,
+            "flush_errors": self.flush_errors,
+            "flush_interval": self.flush_interval,
+            "max_pending": self.max_pending
+        }
@@ -0,0 +1,134 @@
+import json
+import time
+
+ROLLUP_TREND_TYPE = "top_products"
+
+# trend_analytics tablosuna rollup için eklenen kolonlar
+ROLLUP_COLUMNS = (
+    ("slice_key", "TEXT"),
+    ("updated_at", "REAL"),
+    ("iso_year", "INTEGER")
+)
+
+PRODUCT_COLUMNS = ("product_name", "brand", "category", "search_count", "body_type", "price_range")
+
+
+def slice_key(category=None, body_type=None):
+    """(kategori, vücut tipi) dilimi için anahtar - None 'hepsi' demek"""
+    category_part = category.strip().lower() if category else "*"
+    body_type_part = body_type if body_type else "*"
+    return f"{category_part}|{body_type_part}"
+
+
+def row_slices(category, body_type):
+    """Bir ürün satırının katkıda bulunduğu tüm dilimler"""
+    keys = {slice_key(), slice_key(category=category)}
+    if body_type:
+        keys.add(slice_key(body_type=body_type))
+        keys.add(slice_key(category=category, body_type=body_type))
+    return keys
+
+
+class TrendRollups:
+    """trend_analytics içinde (ISO yıl, hafta)/dilim başına önceden hesaplanmış top-N listeleri.
+
+    Sayaçlar sadece artar; bu yüzden bir dilimin top-N listesi sadece
+    değişen ürünlerle birleştirilerek güncel tutulabilir (tam GROUP BY gerekmez).
+    """
+
+    def __init__(self, store, top_n=20):
+        self.store = store
+        self.top_n = top_n
+        store.transaction(self._init_schema)
+
+    def _init_schema(self, conn):
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(trend_analytics)")}
+        for name, column_type in ROLLUP_COLUMNS:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE trend_analytics ADD COLUMN {name} {column_type}")
+        if "iso_year" not in existing:
+            # Yılsız eski rollup'lar türetilmiş veri - silinir, açılışta yeniden hesaplanır
+            conn.execute("DROP INDEX IF EXISTS idx_trend_analytics_slice")
+            conn.execute('DELETE FROM trend_analytics WHERE trend_type = ?', (ROLLUP_TREND_TYPE,))
+        conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_trend_analytics_year_slice
+        ON trend_analytics (trend_type, iso_year, week_number, slice_key)
+        ''')
+
+    def apply(self, conn, rows):
+        """Flush transaction'ı içinde, yazılan satırların dokunduğu dilimleri güncelle"""
+        touched = {}  # (iso_year, week, slice_key) -> {(product_name, brand): ürün}
+        for row in rows:
+            current = conn.execute(f'''
+            SELECT {", ".join(PRODUCT_COLUMNS)} FROM product_trends
+            WHERE product_name = ? AND brand = ? AND iso_year = ? AND week_number = ?
+            ''', (row['product_name'], row['brand'], row['iso_year'], row['week_number'])).fetchone()
+            if current is None:
+                continue
+            product = dict(zip(PRODUCT_COLUMNS, current))
+            for key in row_slices(product['category'], product['body_type']):
+                touched.setdefault((row['iso_year'], row['week_number'], key), {})[
+                    (product['product_name'], product['brand'])
+                ] = product
+
+        now = time.time()
+        for (iso_year, week, key), changed in touched.items():
+            existing = conn.execute('''
+            SELECT trend_data FROM trend_analytics
+            WHERE trend_type = ? AND iso_year = ? AND week_number = ? AND slice_key = ?
+            ''', (ROLLUP_TREND_TYPE, iso_year, week, key)).fetchone()
+
+            merged = {}
+            if existing:
+                for product in json.loads(existing[0]):
+                    merged[(product['product_name'], product['brand'])] = product
+            merged.update(changed)
+
+            top = sorted(merged.values(), key=lambda p: p['search_count'], reverse=True)[:self.top_n]
+            self._write(conn, iso_year, week, key, top, now)
+
+    def rebuild(self, iso_year, week):
+        """Bir haftanın tüm dilimlerini product_trends'ten baştan hesapla"""
+        def _rebuild(conn):
+            rows = conn.execute(f'''
+            SELECT {", ".join(PRODUCT_COLUMNS)} FROM product_trends WHERE iso_year = ? AND week_number = ?
+            ''', (iso_year, week)).fetchall()
+            slices = {}
+            for row in rows:
+                product = dict(zip(PRODUCT_COLUMNS, row))
+                for key in row_slices(product['category'], product['body_type']):
+                    slices.setdefault(key, []).append(product)
+
+            conn.execute('DELETE FROM trend_analytics WHERE trend_type = ? AND iso_year = ? AND week_number = ?',
+                         (ROLLUP_TREND_TYPE, iso_year, week))
+            now = time.time()
+            for key, products in slices.items():
+                top = sorted(products, key=lambda p: p['search_count'], reverse=True)[:self.top_n]
+                self._write(conn, iso_year, week, key, top, now)
+            return len(slices)
+
+        return self.store.transaction(_rebuild)
+
+    def _write(self, conn, iso_year, week, key, products, updated_at):
+        conn.execute('''
+        INSERT INTO trend_analytics (trend_type, trend_data, iso_year, week_number, slice_key, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(trend_type, iso_year, week_number, slice_key)
+        DO UPDATE SET trend_data = excluded.trend_data, updated_at = excluded.updated_at
+        ''', (ROLLUP_TREND_TYPE, json.dumps(products, ensure_ascii=False), iso_year, week, key, updated_at))
+
+    def get(self, iso_year, week, category=None, body_type=None):
+        """(ürünler, updated_at) ya da dilim yoksa None"""
+        row = self.store.read('''
+        SELECT trend_data, updated_at FROM trend_analytics
+        WHERE trend_type = ? AND iso_year = ? AND week_number = ? AND slice_key = ?
+        ''', (ROLLUP_TREND_TYPE, iso_year, week, slice_key(category, body_type)))
+        if not row:
+            return None
+        return json.loads(row[0][0]), row[0][1]
+
+    def has_week(self, iso_year, week):
+        return bool(self.store.read(
+            'SELECT 1 FROM trend_analytics WHERE trend_type = ? AND iso_year = ? AND week_number = ? LIMIT 1',
+            (ROLLUP_TREND_TYPE, iso_year, week)
+        ))
@@ -0,0 +1,362 @@
+import os
+import sqlite3
+import threading
+from datetime import date
+from product_catalog import parse_price_range_kurus
+from text_utils import tokenize, turkish_lower
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_trends_db_path():
+    """TRENDS_DB_PATH yoksa: Vercel'de /tmp (tek yazılabilir dizin), lokalde backend/trends.db"""
+    configured = os.getenv("TRENDS_DB_PATH")
+    if configured:
+        return configured
+    if os.getenv("VERCEL"):
+        return "/tmp/trends.db"
+    return os.path.join(BACKEND_DIR, "trends.db")
+
+
+# Dosya tabanlı DB için bağlantı ayarları
+FILE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",      # Okuyucular yazarı beklemez
+    "PRAGMA synchronous=NORMAL",    # WAL ile güvenli, commit başına fsync yok
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",     # ~16 MB page cache
+    "PRAGMA mmap_size=67108864",    # 64 MB mmap
+    "PRAGMA busy_timeout=5000"
+)
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS product_trends (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_name TEXT,
+        brand TEXT,
+        category TEXT,
+        search_count INTEGER DEFAULT 1,
+        body_type TEXT,
+        price_range TEXT,
+        price_min_kurus INTEGER,
+        price_max_kurus INTEGER,
+        colors TEXT,
+        date_added DATE,
+        iso_year INTEGER,
+        week_number INTEGER
+    )
+    ''',
+    # Kategori kelime tablosu: 'wom' -> 'woman' gibi önek eşleşmesi index üzerinden
+    '''
+    CREATE TABLE IF NOT EXISTS category_tokens (
+        token TEXT,
+        category TEXT,
+        PRIMARY KEY (token, category)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS trend_analytics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        trend_type TEXT,
+        trend_data TEXT,
+        week_number INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    '''
+)
+
+
+# Eski dosyalarda iso_year sütunu migration ile eklendikten sonra oluşturulur
+INDEXES = (
+    # Yıl + hafta + kategori/vücut tipi filtreleri ve filtresiz top-N sıralaması için
+    '''
+    CREATE INDEX IF NOT EXISTS idx_trends_year_week_category_body
+    ON product_trends (iso_year, week_number, category, body_type)
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_trends_year_week_count
+    ON product_trends (iso_year, week_number, search_count DESC)
+    '''
+)
+
+# Yıl olmadan tanımlı eski index'ler - ISO hafta numaraları her yıl tekrar eder
+LEGACY_INDEXES = ("idx_trends_week_category_body", "idx_trends_week_count", "idx_trends_product_week")
+
+
+def iso_year_of(date_added):
+    """'2024-10-18' -> 2024 (ISO yılı; yıl başı/sonu haftalarında takvim yılından farklı olabilir)"""
+    try:
+        return date.fromisoformat(str(date_added)[:10]).isocalendar()[0]
+    except (TypeError, ValueError):
+        return None
+
+
+def index_categories(conn, categories):
+    """Kategorilerin kelimelerini category_tokens tablosuna ekle (yazma transaction'ı içinde)"""
+    conn.executemany(
+        "INSERT OR IGNORE INTO category_tokens (token, category) VALUES (?, ?)",
+        [(token, category) for category in set(categories) if category
+         for token in set(tokenize(category)) | {turkish_lower(category)}]
+    )
+
+
+class TrendStore:
+    """Trend veritabanı: tek (serileştirilmiş) yazıcı, thread başına okuyucu bağlantı.
+
+    path=':memory:' testler için tek paylaşılan bağlantı kullanır.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self.in_memory = path == ":memory:"
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._writer = self._connect()
+        self._init_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        if not self.in_memory:
+            for pragma in FILE_PRAGMAS:
+                conn.execute(pragma)
+        return conn
+
+    def _init_schema(self):
+        with self._write_lock, self._writer:
+            for statement in SCHEMA:
+                self._writer.execute(statement)
+            self._ensure_year_column()
+            for name in LEGACY_INDEXES:
+                self._writer.execute(f"DROP INDEX IF EXISTS {name}")
+            for statement in INDEXES:
+                self._writer.execute(statement)
+            self._ensure_unique_index()
+            self._ensure_price_columns()
+            # Eski dosyalardaki kategorileri kelime tablosuna bir kez aktar
+            if not self._writer.execute("SELECT 1 FROM category_tokens LIMIT 1").fetchone():
+                categories = [row[0] for row in self._writer.execute(
+                    "SELECT DISTINCT category FROM product_trends WHERE category IS NOT NULL"
+                )]
+                index_categories(self._writer, categories)
+
+    def _ensure_year_column(self):
+        existing = {row[1] for row in self._writer.execute("PRAGMA table_info(product_trends)")}
+        if "iso_year" in existing:
+            return
+        self._writer.execute("ALTER TABLE product_trends ADD COLUMN iso_year INTEGER")
+        # Eski satırların yılı date_added'dan; tarihsiz satırlar yılsız (NULL) kalır, sorgulara girmez
+        rows = self._writer.execute("SELECT id, date_added FROM product_trends").fetchall()
+        self._writer.executemany(
+            "UPDATE product_trends SET iso_year = ? WHERE id = ?",
+            [(iso_year_of(date_added), row_id) for row_id, date_added in rows]
+        )
+
+    def _ensure_unique_index(self):
+        exists = self._writer.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_trends_product_year_week'"
+        ).fetchone()
+        if exists:
+            return
+
+        # Eski dosyalarda aynı ürün/yıl/hafta için birden çok satır olabilir - önce birleştir
+        self._writer.execute('''
+        UPDATE product_trends SET search_count = (
+            SELECT SUM(p.search_count) FROM product_trends p
+            WHERE p.product_name IS product_trends.product_name
+              AND p.brand IS product_trends.brand
+              AND p.iso_year IS product_trends.iso_year
+              AND p.week_number IS product_trends.week_number
+        )
+        WHERE id IN (SELECT MIN(id) FROM product_trends GROUP BY product_name, brand, iso_year, week_number)
+        ''')
+        self._writer.execute('''
+        DELETE FROM product_trends
+        WHERE id NOT IN (SELECT MIN(id) FROM product_trends GROUP BY product_name, brand, iso_year, week_number)
+        ''')
+
+        # Toplu upsert (ON CONFLICT) için gerekli
+        self._writer.execute('''
+        CREATE UNIQUE INDEX idx_trends_product_year_week
+        ON product_trends (product_name, brand, iso_year, week_number)
+        ''')
+
+    def _ensure_price_columns(self):
+        existing = {row[1] for row in self._writer.execute("PRAGMA table_info(product_trends)")}
+        if "price_min_kurus" in existing:
+            return
+        self._writer.execute("ALTER TABLE product_trends ADD COLUMN price_min_kurus INTEGER")
+        self._writer.execute("ALTER TABLE product_trends ADD COLUMN price_max_kurus INTEGER")
+        # Eski satırların fiyat metinleri bir kez ayrıştırılır; sorgular sadece kuruş sütunlarına bakar
+        rows = self._writer.execute(
+            "SELECT id, price_range FROM product_trends WHERE price_range IS NOT NULL"
+        ).fetchall()
+        updates = []
+        for row_id, price_range in rows:
+            prices = parse_price_range_kurus(price_range)
+            if prices:
+                updates.append((*prices, row_id))
+        self._writer.executemany(
+            "UPDATE product_trends SET price_min_kurus = ?, price_max_kurus = ? WHERE id = ?", updates
+        )
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def read(self, query, params=()):
+        """SELECT çalıştır, tüm satırları döndür"""
+        if self.in_memory:
+            # Bellek içi DB bağlantıya özel - yazıcı bağlantısı kilitle paylaşılır
+            with self._write_lock:
+                return self._writer.execute(query, params).fetchall()
+        return self._reader().execute(query, params).fetchall()
+
+    def match_categories(self, query):
+        """Kelimelerinden biri `query` ile başlayan kategoriler (index range scan)"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        matches = None
+        for term in terms:
+            # token >= term AND token < term + max karakter: önek araması B-tree üzerinde
+            found = {row[0] for row in self.read(
+                "SELECT category FROM category_tokens WHERE token >= ? AND token < ?",
+                (term, term + "\uffff")
+            )}
+            matches = found if matches is None else matches & found
+        return sorted(matches)
+
+    def write(self, query, params=()):
+        """Tek yazma ifadesini kendi transaction'ında çalıştır"""
+        with self._write_lock, self._writer:
+            return self._writer.execute(query, params).rowcount
+
+    def write_many(self, query, rows):
+        """Çok satırlı yazmayı tek transaction'da çalıştır"""
+        with self._write_lock, self._writer:
+            return self._writer.executemany(query, rows).rowcount
+
+    def transaction(self, fn):
+        """fn(conn) yazıcı bağlantısıyla tek transaction içinde çalışır"""
+        with self._write_lock, self._writer:
+            return fn(self._writer)
+
+    def close(self):
+        with self._readers_lock:
+            for conn in self._readers:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._readers = []
+        with self._write_lock:
+            if not self.in_memory:
+                try:
+                    self._writer.execute("PRAGMA optimize")
+                except Exception:
+                    pass
+            self._writer.close()
+
+
+# Benchmark için: python trend_store.py [satır_sayısı]
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+
+    total_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    weeks = 52
+    current_year, current_week = 2025, 42
+    categories = ['tişört', 'pantolon', 'elbise', 'size_analysis', 'photo_analysis',
+                  'style_consultation', 'woman', 'erkek', 'gömlek', 'ceket']
+    body_types = ['Rectangle', 'Pear', 'Apple', 'Hourglass', 'Athletic', None]
+    rng = random.Random(42)
+
+    def generate_rows():
+        for i in range(total_rows):
+            yield (f"Ürün {i}", rng.choice(['Zara', 'Trendyol', 'H&M', 'Bershka']),
+                   rng.choice(categories), rng.randint(1, 500), rng.choice(body_types),
+                   current_year - (i // weeks) % 2, i % weeks + 1)
+
+    insert = '''
+    INSERT INTO product_trends (product_name, brand, category, search_count, body_type, iso_year, week_number)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    print(f"=== TREND SORGU BENCHMARK ({total_rows:,} satır) ===")
+
+    # Eski yapı: index yok, LIKE '%...%', boş sonuçta filtresiz ikinci GROUP BY
+    legacy = sqlite3.connect(":memory:")
+    legacy.execute(SCHEMA[0])
+    legacy.executemany(insert, generate_rows())
+    legacy.commit()
+
+    def legacy_query(category=None, body_type=None, limit=8):
+        query = '''
+        SELECT product_name, brand, category, SUM(search_count) as total_searches, body_type, price_range
+        FROM product_trends WHERE week_number = ?
+        '''
+        params = [current_week]
+        if category:
+            query += ' AND category LIKE ?'
+            params.append(f'%{category}%')
+        if body_type:
+            query += ' AND body_type = ?'
+            params.append(body_type)
+        query += ' GROUP BY product_name, brand ORDER BY total_searches DESC LIMIT ?'
+        params.append(limit)
+        results = legacy.execute(query, params).fetchall()
+        return results if results else legacy_query(limit=limit)
+
+    rng = random.Random(42)
+    store = TrendStore(":memory:")
+    store.transaction(lambda conn: conn.executemany(insert, generate_rows()))
+    store.transaction(lambda conn: index_categories(conn, categories))
+    store.transaction(lambda conn: conn.execute("ANALYZE"))
+
+    def indexed_query(category=None, body_type=None, limit=8):
+        base = '''
+        SELECT product_name, brand, category, search_count, body_type, price_range
+        FROM product_trends WHERE iso_year = ? AND week_number = ?
+        '''
+        query, params, results = base, [current_year, current_week], None
+        if category:
+            matched = store.match_categories(category)
+            if matched:
+                query += f' AND category IN ({", ".join("?" * len(matched))})'
+                params.extend(matched)
+            else:
+                results = []
+        if body_type:
+            query += ' AND body_type = ?'
+            params.append(body_type)
+        if results is None:
+            results = store.read(query + ' ORDER BY search_count DESC LIMIT ?', params + [limit])
+        if not results and (category or body_type):
+            results = store.read(base + ' ORDER BY search_count DESC LIMIT ?', [current_year, current_week, limit])
+        return results
+
+    cases = [
+        ("filtresiz", {}),
+        ("kategori 'elbise'", {"category": "elbise"}),
+        ("kategori önek 'tiş'", {"category": "tiş"}),
+        ("kategori + vücut tipi", {"category": "pantolon", "body_type": "Pear"}),
+        ("eşleşmeyen kategori (fallback)", {"category": "mont"})
+    ]
+    runs = 20
+    for label, kwargs in cases:
+        timings = []
+        for fn in (legacy_query, indexed_query):
+            start = time.perf_counter()
+            for _ in range(runs):
+                fn(**kwargs)
+            timings.append((time.perf_counter() - start) / runs * 1000)
+        print(f"{label:32s} eski: {timings[0]:8.2f} ms   yeni: {timings[1]:7.3f} ms   "
+              f"hızlanma: {timings[0] / timings[1]:6.1f}x")